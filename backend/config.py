@@ -1,8 +1,15 @@
+from pathlib import Path
+from typing import Literal
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Repository root, for defaults that must not depend on the working directory
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
 
 class Settings(BaseSettings):
     """
@@ -11,6 +18,89 @@ class Settings(BaseSettings):
 
     session_timeout_minutes: int = 30  # Default timeout if not set in .env
 
+    # Shared secret for /admin endpoints (sent as X-Admin-Token); admin API disabled when unset
+    admin_token: str | None = None
+
+    # Warm-restart snapshot written on shutdown and restored on startup; disabled when unset
+    snapshot_path: str | None = None
+
+    # Logging (records are written by a background thread, see logging_config.py)
+    log_level: str = "INFO"  # Root level
+    # Per-module overrides, e.g. {"backend.routers": "DEBUG"}
+    log_levels: dict[str, str] = {}
+    log_format: Literal["text", "json"] = "text"
+    # Fraction of occurrences logged for high-volume events, e.g. {"ws.send": 0.01}
+    # Events: ws.send, ws.receive, agent.chunk (unlisted events log every occurrence)
+    log_sample_rates: dict[str, float] = {}
+
+    # OpenTelemetry tracing, one trace per inbound WebSocket action (see services/tracing.py)
+    trace_exporter: Literal["none", "console", "file", "otlp"] = "none"
+    trace_file_path: str = "traces.jsonl"  # JSON lines, used by the "file" exporter
+    trace_sample_ratio: float = 1.0  # Head sampling: fraction of actions traced
+
+    # Event-loop lag monitor; stalls longer than the threshold log a loop stack sample
+    loop_monitor_enabled: bool = False
+    loop_monitor_interval_seconds: float = 0.25  # Probe period
+    loop_slow_callback_seconds: float = 0.1
+
+    # Inbound WebSocket frames larger than this are rejected before parsing
+    # (characters for text frames, bytes for binary frames)
+    ws_max_inbound_message_size: int = 64 * 1024
+
+    # Compression of large outbound frames, negotiated per connection with the
+    # "chat.deflate" subprotocol (see connection_manager.py). Frames below the
+    # threshold (e.g., agent_message_chunk) are sent uncompressed as text.
+    ws_compression_enabled: bool = True
+    ws_compression_min_bytes: int = 2048
+    # zlib level 1 (fastest) .. 9 (smallest); 1 is ~2x faster than 6 for ~10% more bytes
+    ws_compression_level: int = 1
+    # zlib memory while compressing one frame: 2**(window_bits + 2) plus
+    # 2**(mem_level + 9) bytes; nothing is kept between frames
+    ws_compression_window_bits: int = Field(default=15, ge=9, le=15)
+    ws_compression_mem_level: int = Field(default=8, ge=1, le=9)
+
+    # Server heartbeats: clients idle this long get a ping and are reaped when
+    # nothing arrives within the timeout (interval 0 disables heartbeats)
+    ws_heartbeat_interval_seconds: float = 20.0
+    ws_heartbeat_timeout_seconds: float = 10.0
+
+    # Admission control for send_message (see services/admission.py).
+    # Per-client token bucket: sustained rate plus burst (rate 0 disables it)
+    rate_limit_messages_per_minute: float = 20.0
+    rate_limit_burst: int = 5
+    # Global cap on concurrent agent generations; excess requests wait in a
+    # bounded queue and are rejected with a retry-after once it is full
+    agent_max_concurrent_generations: int = 32
+    agent_max_queued_generations: int = 128
+    # Most agents one send_message may ask at once (payload agent_ids); each
+    # takes its own generation slot
+    max_fanout_agents: int = 4
+    # Idempotency keys (send_message client_message_id) remembered per session;
+    # a resend with a remembered key replays the original instead of new work
+    idempotency_window_size: int = 64
+
+    # Drain before deploys (POST /admin/drain, also run at shutdown): in-flight
+    # generations and background tasks get this long to finish, and clients
+    # are told to reconnect after a random delay of up to the jitter
+    drain_timeout_seconds: float = 30.0
+    drain_reconnect_jitter_seconds: float = 5.0
+    drain_report_interval_seconds: float = 5.0  # Progress log period
+
+    # Agent catalog (JSON, see AgentCatalogFile in services/agent_manager.py),
+    # polled for changes and reloaded without a restart (0 disables polling).
+    # The default is the repository's agents.json wherever the app is started
+    agents_config_path: str | None = str(PROJECT_ROOT / "agents.json")
+    agents_reload_seconds: float = 2.0
+
+    # Agent tool calls (see services/tools.py). Defaults for tools that do not
+    # set their own timeout, concurrency limit or cache size; blocking tools
+    # share the thread pool, CPU-heavy ones the process pool
+    tool_timeout_seconds: float = 10.0
+    tool_max_concurrency: int = 4
+    tool_cache_size: int = 256  # Results kept per deterministic tool
+    tool_thread_workers: int = 8
+    tool_process_workers: int = 2
+
     # Configuration for loading settings
     model_config = SettingsConfigDict(
         env_file=".env",  # Specify the .env file name
@@ -23,10 +113,11 @@ class Settings(BaseSettings):
 try:
     settings = Settings()
     logger.info(
-        f"Settings loaded: Session timeout = {settings.session_timeout_minutes} minutes"
+        "Settings loaded: Session timeout = %s minutes",
+        settings.session_timeout_minutes,
     )
 except Exception as e:
-    logger.error(f"Failed to load settings: {e}", exc_info=True)
+    logger.error("Failed to load settings: %s", e, exc_info=True)
     # Fallback to defaults if loading fails critically
     settings = Settings(session_timeout_minutes=30)
     logger.warning("Using default settings due to loading error.")
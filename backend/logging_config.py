@@ -0,0 +1,153 @@
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+from backend.config import settings
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {
+    "message",
+    "asctime",
+}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s:%(lineno)d - %(levelname)s - %(message)s"
+TEXT_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+_listener: logging.handlers.QueueListener | None = None
+_output: logging.Handler | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:  # Set early by DeferredQueueHandler
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# Argument types that cannot change between the log call and the write
+_IMMUTABLE_ARG_TYPES = frozenset({str, int, float, bool, bytes, type(None)})
+_EXC_FORMATTER = logging.Formatter()
+
+
+def _immutable_args(args) -> bool:
+    if not args:
+        return True
+    values = args.values() if isinstance(args, dict) else args
+    return all(type(value) in _IMMUTABLE_ARG_TYPES for value in values)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records mostly untouched. The stock QueueHandler formats the
+    message in the caller's thread; here, when every %-argument is a
+    primitive (str, int, float, bool, bytes, None), formatting happens on the
+    listener thread, keeping both string formatting and I/O off the event loop.
+    Anything else (dicts, models, ...) could change before the listener gets
+    to it, so such records, and tracebacks, are formatted at the call site.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        if not isinstance(record.msg, str) or not _immutable_args(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class LogSampler:
+    """
+    Gate for one high-volume log event (e.g., every frame sent).
+
+    `should_log()` is False when the logger would drop the level anyway or
+    the event's sample rate (settings.log_sample_rates) is 0. Otherwise it
+    lets through 1 in round(1/rate) occurrences, counter-based so the check
+    is a couple of attribute reads. Call sites wrap the log call:
+
+        if _send_sampler.should_log():
+            logger.debug("Sent %s to %s", frame_type, client_id)
+    """
+
+    __slots__ = ("event", "logger", "level", "every", "_count")
+
+    def __init__(self, logger: logging.Logger, level: int, event: str):
+        self.event = event
+        self.logger = logger
+        self.level = level
+        rate = settings.log_sample_rates.get(event, 1.0)
+        self.every = round(1 / rate) if rate > 0 else 0
+        self._count = 0
+
+    def should_log(self) -> bool:
+        if not self.every or not self.logger.isEnabledFor(self.level):
+            return False
+        self._count += 1
+        if self._count >= self.every:
+            self._count = 0
+            return True
+        return False
+
+
+def configure_logging():
+    """
+    Routes all logging through a queue to a background writer thread and
+    applies the root/per-module levels and format from settings.
+    Safe to call more than once; the previous listener is replaced.
+    """
+    global _listener, _output
+    stop_logging()
+
+    output = _output = logging.StreamHandler()
+    if settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=TEXT_DATEFMT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(settings.log_level.upper())
+
+    for module, level in settings.log_levels.items():
+        logging.getLogger(module).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, output, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def stop_logging():
+    """
+    Flushes queued records and stops the writer thread (call on shutdown).
+    Later records are written directly so nothing logged afterwards is lost.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(_output)
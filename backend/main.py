@@ -1,21 +1,31 @@
 import logging
+from pathlib import Path
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager  # Use async context manager for lifespan
 
 # Import routers, services, and config
-from backend.routers import web, websocket
+from backend.routers import admin, web, websocket
+from backend.services.admission import generation_limiter, rate_limiter
+from backend.services.agent_manager import agent_manager
 from backend.services.chat_manager import chat_manager  # Import the singleton instance
+from backend.services.connection_manager import connection_manager
+from backend.services.drain import drain_controller
+from backend.services.loop_monitor import loop_monitor
+from backend.services.metrics import registry as metrics_registry
+from backend.services.snapshot import load_snapshot, save_snapshot
+from backend.services.static_assets import static_assets
+from backend.services.tools import tool_executor
 from backend.config import settings  # Import the settings instance
+from backend.services.tracing import configure_tracing, shutdown_tracing
+from backend.logging_config import configure_logging, stop_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Set to DEBUG for more detail during development
-    format="%(asctime)s - %(name)s:%(lineno)d - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+# Configure logging: levels/format from settings, records written by a background thread
+configure_logging()
 # Get a logger instance for this module
 logger = logging.getLogger(__name__)
+# Tracing exporter and sampling from settings (disabled by default)
+configure_tracing()
 
 
 # --- Lifespan Management (Recommended for FastAPI >= 0.104.0) ---
@@ -27,20 +37,49 @@ async def lifespan(app: FastAPI):
     # --- Startup ---
     logger.info("Application startup sequence initiated...")
     logger.info(
-        f"Session timeout configured to: {settings.session_timeout_minutes} minutes"
+        "Session timeout configured to: %s minutes", settings.session_timeout_minutes
     )
+    # Restore sessions/topic summaries from the last shutdown (histories load lazily)
+    if settings.snapshot_path:
+        load_snapshot(chat_manager, Path(settings.snapshot_path))
+    # Read, hash and precompress static assets once instead of per request
+    static_assets.load()
+    # Agent catalog from its config file; later edits are picked up by polling
+    if settings.agents_config_path:
+        agent_manager.load_file(Path(settings.agents_config_path))
+    await agent_manager.start_reload_task()
     # Start background tasks like the session cleanup
     await chat_manager.start_cleanup_task()
+    await connection_manager.start_heartbeat_task()
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
     logger.info("Application startup complete. Ready to accept connections.")
 
     yield  # Application runs here
 
     # --- Shutdown ---
     logger.info("Application shutdown sequence initiated...")
+    # Let in-flight generations and background tasks finish (no-op if an
+    # earlier POST /admin/drain already completed)
+    await drain_controller.drain()
     # Gracefully stop background tasks
     await chat_manager.stop_cleanup_task()
+    await connection_manager.stop_heartbeat_task()
+    await agent_manager.stop_reload_task()
+    await loop_monitor.stop()
+    tool_executor.shutdown()
+    # Persist state so the next instance can warm-restart
+    if settings.snapshot_path:
+        try:
+            save_snapshot(chat_manager, Path(settings.snapshot_path))
+        except Exception as e:
+            logger.error("Failed to write shutdown snapshot: %s", e, exc_info=True)
+    # Export spans still buffered by the batch processor
+    shutdown_tracing()
     # Add any other cleanup tasks (e.g., close database connections)
     logger.info("Application shutdown complete.")
+    # Flush queued log records last so the shutdown messages are written
+    stop_logging()
 
 
 # Create FastAPI app instance with lifespan manager
@@ -52,23 +91,16 @@ app = FastAPI(
 )
 
 # --- Static Files ---
-# Serve CSS, JS files from the 'app/static' directory at the '/static' URL path
-# Check if the directory exists to avoid errors during startup if structure is wrong
-try:
-    app.mount("/static", StaticFiles(directory="app/static"), name="static")
-    logger.info("Mounted static files directory at /static")
-except RuntimeError as e:
-    logger.error(
-        f"Failed to mount static files directory 'app/static': {e}. Ensure the directory exists."
-    )
-    logger.error("Static files (CSS, JS) will not be served.")
+# CSS/JS are served from memory with precompressed variants and hashed,
+# immutable URLs by the web router (see services/static_assets.py)
 
 
 # --- Routers ---
 # Include API and WebSocket routes defined in separate modules
 app.include_router(web.router)
 app.include_router(websocket.router)
-logger.info("Included web and websocket routers.")
+app.include_router(admin.router)
+logger.info("Included web, websocket and admin routers.")
 
 
 # --- Optional Root/Health Endpoint ---
@@ -76,3 +108,53 @@ logger.info("Included web and websocket routers.")
 async def health_check():
     """Simple endpoint to check if the application is running."""
     return {"status": "ok", "message": "AI Agent Chat App is running"}
+
+
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """Readiness for the load balancer: 503 once the instance is draining."""
+    if drain_controller.draining:
+        return JSONResponse(
+            status_code=503, content={"status": "draining", "ready": False}
+        )
+    return {"status": "ok", "ready": True}
+
+
+# --- Metrics Endpoint (Prometheus text format) ---
+# State-size gauges are read only when scraped
+metrics_registry.gauge(
+    "ws_active_connections",
+    "Currently connected WebSocket clients.",
+    callback=lambda: len(connection_manager.active_connections),
+)
+metrics_registry.gauge(
+    "chat_sessions",
+    "Sessions held in memory.",
+    callback=lambda: len(chat_manager.sessions),
+)
+metrics_registry.gauge(
+    "chat_topics", "Topics held in memory.", callback=lambda: len(chat_manager.topics)
+)
+metrics_registry.gauge(
+    "agent_generations_active",
+    "Agent generations currently running.",
+    callback=lambda: generation_limiter.active,
+)
+metrics_registry.gauge(
+    "agent_generation_queue_depth",
+    "Agent generations waiting for a free slot.",
+    callback=lambda: generation_limiter.queued,
+)
+metrics_registry.gauge(
+    "rate_limit_buckets",
+    "Per-client rate-limit buckets held in memory.",
+    callback=lambda: len(rate_limiter),
+)
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """Exposes application metrics for Prometheus scraping."""
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,8 +1,12 @@
+import functools
+import sys
+import time
 import uuid
 
-from pydantic import BaseModel, Field
-from typing import Literal
-from datetime import datetime, timezone
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, field_serializer
+from pydantic_core import core_schema
+from typing import Any, Literal
+from datetime import datetime, timedelta, timezone
 
 
 # Helper for timestamping with timezone awareness
@@ -11,9 +15,66 @@ def now_tz():
     return datetime.now(timezone.utc)
 
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def now_us() -> int:
+    """Current time as integer microseconds since the epoch (storage timestamps)."""
+    return time.time_ns() // 1000
+
+
+def to_epoch_us(value: datetime) -> int:
+    if value.tzinfo is None:  # Naive timestamps are taken to be UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_epoch_us(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def pack_id(value: str) -> int | str:
+    """
+    Canonical UUID strings are stored as their 128-bit integer (about half
+    the size of the 36-char string); any other id is kept as given.
+    """
+    if len(value) == 36:
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            return value
+        if str(parsed) == value:
+            return parsed.int
+    return value
+
+
+def unpack_id(value: int | str) -> str:
+    if isinstance(value, str):
+        return value
+    # Same text as str(uuid.UUID(int=value)), without building a UUID
+    h = value.to_bytes(16).hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def iso_from_epoch_us(value: int) -> str:
+    """JSON form of a storage timestamp, as Pydantic writes UTC datetimes."""
+    seconds, micros = divmod(value, 1_000_000)
+    minutes, seconds = divmod(seconds, 60)
+    text = f"{_minute_prefix(minutes)}{seconds:02d}"
+    return f"{text}.{micros:06d}Z" if micros else f"{text}Z"
+
+
+@functools.lru_cache(maxsize=1024)
+def _minute_prefix(minutes: int) -> str:
+    # A topic's messages mostly fall in few distinct minutes; format each once
+    return time.strftime("%Y-%m-%dT%H:%M:", time.gmtime(minutes * 60))
+
+
 class Message(BaseModel):
     """
     Represents a single message within a chat topic.
+    This is the API model; topics store messages as StoredMessage records.
     """
 
     # ID must be provided during instantiation (generated in ChatManager)
@@ -22,11 +83,15 @@ class Message(BaseModel):
     sender: Literal["user", "agent", "system"]  # Enforce allowed sender types
     content: str
     timestamp: datetime = Field(default_factory=now_tz)
+    # Agent that wrote an agent message; topics asked with several agents hold
+    # one response per agent for the same user message
+    agent_id: str | None = None
 
 
 class TaskResult(BaseModel):
     """
     Represents the result of an asynchronous task associated with a topic.
+    API model; stored as StoredTaskResult records.
     """
 
     # ID must be provided during instantiation (generated in ChatManager)
@@ -36,6 +101,124 @@ class TaskResult(BaseModel):
     timestamp: datetime = Field(default_factory=now_tz)
 
 
+# --- Storage records ---
+# What a Topic actually keeps per message/task result: a slotted object with
+# a packed id, an integer timestamp and no topic_id (implied by the topic that
+# holds it). Records are built without validation in the hot path. Outbound
+# WebSocket payloads are written straight from records (to_json, same JSON as
+# the models); Message and TaskResult models are only produced for exports and
+# persistence (to_model).
+# Pydantic validates either a record or its API model (converted) into a
+# record, so snapshot and import formats are unchanged.
+
+
+class _StoredRecord:
+    __slots__ = ()
+    _model: type[BaseModel]
+
+    @classmethod
+    def from_model(cls, model: Any):
+        raise NotImplementedError
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        from_model = core_schema.no_info_after_validator_function(
+            cls.from_model, handler.generate_schema(cls._model)
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_model,
+            python_schema=core_schema.union_schema(
+                [core_schema.is_instance_schema(cls), from_model]
+            ),
+        )
+
+
+class StoredMessage(_StoredRecord):
+    """Compact storage form of a Message."""
+
+    __slots__ = ("id", "sender", "content", "timestamp", "agent_id")
+    _model = Message
+
+    def __init__(
+        self,
+        id: int | str,
+        sender: str,
+        content: str,
+        timestamp: int,
+        agent_id: str | None = None,
+    ):
+        self.id = id  # pack_id() form
+        self.sender = sender
+        self.content = content
+        self.timestamp = timestamp  # Microseconds since the epoch, UTC
+        self.agent_id = agent_id
+
+    @classmethod
+    def from_model(cls, model: Message) -> "StoredMessage":
+        return cls(
+            pack_id(model.id),
+            sys.intern(model.sender),
+            model.content,
+            to_epoch_us(model.timestamp),
+            sys.intern(model.agent_id) if model.agent_id else None,
+        )
+
+    def to_model(self, topic_id: str) -> Message:
+        return Message(
+            id=unpack_id(self.id),
+            topic_id=topic_id,
+            sender=self.sender,
+            content=self.content,
+            timestamp=from_epoch_us(self.timestamp),
+            agent_id=self.agent_id,
+        )
+
+    def to_json(self, topic_id: str) -> dict:
+        """Same as to_model(topic_id).model_dump(mode="json"), without the model."""
+        return {
+            "id": unpack_id(self.id),
+            "topic_id": topic_id,
+            "sender": self.sender,
+            "content": self.content,
+            "timestamp": iso_from_epoch_us(self.timestamp),
+            "agent_id": self.agent_id,
+        }
+
+
+class StoredTaskResult(_StoredRecord):
+    """Compact storage form of a TaskResult."""
+
+    __slots__ = ("id", "content", "timestamp")
+    _model = TaskResult
+
+    def __init__(self, id: int | str, content: str, timestamp: int):
+        self.id = id
+        self.content = content
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_model(cls, model: TaskResult) -> "StoredTaskResult":
+        return cls(pack_id(model.id), model.content, to_epoch_us(model.timestamp))
+
+    def to_model(self, topic_id: str) -> TaskResult:
+        return TaskResult(
+            id=unpack_id(self.id),
+            topic_id=topic_id,
+            content=self.content,
+            timestamp=from_epoch_us(self.timestamp),
+        )
+
+    def to_json(self, topic_id: str) -> dict:
+        return {
+            "id": unpack_id(self.id),
+            "topic_id": topic_id,
+            "content": self.content,
+            "timestamp": iso_from_epoch_us(self.timestamp),
+        }
+
+
 class Topic(BaseModel):
     """
     Represents a single chat conversation topic.
@@ -45,13 +228,24 @@ class Topic(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_id: str = Field(...)
     agent_id: str = Field(...)
-    name: str = Field(...)
-    messages: list[Message] = []
-    task_results: list[TaskResult] = Field(
+    name: str | None = None  # Unnamed topics are listed as "Chat N"
+    messages: list[StoredMessage] = Field(default_factory=list)
+    task_results: list[StoredTaskResult] = Field(
         default_factory=list
     )  # List of task results for the topic
     timestamp: datetime = Field(default_factory=now_tz)  # Topic creation timestamp
 
+    # Serialized as API models, so dumps carry each entry's topic_id
+    @field_serializer("messages")
+    def _dump_messages(self, messages: list[StoredMessage]) -> list[Message]:
+        return [message.to_model(self.id) for message in messages]
+
+    @field_serializer("task_results")
+    def _dump_task_results(
+        self, task_results: list[StoredTaskResult]
+    ) -> list[TaskResult]:
+        return [result.to_model(self.id) for result in task_results]
+
 
 class Session(BaseModel):
     """
@@ -60,6 +254,9 @@ class Session(BaseModel):
 
     client_id: str  # Unique identifier for the client session
     active_topic_id: str | None = None  # ID of the currently selected topic
+    # Topics created so far; numbers the default "Chat N" names, which stay
+    # stable when other topics are deleted
+    topics_created: int = 0
     last_activity: datetime = Field(
         default_factory=now_tz
     )  # Timestamp of the last interaction
@@ -1,6 +1,88 @@
-from pydantic import BaseModel, Field
+import math
+import random
+from typing import Annotated, Literal, Union
+
+from pydantic import BaseModel, Field, model_validator
 import uuid
 
+# --- Distributions for synthetic agents ---
+# Each samples with the caller's random.Random, so a seeded generator
+# reproduces the same draws.
+
+
+class Constant(BaseModel):
+    kind: Literal["constant"] = "constant"
+    value: float
+
+    def sample(self, rng: random.Random) -> float:
+        return self.value
+
+
+class Uniform(BaseModel):
+    kind: Literal["uniform"] = "uniform"
+    low: float
+    high: float
+
+    @model_validator(mode="after")
+    def _ordered(self):
+        if self.low > self.high:
+            raise ValueError("low must not exceed high")
+        return self
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.uniform(self.low, self.high)
+
+
+class Normal(BaseModel):
+    kind: Literal["normal"] = "normal"
+    mean: float
+    stddev: float = Field(ge=0)
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.gauss(self.mean, self.stddev)
+
+
+class LogNormal(BaseModel):
+    """Right-skewed, like provider latencies and response lengths."""
+
+    kind: Literal["lognormal"] = "lognormal"
+    median: float = Field(gt=0)
+    sigma: float = Field(ge=0)  # Spread of the underlying normal
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.lognormvariate(math.log(self.median), self.sigma)
+
+
+Distribution = Annotated[
+    Union[Constant, Uniform, Normal, LogNormal], Field(discriminator="kind")
+]
+
+
+class SyntheticProfile(BaseModel):
+    """
+    Behavior of a synthetic agent (no network, no API key). Every generation
+    draws its time to first token, throughput, length and outcome from these
+    distributions with a generator derived from `seed`, so runs are
+    reproducible.
+    """
+
+    seed: int = 0
+    time_to_first_token_seconds: Distribution = LogNormal(median=0.6, sigma=0.5)
+    tokens_per_second: Distribution = Normal(mean=50, stddev=12)
+    response_tokens: Distribution = LogNormal(median=150, sigma=0.7)
+    max_response_tokens: int = Field(default=2048, ge=1)
+    tokens_per_chunk: int = Field(default=4, ge=1)  # Tokens sent per stream chunk
+    # Fraction of generations failing mid-stream, and hanging until timeout_seconds
+    error_rate: float = Field(default=0.0, ge=0, le=1)
+    timeout_rate: float = Field(default=0.0, ge=0, le=1)
+    timeout_seconds: float = Field(default=30.0, gt=0)
+
+    @model_validator(mode="after")
+    def _rates(self):
+        if self.error_rate + self.timeout_rate > 1:
+            raise ValueError("error_rate + timeout_rate must not exceed 1")
+        return self
+
 
 class LLMAgent(BaseModel):
     """
@@ -14,3 +96,5 @@ class LLMAgent(BaseModel):
     system_prompt: str | None = Field(default=None)
     temperature: float = Field(default=0.2, ge=0, le=2)
     top_p: float = Field(default=0.95, ge=0, le=1)
+    # When set, responses come from the synthetic backend with this profile
+    synthetic: SyntheticProfile | None = Field(default=None)
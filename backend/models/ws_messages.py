@@ -0,0 +1,90 @@
+from typing import Annotated, Literal, Union
+
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, TypeAdapter
+
+# --- Inbound WebSocket messages (client -> server) ---
+# Every frame is {"type": "...", "payload": {...}}. Frames are validated in a
+# single pass from the raw frame into one of these models, selected by 'type'.
+
+
+class InboundPayload(BaseModel):
+    # Unknown payload fields are ignored, as with the previous dict-based parsing
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+
+class SendMessagePayload(InboundPayload):
+    content: str = Field(min_length=1)
+    current_agent_id: str = Field(min_length=1)  # Agent selected in the UI
+    topic_id: str | None = None  # None starts a new topic
+    # Asks these agents at once, answering side by side in the topic (the
+    # topic keeps its agent); None asks only the topic's agent
+    agent_ids: list[Annotated[str, Field(min_length=1)]] | None = Field(
+        default=None, min_length=1
+    )
+    # Idempotency key generated by the client; resending the same message
+    # (e.g., after a reconnect) replays it instead of starting new work
+    client_message_id: str | None = Field(default=None, min_length=1, max_length=64)
+
+
+class SelectTopicPayload(InboundPayload):
+    topic_id: str = Field(min_length=1)
+
+
+class DeleteTopicPayload(InboundPayload):
+    topic_id: str = Field(min_length=1)
+
+
+class RenameTopicPayload(InboundPayload):
+    topic_id: str = Field(min_length=1)
+    name: Annotated[
+        str, StringConstraints(strip_whitespace=True, min_length=1, max_length=100)
+    ]
+
+
+class SendMessage(BaseModel):
+    type: Literal["send_message"]
+    payload: SendMessagePayload
+
+
+class SelectTopic(BaseModel):
+    type: Literal["select_topic"]
+    payload: SelectTopicPayload
+
+
+class DeleteTopic(BaseModel):
+    type: Literal["delete_topic"]
+    payload: DeleteTopicPayload
+
+
+class RenameTopic(BaseModel):
+    type: Literal["rename_topic"]
+    payload: RenameTopicPayload
+
+
+class ResyncTopics(BaseModel):
+    """Requests the full topic list again, e.g. after a missed topic event."""
+
+    type: Literal["resync_topics"]
+    payload: InboundPayload = InboundPayload()
+
+
+class Ping(BaseModel):
+    type: Literal["ping"]
+    payload: InboundPayload = InboundPayload()
+
+
+class Pong(BaseModel):
+    """Answer to a server heartbeat ping."""
+
+    type: Literal["pong"]
+    payload: InboundPayload = InboundPayload()
+
+
+InboundMessage = Annotated[
+    Union[SendMessage, SelectTopic, DeleteTopic, RenameTopic, ResyncTopics, Ping, Pong],
+    Field(discriminator="type"),
+]
+
+# Precompiled: parses and validates raw frame text/bytes without an
+# intermediate dict
+INBOUND_MESSAGE_ADAPTER: TypeAdapter[InboundMessage] = TypeAdapter(InboundMessage)
@@ -0,0 +1,204 @@
+import logging
+import secrets
+import zlib
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+
+from backend.config import settings
+from backend.services.chat_manager import chat_manager
+from backend.services.drain import DrainStatus, drain_controller
+from backend.services.loop_monitor import StallSample, loop_monitor
+from backend.services.memory_diagnostics import (
+    MemoryReport,
+    TracemallocDiff,
+    TracemallocStatus,
+    build_memory_report,
+    tracemalloc_tracker,
+)
+from backend.services.profiler import (
+    MAX_SECONDS,
+    ProfilerBusyError,
+    profile_collapsed,
+)
+from backend.services.state_transfer import (
+    ImportStats,
+    gzip_stream,
+    import_lines,
+    iter_export_lines,
+    iter_import_lines,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def require_admin_token(x_admin_token: str | None = Header(default=None)):
+    """
+    Guards admin routes with the shared secret from settings.
+    The admin API is disabled entirely when no token is configured.
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Admin API is disabled.")
+    if not x_admin_token or not secrets.compare_digest(
+        x_admin_token, settings.admin_token
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+router = APIRouter(
+    prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin_token)]
+)
+
+
+@router.get("/export")
+async def export_state(
+    compress: Literal["none", "gzip"] = Query(default="none"),
+) -> StreamingResponse:
+    """
+    Streams every session, topic, message and task result as NDJSON.
+    With compress=gzip the stream is gzip-compressed on the fly.
+    """
+    logger.info("Starting state export (compress=%s)", compress)
+    body = iter_export_lines(chat_manager)
+    if compress == "gzip":
+        return StreamingResponse(
+            gzip_stream(body),
+            media_type="application/gzip",
+            headers={
+                "Content-Disposition": 'attachment; filename="chat_state.ndjson.gz"'
+            },
+        )
+    return StreamingResponse(
+        body,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="chat_state.ndjson"'},
+    )
+
+
+@router.post("/import")
+async def import_state(
+    request: Request,
+    batch_size: int = Query(default=5000, ge=1, le=100_000),
+) -> ImportStats:
+    """
+    Loads an NDJSON export streamed in the request body, all or nothing:
+    if any record is invalid, no state is changed.
+    Compressed bodies are detected from the Content-Encoding (gzip, or
+    deflate meaning zlib-wrapped data as in RFC 9110) or Content-Type header;
+    raw deflate streams without the zlib header are rejected.
+    """
+    encoding = request.headers.get("content-encoding", "").lower()
+    content_type = request.headers.get("content-type", "").lower()
+    compressed = encoding in ("gzip", "deflate") or "gzip" in content_type
+    logger.info(
+        "Starting state import (compressed=%s, batch_size=%s)", compressed, batch_size
+    )
+    try:
+        return await import_lines(
+            chat_manager,
+            iter_import_lines(request.stream(), compressed=compressed),
+            batch_size=batch_size,
+        )
+    except ValidationError as e:
+        logger.warning("State import rejected: %s invalid records", e.error_count())
+        raise HTTPException(
+            status_code=400, detail=f"Invalid import record: {e.errors()[0]['msg']}"
+        )
+    except zlib.error as e:
+        logger.warning("State import rejected: undecodable body (%s)", e)
+        raise HTTPException(
+            status_code=400, detail="Body is not valid gzip or zlib data."
+        )
+
+
+@router.get("/memory")
+async def memory_report(top: int = Query(default=20, ge=1, le=1000)) -> MemoryReport:
+    """
+    Estimated bytes per session and topic, the largest of each, and
+    pending asyncio tasks grouped by coroutine name.
+    """
+    return await build_memory_report(chat_manager, top=top)
+
+
+@router.get("/memory/tracemalloc")
+async def tracemalloc_status() -> TracemallocStatus:
+    return tracemalloc_tracker.status()
+
+
+@router.post("/memory/tracemalloc/start")
+async def tracemalloc_start(
+    frames: int = Query(default=1, ge=1, le=50),
+) -> TracemallocStatus:
+    """Starts allocation tracing (slows the process until stopped)."""
+    return tracemalloc_tracker.start(frames)
+
+
+@router.post("/memory/tracemalloc/snapshot")
+async def tracemalloc_snapshot(
+    top: int = Query(default=25, ge=1, le=500),
+) -> TracemallocDiff:
+    """
+    Takes a snapshot and returns the top allocation changes since the
+    previous one; the first snapshot after start only records a baseline.
+    """
+    try:
+        return await tracemalloc_tracker.snapshot(top=top)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/memory/tracemalloc/stop")
+async def tracemalloc_stop() -> TracemallocStatus:
+    return tracemalloc_tracker.stop()
+
+
+@router.get("/loop/stalls")
+async def loop_stalls() -> list[StallSample]:
+    """Most recent event-loop stalls with the loop thread's stack, newest last."""
+    if not loop_monitor.running:
+        raise HTTPException(
+            status_code=409, detail="Event-loop monitor is not enabled."
+        )
+    return list(loop_monitor.samples)
+
+
+@router.post("/drain", status_code=202)
+async def start_drain(
+    deadline_seconds: float | None = Query(default=None, gt=0, le=3600),
+) -> DrainStatus:
+    """
+    Starts draining this instance before a deploy: /ready turns 503, new
+    connections and messages are refused, clients get a reconnect hint, and
+    in-flight work has until the deadline (default from settings) to finish.
+    Poll GET /admin/drain until `done`, then stop the process.
+    """
+    drain_controller.start(deadline_seconds)
+    return drain_controller.status()
+
+
+@router.get("/drain")
+async def drain_status() -> DrainStatus:
+    return drain_controller.status()
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(default=10.0, gt=0, le=MAX_SECONDS),
+    interval_ms: float = Query(default=10.0, ge=1, le=1000),
+    include_idle: bool = Query(default=False),
+) -> PlainTextResponse:
+    """
+    Samples every thread of this worker (event loop and executors) for
+    `seconds` and returns collapsed stacks for flamegraph.pl or speedscope.
+    Idle threads are left out unless include_idle is set.
+    """
+    try:
+        body = await profile_collapsed(seconds, interval_ms / 1000, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        body,
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
@@ -1,24 +1,77 @@
-from fastapi import APIRouter, Request
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 import logging
 
+from backend.services.static_assets import (
+    CachedPage,
+    CompressedBody,
+    directory_fingerprint,
+    static_assets,
+    static_responses_total,
+)
+
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Web Interface"])
 
-# Configure Jinja2 templates
-# Assumes templates are in 'app/templates' relative to the project root
-templates = Jinja2Templates(directory="app/templates")
+# Configure Jinja2 templates, located next to the routers package
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
+
+
+def _render_index() -> str:
+    # The page does not depend on the request, so one rendering serves everyone
+    return templates.get_template("index.html").render(static_url=static_assets.url_for)
+
+
+def _index_fingerprint() -> tuple:
+    # Reloading assets first lets an edited asset change the page's hashed URLs
+    # (runs in a worker thread, see CachedPage)
+    static_assets.load()
+    return directory_fingerprint(TEMPLATES_DIR), static_assets.version
 
 
-@router.get("/", response_class=HTMLResponse)
+index_page = CachedPage(_render_index, _index_fingerprint)
+
+
+def _cached_response(
+    request: Request, body: CompressedBody, cache_control: str, kind: str
+) -> Response:
+    status, headers, content = body.respond(
+        request.headers.get("accept-encoding"),
+        request.headers.get("if-none-match"),
+        cache_control,
+    )
+    # A 304 sends no body, so it has no encoding
+    encoding = headers.get("Content-Encoding", "identity" if content else "none")
+    static_responses_total.labels(kind, str(status), encoding).inc()
+    return Response(content, status_code=status, headers=headers)
+
+
+@router.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
 async def get_index_page(request: Request):
     """
     Serves the main HTML page for the single-page application.
+    The page is rendered once per template/asset change and revalidated
+    by browsers with its ETag (304 when unchanged).
     """
-    logger.info(f"Serving index.html for request: {request.url}")
-    # Pass the request object to the template, necessary for Jinja2/Starlette
-    return templates.TemplateResponse("index.html", {"request": request})
+    logger.debug("Serving index.html for request: %s", request.url)
+    return _cached_response(request, await index_page.get(), "no-cache", "index")
 
 
-# You could add other web routes here if needed (e.g., /about page)
+@router.api_route(
+    "/static/{asset_path:path}", methods=["GET", "HEAD"], include_in_schema=False
+)
+async def get_static_asset(request: Request, asset_path: str):
+    """
+    Serves CSS/JS from memory, precompressed. Content-hashed URLs (as linked
+    from the page) are cached as immutable; plain URLs are revalidated.
+    """
+    found = static_assets.lookup(asset_path)
+    if found is None:
+        static_responses_total.labels("asset", "404", "none").inc()
+        raise HTTPException(status_code=404, detail="Not Found")
+    body, cache_control = found
+    return _cached_response(request, body, cache_control, "asset")
@@ -1,14 +1,317 @@
+import asyncio
 import json
 import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from backend.services.connection_manager import connection_manager
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.trace import Span, StatusCode
+from pydantic import BaseModel, ValidationError
+
+from backend.config import settings
+from backend.models.ws_messages import (
+    INBOUND_MESSAGE_ADAPTER,
+    DeleteTopic,
+    Ping,
+    Pong,
+    RenameTopic,
+    ResyncTopics,
+    SelectTopic,
+    SendMessage,
+)
+from backend.services.admission import (
+    AdmissionRejected,
+    GenerationTicket,
+    generation_limiter,
+    rate_limiter,
+)
+from backend.services.connection_manager import EncodedFrame, connection_manager
+from backend.services.drain import drain_controller
 from backend.services.chat_manager import chat_manager
 from backend.services.agent_manager import agent_manager
+from backend.services.metrics import ws_message_handling_seconds
+from backend.services.tracing import start_action_span
+from backend.logging_config import LogSampler
 
 logger = logging.getLogger(__name__)
+_receive_log_sampler = LogSampler(logger, logging.DEBUG, "ws.receive")
 router = APIRouter(prefix="/ws", tags=["WebSocket"])
 
 
+# ==================================
+# Inbound Message Handlers
+# ==================================
+# One handler per inbound message model. Dispatch is a single dict lookup on
+# the validated model's class, so adding message types does not lengthen it.
+# Handlers that can run for long (a send_message lasts until every agent has
+# answered) run in their own task, so the receive loop keeps reading frames
+# meanwhile: heartbeat answers included, or the connection would be reaped.
+
+InboundHandler = Callable[[str, Any], Awaitable[None]]
+_handlers: dict[type[BaseModel], InboundHandler] = {}
+_task_handlers: set[type[BaseModel]] = set()  # Models handled in their own task
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def handles(message_model: type[M], *, in_task: bool = False):
+    """
+    Registers the decorated coroutine as the handler for `message_model`.
+    With `in_task`, each message is handled in a task of its own instead of
+    inline in the connection's receive loop.
+    """
+
+    def register(
+        handler: Callable[[str, M], Awaitable[None]],
+    ) -> Callable[[str, M], Awaitable[None]]:
+        if message_model in _handlers:
+            raise ValueError(f"Handler for {message_model.__name__} already registered")
+        _handlers[message_model] = handler
+        if in_task:
+            _task_handlers.add(message_model)
+        return handler
+
+    return register
+
+
+async def send_error(client_id: str, detail: str):
+    await connection_manager.send_json(
+        {"type": "error", "payload": {"detail": detail}}, client_id
+    )
+
+
+@handles(SendMessage, in_task=True)
+async def handle_send_message(client_id: str, message: SendMessage):
+    # A resent message (same idempotency key) is replayed, not processed
+    # again: it is not admission-controlled as it starts no new work
+    key = message.payload.client_message_id
+    if key:
+        submission = chat_manager.find_submission(client_id, key)
+        if submission is not None:
+            await chat_manager.replay_submission(client_id, key, submission)
+            return
+    try:
+        # Admission control: draining and per-client rate here, global
+        # generation capacity before anything is created (see below)
+        drain_controller.check()
+        rate_limiter.check(client_id)
+        await _process_send_message(client_id, message)
+    except AdmissionRejected as rejection:
+        await chat_manager.send_rate_limited(client_id, rejection, key)
+
+
+async def _process_send_message(client_id: str, message: SendMessage):
+    content = message.payload.content
+    # Agent selected in the UI when the message was sent
+    current_agent_id = message.payload.current_agent_id
+    received_topic_id = message.payload.topic_id
+    key = message.payload.client_message_id  # Idempotency key
+    # Several agents asked at once (fan-out); duplicates are asked once
+    agent_ids = (
+        list(dict.fromkeys(message.payload.agent_ids))
+        if message.payload.agent_ids
+        else None
+    )
+    if agent_ids:
+        if len(agent_ids) > settings.max_fanout_agents:
+            await send_error(
+                client_id,
+                f"At most {settings.max_fanout_agents} agents can be asked at once.",
+            )
+            return
+        unknown = [a for a in agent_ids if agent_manager.get_agent_by_id(a) is None]
+        if unknown:
+            await send_error(client_id, f"Unknown agents: {', '.join(unknown)}.")
+            return
+
+    # Generation slots (or queue places) are reserved before a topic is
+    # created, so a rejected request leaves no empty topic behind. Raises
+    # AdmissionRejected; tickets no generation used are given back at the end
+    tickets = generation_limiter.reserve_many(len(agent_ids) if agent_ids else 1)
+    try:
+        # Scenario 1: Start a new chat topic
+        if received_topic_id is None:
+            logger.info(
+                "First message in new topic flow for client '%s' with agent '%s'",
+                client_id,
+                current_agent_id,
+            )
+            new_topic = await chat_manager.create_topic(client_id, current_agent_id)
+            if new_topic:
+                # Process the message within the new topic context
+                await chat_manager.add_message_and_process(
+                    client_id, new_topic.id, content, agent_ids, key, tickets
+                )
+                # Explicitly tell frontend the new topic is now active
+                await chat_manager.send_active_topic_update(client_id, new_topic.id)
+            else:
+                # Handle potential failure to create topic
+                logger.error("Failed to create new topic for client '%s'", client_id)
+                await send_error(client_id, "Failed to start new chat.")
+            return
+
+        # Determine if this message belongs to an existing topic
+        topic = chat_manager.get_topic(received_topic_id)
+
+        # Scenario 2: Agent changed mid-conversation for an existing topic
+        # (a fan-out stays in the topic: the agents answer side by side)
+        if topic and not agent_ids and topic.agent_id != current_agent_id:
+            logger.info(
+                "Agent changed mid-topic for client '%s'. Creating new topic with agent '%s'.",
+                client_id,
+                current_agent_id,
+            )
+            # Service function handles creating new topic, setting active, processing message
+            new_topic_id = await chat_manager.change_agent_for_topic(
+                client_id, received_topic_id, current_agent_id, content, key, tickets
+            )
+            if new_topic_id:
+                # Inform frontend about the new active topic ID
+                await chat_manager.send_active_topic_update(client_id, new_topic_id)
+            else:
+                logger.error(
+                    "Failed to create new topic during agent change for client '%s'",
+                    client_id,
+                )
+                await send_error(client_id, "Failed to switch agent.")
+
+        # Scenario 3: Standard message to an existing topic
+        elif topic:
+            await chat_manager.add_message_and_process(
+                client_id, received_topic_id, content, agent_ids, key, tickets
+            )
+
+        # Scenario 4: Message sent with a topic_id that doesn't exist
+        else:
+            logger.warning(
+                "Received message for non-existent topic_id '%s' from client '%s'. Ignoring.",
+                received_topic_id,
+                client_id,
+            )
+            await send_error(client_id, f"Topic '{received_topic_id}' not found.")
+    finally:
+        for ticket in tickets:
+            ticket.discard()
+
+
+@handles(SelectTopic)
+async def handle_select_topic(client_id: str, message: SelectTopic):
+    # Client requests to view a different topic
+    topic_id = message.payload.topic_id
+    topic = chat_manager.get_topic(topic_id)
+    session = chat_manager.sessions.get(client_id)
+    # Validate topic existence, ownership, and session
+    if not (topic and session and topic.client_id == client_id):
+        logger.warning(
+            "Client '%s' tried to select invalid/mismatched topic '%s'",
+            client_id,
+            topic_id,
+        )
+        await send_error(client_id, f"Cannot select topic '{topic_id}'.")
+        return
+
+    logger.info("Client '%s' selected topic '%s'", client_id, topic_id)
+    session.active_topic_id = topic_id  # Update server-side session state
+    # Send the full message/result history for the selected topic
+    await chat_manager.send_full_topic_state(client_id, topic_id)
+    # Confirm the active topic change to the frontend
+    await chat_manager.send_active_topic_update(client_id, topic_id)
+
+
+@handles(RenameTopic)
+async def handle_rename_topic(client_id: str, message: RenameTopic):
+    topic_id = message.payload.topic_id
+    if not await chat_manager.rename_topic(client_id, topic_id, message.payload.name):
+        await send_error(client_id, f"Cannot rename topic '{topic_id}'.")
+
+
+@handles(DeleteTopic)
+async def handle_delete_topic(client_id: str, message: DeleteTopic):
+    topic_id = message.payload.topic_id
+    if not await chat_manager.delete_topic(client_id, topic_id):
+        await send_error(client_id, f"Cannot delete topic '{topic_id}'.")
+
+
+@handles(ResyncTopics)
+async def handle_resync_topics(client_id: str, message: ResyncTopics):
+    # Client lost track of its topic list; resend it along with the active topic
+    session = chat_manager.sessions.get(client_id)
+    active_topic_id = session.active_topic_id if session else None
+    logger.info("Client '%s' requested a topic resync", client_id)
+    await chat_manager.send_topic_list_update(client_id)
+    await chat_manager.send_active_topic_update(client_id, active_topic_id)
+    if active_topic_id:
+        await chat_manager.send_full_topic_state(client_id, active_topic_id)
+
+
+@handles(Ping)
+async def handle_ping(client_id: str, message: Ping):
+    # Simple keepalive mechanism initiated by client
+    await connection_manager.send_json({"type": "pong"}, client_id)
+
+
+@handles(Pong)
+async def handle_pong(client_id: str, message: Pong):
+    # Heartbeat answer; receiving any frame already refreshed liveness
+    pass
+
+
+def _rejection(error: ValidationError) -> tuple[str, str]:
+    """Maps a decoding error to (metric label, detail sent to the client)."""
+    first = error.errors(include_url=False)[0]
+    if first["type"] == "json_invalid":
+        return "invalid", "Message is not valid JSON."
+    if first["type"] in ("union_tag_invalid", "union_tag_not_found"):
+        return "unknown", "Unknown or missing message type."
+    location = ".".join(str(part) for part in first["loc"][1:])
+    return "invalid", f"Invalid message field '{location}': {first['msg']}"
+
+
+async def _report_handler_error(client_id: str, span: Span, error: Exception):
+    """Records an unexpected handler error and tells the client, if still there."""
+    span.record_exception(error)
+    span.set_status(StatusCode.ERROR, str(error))
+    logger.error(
+        "Error processing message from client '%s': %s",
+        client_id,
+        error,
+        exc_info=error,
+    )
+    # Attempt to send a generic error message back to the client
+    try:
+        await send_error(client_id, "Internal server error processing your request.")
+    except Exception:
+        pass  # Avoid cascading errors if sending the error fails
+
+
+async def _handle_in_task(
+    client_id: str, message: BaseModel, span: Span, received_at: float
+):
+    """Runs a handler registered with in_task=True and ends its action span."""
+    try:
+        await _handlers[type(message)](client_id, message)
+    except Exception as e:
+        await _report_handler_error(client_id, span, e)
+    finally:
+        ws_message_handling_seconds.labels(message.type).observe(
+            time.perf_counter() - received_at
+        )
+        span.update_name(f"ws.{message.type}")
+        span.end()
+
+
+async def _receive_frame(websocket: WebSocket) -> str | bytes:
+    """Returns the next text or binary frame without decoding it."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    text = message.get("text")
+    return text if text is not None else message.get("bytes") or b""
+
+
 @router.websocket("/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     """
@@ -16,10 +319,18 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
 
     - Accepts connection and registers with ConnectionManager.
     - Handles initial state synchronization (agents, topics, active topic).
-    - Listens for incoming messages from the client.
-    - Routes client messages to appropriate ChatManager actions.
+    - Decodes each incoming frame into a typed message in a single pass.
+    - Dispatches messages to the handler registered for their type
+      (send_message in its own task, so frames keep being read).
     - Handles disconnection and cleanup.
     """
+    # A draining instance takes no new connections (closing before accept
+    # rejects the handshake); the load balancer sends the client elsewhere
+    if drain_controller.draining:
+        logger.info("Refusing connection from '%s': server is draining", client_id)
+        await websocket.close(code=1013, reason="Server draining")
+        return
+
     # Attempt to connect and register the client
     connected = await connection_manager.connect(websocket, client_id)
     if not connected:
@@ -27,6 +338,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
         return
 
     initial_topic_id: str | None = None  # Ensure defined scope
+    max_size = settings.ws_max_inbound_message_size
     try:
         # --- Initial Connection Setup ---
         # Handle session creation or retrieval for the connecting client
@@ -35,18 +347,23 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
 
         # Send essential initial state for the frontend to initialize
         logger.info(
-            f"Sending initial state for '{client_id}'. Active topic ID: {initial_topic_id}"
+            "Sending initial state for '%s'. Active topic ID: %s",
+            client_id,
+            initial_topic_id,
         )
-        agents = agent_manager.list_agents()
+        # The agent catalog is serialized once per catalog version, not per handshake
         await connection_manager.send_json(
-            {
-                "type": "initial_state",
-                "payload": {
-                    "client_id": client_id,
-                    "agents": [agent.model_dump() for agent in agents],
-                    "active_topic_id": initial_topic_id,  # Can be null
-                },
-            },
+            EncodedFrame(
+                "initial_state",
+                '{"type":"initial_state","payload":{"client_id":%s,'
+                '"active_topic_id":%s,"agents_version":%d,"agents":%s}}'
+                % (
+                    json.dumps(client_id, ensure_ascii=False),
+                    json.dumps(initial_topic_id),  # Can be null
+                    agent_manager.version,
+                    agent_manager.catalog_json(),
+                ),
+            ),
             client_id,
         )
 
@@ -55,225 +372,118 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
 
         # If reconnecting to an existing active topic, send its full state
         if initial_topic_id:
-            logger.info(f"Sending initial full state for topic '{initial_topic_id}'")
+            logger.info("Sending initial full state for topic '%s'", initial_topic_id)
             await chat_manager.send_full_topic_state(client_id, initial_topic_id)
         else:
             # Expected for new sessions, frontend shows welcome screen
             logger.info(
-                f"No initial active topic for client '{client_id}'; welcome state expected."
+                "No initial active topic for client '%s'; welcome state expected.",
+                client_id,
             )
 
         # ==================================
         # Main Message Processing Loop
         # ==================================
         while True:
-            # Wait for a message from the client
-            data = await websocket.receive_text()
+            # Wait for a frame from the client
+            data = await _receive_frame(websocket)
+            received_at = time.perf_counter()
+            # Any frame proves the connection is alive (see heartbeats)
+            connection_manager.touch(client_id)
+            # Metric label: the validated type, or why the frame was rejected
+            metric_type = "invalid"
+            # Root span of this action's trace; named after the type when it ends
+            span = start_action_span("ws.message", {"client_id": client_id})
+            span_token = otel_context.attach(trace.set_span_in_context(span))
             try:
-                # Parse the incoming JSON message
-                message_data = json.loads(data)
-                message_type = message_data.get("type")
-                payload = message_data.get("payload", {})
-                # Get topic_id from payload if present, used by several actions
-                received_topic_id = payload.get("topic_id")
-
-                logger.debug(
-                    f"Received message type: '{message_type}' from '{client_id}'"
-                )
+                # Reject oversized frames before parsing anything
+                if len(data) > max_size:
+                    metric_type = "oversize"
+                    span.set_status(StatusCode.ERROR, "frame too large")
+                    logger.warning(
+                        "Rejected %s-long frame from '%s' (limit %s)",
+                        len(data),
+                        client_id,
+                        max_size,
+                    )
+                    await send_error(
+                        client_id, f"Message too large (limit {max_size})."
+                    )
+                    continue
 
-                # Update session activity on any valid message reception
-                chat_manager._update_last_activity(client_id)
+                # Parse and validate in one pass into a typed message
+                try:
+                    message = INBOUND_MESSAGE_ADAPTER.validate_json(data)
+                except ValidationError as e:
+                    metric_type, detail = _rejection(e)
+                    span.set_status(StatusCode.ERROR, detail)
+                    logger.warning("Rejected message from '%s': %s", client_id, detail)
+                    await send_error(client_id, detail)
+                    continue
 
-                # --- Route message based on its type ---
-                if message_type == "send_message":
-                    content = payload.get("content")
-                    # Agent selected in the UI when the message was sent
-                    current_agent_id = payload.get("current_agent_id")
-
-                    # Validate required payload fields
-                    if not content or not current_agent_id:
-                        logger.warning(
-                            f"Missing content or current_agent_id for send_message from '{client_id}'"
-                        )
-                        continue  # Ignore invalid message
-
-                    # Determine if this message starts a new topic or belongs to an existing one
-                    topic = (
-                        chat_manager.get_topic(received_topic_id)
-                        if received_topic_id
-                        else None
+                metric_type = message.type
+                topic_id = getattr(message.payload, "topic_id", None)
+                if topic_id:
+                    span.set_attribute("topic_id", topic_id)
+                if _receive_log_sampler.should_log():
+                    logger.debug(
+                        "Received message type: '%s' from '%s'",
+                        message.type,
+                        client_id,
+                        extra={"client_id": client_id, "message_type": metric_type},
                     )
 
-                    # Scenario 1: Start a new chat topic
-                    if received_topic_id is None:
-                        logger.info(
-                            f"First message in new topic flow for client '{client_id}' with agent '{current_agent_id}'"
-                        )
-                        new_topic = await chat_manager.create_topic(
-                            client_id, current_agent_id
-                        )
-                        if new_topic:
-                            # Process the message within the new topic context
-                            await chat_manager.add_message_and_process(
-                                client_id, new_topic.id, content
-                            )
-                            # Explicitly tell frontend the new topic is now active
-                            await chat_manager.send_active_topic_update(
-                                client_id, new_topic.id
-                            )
-                        else:
-                            # Handle potential failure to create topic
-                            logger.error(
-                                f"Failed to create new topic for client '{client_id}'"
-                            )
-                            await connection_manager.send_json(
-                                {
-                                    "type": "error",
-                                    "payload": {"detail": "Failed to start new chat."},
-                                },
-                                client_id,
-                            )
-
-                    # Scenario 2: Agent changed mid-conversation for an existing topic
-                    elif topic and topic.agent_id != current_agent_id:
-                        logger.info(
-                            f"Agent changed mid-topic for client '{client_id}'. Creating new topic with agent '{current_agent_id}'."
-                        )
-                        # Service function handles creating new topic, setting active, processing message
-                        new_topic_id = await chat_manager.change_agent_for_topic(
-                            client_id, received_topic_id, current_agent_id, content
-                        )
-                        if new_topic_id:
-                            # Inform frontend about the new active topic ID
-                            await chat_manager.send_active_topic_update(
-                                client_id, new_topic_id
-                            )
-                        else:
-                            logger.error(
-                                f"Failed to create new topic during agent change for client '{client_id}'"
-                            )
-                            await connection_manager.send_json(
-                                {
-                                    "type": "error",
-                                    "payload": {"detail": "Failed to switch agent."},
-                                },
-                                client_id,
-                            )
-
-                    # Scenario 3: Standard message to an existing topic
-                    elif topic:
-                        # Process message within the existing topic context
-                        await chat_manager.add_message_and_process(
-                            client_id, received_topic_id, content
-                        )
-
-                    # Scenario 4: Message sent with a topic_id that doesn't exist
-                    else:  # topic is None but received_topic_id was not None
-                        logger.warning(
-                            f"Received message for non-existent topic_id '{received_topic_id}' from client '{client_id}'. Ignoring."
-                        )
-                        await connection_manager.send_json(
-                            {
-                                "type": "error",
-                                "payload": {
-                                    "detail": f"Topic '{received_topic_id}' not found."
-                                },
-                            },
-                            client_id,
-                        )
-
-                elif message_type == "select_topic":
-                    # Client requests to view a different topic
-                    if received_topic_id:
-                        topic = chat_manager.get_topic(received_topic_id)
-                        session = chat_manager.sessions.get(client_id)
-                        # Validate topic existence, ownership, and session
-                        if topic and session and topic.client_id == client_id:
-                            logger.info(
-                                f"Client '{client_id}' selected topic '{received_topic_id}'"
-                            )
-                            session.active_topic_id = (
-                                received_topic_id  # Update server-side session state
-                            )
-                            # Send the full message/result history for the selected topic
-                            await chat_manager.send_full_topic_state(
-                                client_id, received_topic_id
-                            )
-                            # Confirm the active topic change to the frontend
-                            await chat_manager.send_active_topic_update(
-                                client_id, received_topic_id
-                            )
-                        else:
-                            # Log and optionally inform client of invalid selection
-                            logger.warning(
-                                f"Client '{client_id}' tried to select invalid/mismatched topic '{received_topic_id}'"
-                            )
-                            await connection_manager.send_json(
-                                {
-                                    "type": "error",
-                                    "payload": {
-                                        "detail": f"Cannot select topic '{received_topic_id}'."
-                                    },
-                                },
-                                client_id,
-                            )
-                    else:
-                        logger.warning(
-                            f"Missing topic_id for 'select_topic' message from '{client_id}'"
-                        )
-
-                elif message_type == "ping":
-                    # Simple keepalive mechanism initiated by client
-                    await connection_manager.send_json({"type": "pong"}, client_id)
-
-                # TODO: Add handlers for other client actions (e.g., delete topic, rename topic)
-
-                else:
-                    # Handle unknown message types
-                    logger.warning(
-                        f"Unknown message type '{message_type}' received from '{client_id}'"
+                # Update session activity on any valid message reception
+                chat_manager._update_last_activity(client_id)
+                if type(message) in _task_handlers:
+                    # The task inherits the current context (this action's
+                    # span) and ends the span itself. Tracked with the
+                    # background tasks so a drain waits for it; it is not
+                    # cancelled if the connection closes first
+                    task = asyncio.create_task(
+                        _handle_in_task(client_id, message, span, received_at)
                     )
+                    chat_manager.background_tasks.add(task)
+                    task.add_done_callback(chat_manager.background_tasks.discard)
+                    span = None
+                    continue
+                await _handlers[type(message)](client_id, message)
 
             # --- Inner Exception Handling (Message Processing Loop) ---
-            except json.JSONDecodeError:
-                logger.error(f"Received invalid JSON from client '{client_id}': {data}")
-                # Optionally send error back to client
             except WebSocketDisconnect:
                 # This indicates the client disconnected while processing a message
                 logger.warning(
-                    f"WebSocket disconnected during message processing loop for '{client_id}'."
+                    "WebSocket disconnected during message processing loop for '%s'.",
+                    client_id,
                 )
                 raise  # Re-raise to be caught by the outer handler
             except Exception as e:
                 # Catch unexpected errors during the processing of a single message
-                logger.error(
-                    f"Error processing message from client '{client_id}': {e}",
-                    exc_info=True,
-                )
-                # Attempt to send a generic error message back to the client
-                try:
-                    await connection_manager.send_json(
-                        {
-                            "type": "error",
-                            "payload": {
-                                "detail": "Internal server error processing your request."
-                            },
-                        },
-                        client_id,
+                await _report_handler_error(client_id, span, e)
+            finally:
+                otel_context.detach(span_token)
+                if span is not None:  # None: handed over to a handler task
+                    ws_message_handling_seconds.labels(metric_type).observe(
+                        time.perf_counter() - received_at
                     )
-                except Exception:
-                    pass  # Avoid cascading errors if sending the error fails
+                    span.update_name(f"ws.{metric_type}")
+                    span.end()
 
     # --- Outer Exception Handling (WebSocket Connection Lifecycle) ---
     except WebSocketDisconnect as e:
         # Handles both clean and unclean disconnects initiated by client or server
         logger.info(
-            f"WebSocket disconnected for client '{client_id}'. Code: {e.code}, Reason: '{e.reason}'"
+            "WebSocket disconnected for client '%s'. Code: %s, Reason: '%s'",
+            client_id,
+            e.code,
+            e.reason,
         )
     except Exception as e:
         # Catch unexpected errors during connection setup or the main loop itself
         logger.error(
-            f"Unhandled exception in WebSocket endpoint for client '{client_id}': {e}",
+            "Unhandled exception in WebSocket endpoint for client '%s': %s",
+            client_id,
+            e,
             exc_info=True,
         )
         # Attempt to close the connection gracefully if it seems open
@@ -284,10 +494,13 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             except Exception as close_err:
                 # Log error during the forced close attempt
                 logger.error(
-                    f"Error attempting to close WebSocket for '{client_id}' after exception: {close_err}"
+                    "Error attempting to close WebSocket for '%s' after exception: %s",
+                    client_id,
+                    close_err,
                 )
     finally:
         # CRITICAL: Ensure the client is removed from the ConnectionManager
         # regardless of how the connection endpoint exits (normal disconnect, error, etc.)
-        connection_manager.disconnect(client_id)
-        logger.info(f"Cleaned up connection manager entry for client '{client_id}'")
+        # Only this socket's entry: after a heartbeat reap the client may already be back
+        connection_manager.disconnect(client_id, websocket)
+        logger.info("Cleaned up connection manager entry for client '%s'", client_id)
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from backend.config import settings
+from backend.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# --- Admission control for agent work ---
+# Two independent limits, both enforced on the event loop without locks:
+# - RateLimiter: a token bucket per client_id bounds how fast one client can
+#   send messages (sustained rate plus a small burst).
+# - GenerationLimiter: a global cap on concurrent agent generations with a
+#   bounded FIFO queue behind it. When the queue is full the request is
+#   rejected with an estimated retry-after instead of waiting unboundedly.
+
+admission_rejections_total = registry.counter(
+    "admission_rejections_total",
+    "send_message requests rejected by admission control, by reason.",
+    ["reason"],
+)
+agent_generation_queue_position = registry.histogram(
+    "agent_generation_queue_position",
+    "Queue position assigned to generations that had to wait for a slot.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+agent_generation_queue_wait_seconds = registry.histogram(
+    "agent_generation_queue_wait_seconds",
+    "Time a generation waited in the queue before it started.",
+)
+
+REASON_CLIENT_RATE = "client_rate"
+REASON_SERVER_BUSY = "server_busy"
+REASON_DRAINING = "draining"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; retry_after is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"{reason} (retry after {retry_after:.1f}s)")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Holds up to `capacity` tokens, refilled continuously at `rate` per second."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, capacity: float, rate: float, now: float) -> float:
+        """Takes one token; returns 0.0, or the seconds until one is available."""
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class RateLimiter:
+    """Per-client token buckets. A rate of 0 disables the limit."""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60
+        self.capacity = float(max(burst, 1))
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def check(self, client_id: str):
+        """Consumes one token for `client_id` or raises AdmissionRejected."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = TokenBucket(self.capacity, now)
+        retry_after = bucket.take(self.capacity, self.rate, now)
+        if retry_after:
+            admission_rejections_total.labels(REASON_CLIENT_RATE).inc()
+            raise AdmissionRejected(REASON_CLIENT_RATE, retry_after)
+
+    def forget(self, client_id: str):
+        """Drops the bucket of a client whose session ended."""
+        self._buckets.pop(client_id, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class GenerationTicket:
+    """
+    A reserved place for one generation: either an active slot or a queue
+    entry. Use as `async with ticket:` around the generation; entering waits
+    for the slot when queued and leaving releases it. A ticket that will not
+    be entered must be given back with discard().
+    """
+
+    __slots__ = ("_limiter", "_waiter", "_queued_at", "_started", "_discarded")
+
+    def __init__(self, limiter: "GenerationLimiter", waiter: asyncio.Future | None):
+        self._limiter = limiter
+        self._waiter = waiter
+        self._queued_at = time.monotonic()
+        self._started: float | None = None
+        self._discarded = False
+
+    @property
+    def position(self) -> int:
+        """1-based queue position, or 0 once the generation may run."""
+        if self._waiter is None or self._waiter.done():
+            return 0
+        return self._limiter._waiters.index(self._waiter) + 1
+
+    def discard(self):
+        """
+        Gives back the slot or queue place of a ticket that was never entered.
+        No-op once entered or discarded, so it is safe in a `finally`.
+        """
+        if self._started is not None or self._discarded:
+            return
+        self._discarded = True
+        if self._waiter is None:
+            self._limiter._hand_over()
+        else:
+            self._limiter._abandon(self._waiter)
+
+    async def __aenter__(self):
+        if self._discarded:
+            raise RuntimeError("Generation ticket was discarded")
+        if self._waiter is not None:
+            try:
+                await self._waiter
+            except asyncio.CancelledError:
+                self.discard()
+                raise
+            agent_generation_queue_wait_seconds.observe(
+                time.monotonic() - self._queued_at
+            )
+        self._started = time.monotonic()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._limiter._release(time.monotonic() - self._started)
+
+
+class GenerationLimiter:
+    """Global cap on concurrent agent generations with a bounded wait queue."""
+
+    def __init__(self, max_active: int, max_queued: int):
+        self.max_active = max(max_active, 1)
+        self.max_queued = max(max_queued, 0)
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Moving average of generation time, used to estimate retry-after
+        self._avg_seconds = 2.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def check(self, count: int = 1):
+        """Raises AdmissionRejected when reserving `count` slots would be rejected now."""
+        free = self.max_active - self.active if not self._waiters else 0
+        needs_queue = count - max(free, 0)
+        if needs_queue <= 0:
+            return
+        if len(self._waiters) + needs_queue > self.max_queued:
+            admission_rejections_total.labels(REASON_SERVER_BUSY).inc()
+            # Time for the queue ahead plus these generations to drain
+            retry_after = (
+                self._avg_seconds * (len(self._waiters) + needs_queue) / self.max_active
+            )
+            raise AdmissionRejected(REASON_SERVER_BUSY, retry_after)
+
+    def reserve(self) -> GenerationTicket:
+        """
+        Takes a free slot or a place at the back of the queue, without
+        waiting. Raises AdmissionRejected when the queue is full.
+        """
+        self.check()
+        return self._take()
+
+    def reserve_many(self, count: int) -> list[GenerationTicket]:
+        """Reserves `count` tickets at once: all of them, or none (AdmissionRejected)."""
+        self.check(count)
+        return [self._take() for _ in range(count)]
+
+    def _take(self) -> GenerationTicket:
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            return GenerationTicket(self, None)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        agent_generation_queue_position.observe(len(self._waiters))
+        return GenerationTicket(self, waiter)
+
+    def _release(self, elapsed: float):
+        self._avg_seconds += 0.1 * (elapsed - self._avg_seconds)
+        self._hand_over()
+
+    def _hand_over(self):
+        """Frees an active slot; it goes straight to the next waiter so it cannot be overtaken."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        elif waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as the waiter was cancelled
+            self._hand_over()
+
+
+# Create singleton limiters configured from settings
+rate_limiter = RateLimiter(
+    per_minute=settings.rate_limit_messages_per_minute,
+    burst=settings.rate_limit_burst,
+)
+generation_limiter = GenerationLimiter(
+    max_active=settings.agent_max_concurrent_generations,
+    max_queued=settings.agent_max_queued_generations,
+)
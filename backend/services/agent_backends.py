@@ -0,0 +1,112 @@
+import asyncio
+import random
+from collections.abc import AsyncIterator
+
+from backend.models.llm_agent import SyntheticProfile
+
+# --- Response streams ---
+# An agent response is an async iterator of text chunks; ChatManager forwards
+# each chunk to the client as it arrives. A failed generation raises
+# AgentGenerationError from the iterator.
+
+REASON_ERROR = "error"
+REASON_TIMEOUT = "timeout"
+
+# Words synthetic responses are made of (one word stands for one token)
+_VOCABULARY = (
+    "the model response streams tokens at a steady rate while latency varies "
+    "with load and prompt size so capacity planning needs realistic timing "
+    "data about first token delay throughput and length of typical answers"
+).split()
+
+
+class AgentGenerationError(Exception):
+    """A generation failed; `reason` is REASON_ERROR or REASON_TIMEOUT."""
+
+    def __init__(self, reason: str, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+
+
+async def simulated_echo_stream(agent_name: str, prompt: str) -> AsyncIterator[str]:
+    """Placeholder agent: echoes the prompt in chunks of 2-5 words."""
+    # Simulate processing delay
+    await asyncio.sleep(random.uniform(0.5, 1.5))
+    words = f"Okay, I received: '{prompt}' (from {agent_name})".split()
+    start = 0
+    while start < len(words):
+        size = random.randint(2, 5)  # Simulate variable chunk sizes
+        yield " ".join(words[start : start + size]) + " "
+        start += size
+        if start < len(words):
+            # Simulate network delay between chunks
+            await asyncio.sleep(random.uniform(0.1, 0.4))
+
+
+class GenerationPlan:
+    """Everything drawn up front for one synthetic generation."""
+
+    __slots__ = ("rng", "ttft", "tokens_per_second", "tokens", "outcome", "fail_at")
+
+    def __init__(self, profile: SyntheticProfile, rng: random.Random):
+        self.rng = rng
+        self.ttft = max(0.0, profile.time_to_first_token_seconds.sample(rng))
+        self.tokens_per_second = max(0.1, profile.tokens_per_second.sample(rng))
+        self.tokens = min(
+            profile.max_response_tokens,
+            max(1, round(profile.response_tokens.sample(rng))),
+        )
+        draw = rng.random()
+        if draw < profile.timeout_rate:
+            self.outcome = REASON_TIMEOUT
+        elif draw < profile.timeout_rate + profile.error_rate:
+            self.outcome = REASON_ERROR
+        else:
+            self.outcome = "ok"
+        self.fail_at = rng.randrange(self.tokens)  # Tokens sent before an error
+
+
+class SyntheticAgent:
+    """
+    Streams generated text with provider-like timing from a SyntheticProfile.
+
+    Generation n of this agent draws from its own generator seeded with
+    (profile.seed, n), so the sequence of plans is identical across runs no
+    matter how concurrent generations interleave.
+    """
+
+    def __init__(self, profile: SyntheticProfile):
+        self.profile = profile
+        self.generations = 0
+
+    def next_plan(self) -> GenerationPlan:
+        rng = random.Random(f"{self.profile.seed}:{self.generations}")
+        self.generations += 1
+        return GenerationPlan(self.profile, rng)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        plan = self.next_plan()
+        if plan.outcome == REASON_TIMEOUT:
+            await asyncio.sleep(self.profile.timeout_seconds)
+            raise AgentGenerationError(
+                REASON_TIMEOUT,
+                f"No response within {self.profile.timeout_seconds}s",
+            )
+
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(plan.ttft)
+        # Chunks are scheduled against the start time, so sleep overshoot
+        # does not accumulate and the configured throughput is kept
+        started = loop.time()
+        sent = 0
+        while sent < plan.tokens:
+            if plan.outcome == REASON_ERROR and sent >= plan.fail_at:
+                raise AgentGenerationError(
+                    REASON_ERROR, f"Synthetic failure after {sent} tokens"
+                )
+            count = min(self.profile.tokens_per_chunk, plan.tokens - sent)
+            yield " ".join(plan.rng.choices(_VOCABULARY, k=count)) + " "
+            sent += count
+            if sent < plan.tokens:
+                delay = started + sent / plan.tokens_per_second - loop.time()
+                await asyncio.sleep(max(0.0, delay))
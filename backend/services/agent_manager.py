@@ -1,24 +1,77 @@
+import asyncio
 import logging
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from pydantic_ai import Agent
-from pydantic_ai.messages import ModelResponse
+from pydantic import BaseModel, TypeAdapter, field_validator
 
+from backend.config import settings
 from backend.models.llm_agent import LLMAgent
+from backend.services.agent_backends import SyntheticAgent, simulated_echo_stream
+from backend.services.connection_manager import EncodedFrame, connection_manager
+from backend.services.metrics import registry
+
+if TYPE_CHECKING:
+    # Only needed for annotations; importing pydantic-ai costs ~150 ms at startup
+    from pydantic_ai.messages import ModelResponse
 
 logger = logging.getLogger(__name__)
 
+agent_catalog_reloads_total = registry.counter(
+    "agent_catalog_reloads_total",
+    "Agent catalog file loads, by result (loaded, invalid).",
+    ["result"],
+)
+
+
+class AgentCatalogFile(BaseModel):
+    """
+    Layout of the agent catalog file (JSON), e.g.:
+
+        {"agents": [{"id": "agent_alpha", "name": "Alpha", "model": "gemini-2.0-flash"}]}
+
+    The first agent is the default one.
+    """
+
+    agents: list[LLMAgent]
+
+    @field_validator("agents")
+    @classmethod
+    def _unique_ids(cls, agents: list[LLMAgent]) -> list[LLMAgent]:
+        seen: set[str] = set()
+        for agent in agents:
+            if agent.id in seen:
+                raise ValueError(f"Duplicate agent id '{agent.id}'")
+            seen.add(agent.id)
+        return agents
+
+
+_CATALOG_FILE_ADAPTER = TypeAdapter(AgentCatalogFile)
+_AGENT_LIST_ADAPTER = TypeAdapter(list[LLMAgent])
+_MISSING = (-1, -1)  # File stamp recorded while the catalog file does not exist
+
 
 class AgentManager:
     """
     Manages the available AI agents in the system.
-    In this skeleton, it uses a hardcoded list.
-    In a real application, this would load from a database or configuration.
+
+    Agents come from the catalog file (settings.agents_config_path), which
+    is polled and reloaded when it changes; connected clients then receive
+    an agents_updated event. Every change bumps `version`, and the catalog
+    is serialized once per version for all handshakes (catalog_json).
     """
 
     def __init__(self):
         self._agents: list[LLMAgent] = []
         # Create a dictionary for quick ID-based lookup
         self._agents_by_id: dict[str, LLMAgent] = {}
+        self.version = 0
+        self._catalog_json: str | None = None  # Serialized at most once per version
+        self._file_stamp: tuple[int, int] | None = None  # (mtime_ns, size) loaded
+        self._reload_task: asyncio.Task | None = None
+        # Backends of agents with a synthetic profile, created on first use
+        self._synthetic: dict[str, SyntheticAgent] = {}
 
     def list_agents(self) -> list[LLMAgent]:
         """Returns a list of all available agents."""
@@ -36,8 +89,134 @@ class AgentManager:
         """Adds a new agent to the list."""
         self._agents.append(agent)
         self._agents_by_id[agent.id] = agent
+        self._catalog_changed()
+
+    def replace_agents(self, agents: list[LLMAgent]):
+        """Swaps in a whole new catalog (lookups never see a partial one)."""
+        self._agents = list(agents)
+        self._agents_by_id = {agent.id: agent for agent in self._agents}
+        self._synthetic.clear()  # Profiles may have changed; restart their sequences
+        self._catalog_changed()
+
+    def _catalog_changed(self):
+        self.version += 1
+        self._catalog_json = None
+
+    def catalog_json(self) -> str:
+        """The agent list as a JSON array, serialized once per catalog version."""
+        if self._catalog_json is None:
+            self._catalog_json = _AGENT_LIST_ADAPTER.dump_json(self._agents).decode()
+        return self._catalog_json
+
+    def agents_updated_frame(self) -> EncodedFrame:
+        return EncodedFrame(
+            "agents_updated",
+            f'{{"type":"agents_updated","payload":{{"version":{self.version},'
+            f'"agents":{self.catalog_json()}}}}}',
+        )
+
+    # --- Catalog file ---
+
+    def load_file(self, path: Path) -> bool:
+        """
+        Loads the catalog from `path` if it changed since the last load.
+        A missing or invalid file keeps the current catalog. Returns True when
+        the catalog was replaced.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            if self._file_stamp != _MISSING:  # Log once, not on every poll
+                logger.warning("Agent catalog file '%s' not found.", path)
+            self._file_stamp = _MISSING
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._file_stamp:
+            return False
+        self._file_stamp = stamp
+        try:
+            catalog = _CATALOG_FILE_ADAPTER.validate_json(path.read_bytes())
+        except (OSError, ValueError) as e:
+            agent_catalog_reloads_total.labels("invalid").inc()
+            logger.error(
+                "Agent catalog '%s' not loaded, keeping %s agents: %s",
+                path,
+                len(self._agents),
+                e,
+            )
+            return False
+        if catalog.agents == self._agents:
+            return False  # Touched but identical; clients need no update
+        self.replace_agents(catalog.agents)
+        agent_catalog_reloads_total.labels("loaded").inc()
+        logger.info(
+            "Loaded %s agents from '%s' (catalog version %s)",
+            len(self._agents),
+            path,
+            self.version,
+        )
+        return True
+
+    async def broadcast_catalog(self):
+        """Sends the current catalog to every connected client."""
+        frame = self.agents_updated_frame()
+        await asyncio.gather(
+            *(
+                connection_manager.send_json(frame, client_id)
+                for client_id in list(connection_manager.active_connections)
+            )
+        )
+
+    async def start_reload_task(self):
+        """Starts polling the catalog file for changes (if configured)."""
+        if not settings.agents_config_path or settings.agents_reload_seconds <= 0:
+            return
+        if self._reload_task is None or self._reload_task.done():
+            logger.info(
+                "Watching agent catalog '%s' (every %ss)",
+                settings.agents_config_path,
+                settings.agents_reload_seconds,
+            )
+            self._reload_task = asyncio.create_task(self._run_reload_loop())
+
+    async def stop_reload_task(self):
+        if self._reload_task and not self._reload_task.done():
+            self._reload_task.cancel()
+            try:
+                await self._reload_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._reload_task = None
+
+    async def _run_reload_loop(self):
+        path = Path(settings.agents_config_path)
+        while True:
+            await asyncio.sleep(settings.agents_reload_seconds)
+            try:
+                if self.load_file(path):
+                    await self.broadcast_catalog()
+            except Exception as e:
+                logger.error("Error reloading agent catalog: %s", e, exc_info=True)
+
+    # --- Responses ---
+
+    def stream_response(
+        self, agent: LLMAgent | None, prompt: str
+    ) -> AsyncIterator[str]:
+        """
+        Response chunks for `prompt`: from the synthetic backend for agents
+        with a synthetic profile, otherwise the placeholder echo.
+        May raise AgentGenerationError while iterating.
+        """
+        if agent is not None and agent.synthetic is not None:
+            backend = self._synthetic.get(agent.id)
+            if backend is None or backend.profile is not agent.synthetic:
+                backend = self._synthetic[agent.id] = SyntheticAgent(agent.synthetic)
+            return backend.stream(prompt)
+        return simulated_echo_stream(agent.name if agent else "Unknown Agent", prompt)
 
-    async def run(self, prompt: str, agent_id: str) -> ModelResponse:
+    async def run(self, prompt: str, agent_id: str) -> "ModelResponse":
         """Async run the user prompt"""
         raise NotImplementedError
 
@@ -1,17 +1,46 @@
 import asyncio
+import contextlib
 import random
+import time
 import uuid
 import logging
 import datetime
+from collections import OrderedDict
 from datetime import timezone, timedelta
 
+from opentelemetry.trace import StatusCode
+
 # Import models and managers/config
-from backend.models.chat import Session, Topic, Message, TaskResult
+from backend.models.chat import (
+    Session,
+    Topic,
+    StoredMessage,
+    StoredTaskResult,
+    now_us,
+    pack_id,
+)
 from backend.services.connection_manager import connection_manager
+from backend.services.agent_backends import AgentGenerationError
 from backend.services.agent_manager import agent_manager
+from backend.services.admission import (
+    AdmissionRejected,
+    GenerationTicket,
+    generation_limiter,
+    rate_limiter,
+)
+from backend.services.metrics import (
+    agent_generation_failures_total,
+    agent_stream_duration_seconds,
+    agent_time_to_first_chunk_seconds,
+    cleanup_sweep_seconds,
+    duplicate_messages_total,
+)
+from backend.services.tracing import get_tracer
 from backend.config import settings  # Import configured settings
+from backend.logging_config import LogSampler
 
 logger = logging.getLogger(__name__)
+_chunk_log_sampler = LogSampler(logger, logging.DEBUG, "agent.chunk")
 
 
 # Helper for timestamping
@@ -20,6 +49,60 @@ def now_tz():
     return datetime.datetime.now(timezone.utc)
 
 
+class ResponseStream:
+    """
+    One agent response to a user message. `socket` is the connection it
+    streams to; chunks stop while that connection is gone, and a resent
+    message (see Submission) points it at the client's new connection.
+    """
+
+    __slots__ = (
+        "agent_id",
+        "message_id",
+        "client_message_id",
+        "socket",
+        "parts",
+        "message",
+        "error",
+    )
+
+    def __init__(
+        self,
+        agent_id: str,
+        message_id: str,
+        client_message_id: str | None,
+        socket,
+    ):
+        self.agent_id = agent_id
+        self.message_id = message_id
+        self.client_message_id = client_message_id
+        self.socket = socket
+        self.parts: list[str] | None = []  # Chunks so far; None once finished
+        # Set when finished: the stored message, or why there is none
+        self.message: StoredMessage | None = None
+        self.error: str | None = None
+
+
+class Submission:
+    """
+    A send_message remembered by its client-supplied idempotency key, so a
+    resend (e.g., after a reconnect) gets the original user message and
+    responses instead of new ones.
+    """
+
+    __slots__ = ("topic_id", "user_message", "responses")
+
+    def __init__(
+        self,
+        topic_id: str,
+        user_message: StoredMessage,
+        responses: list[ResponseStream],
+    ):
+        self.topic_id = topic_id
+        self.user_message = user_message
+        self.responses = responses
+
+
 class ChatManager:
     """
     Manages chat sessions, topics, messages, and related business logic.
@@ -33,8 +116,15 @@ class ChatManager:
         # Load session timeout from config
         self.SESSION_TIMEOUT = timedelta(minutes=settings.session_timeout_minutes)
         self._cleanup_task: asyncio.Task | None = None  # Background task handle
+        # Per-message background tasks still running (awaited when draining)
+        self.background_tasks: set[asyncio.Task] = set()
+        # Recent submissions per client, by idempotency key (oldest first,
+        # at most settings.idempotency_window_size each)
+        self._submissions: dict[str, OrderedDict[str, Submission]] = {}
+        # Lazy loader for topic histories restored from a snapshot (see services/snapshot.py)
+        self._history_source = None
         logger.info(
-            f"ChatManager initialized. Session timeout set to: {self.SESSION_TIMEOUT}"
+            "ChatManager initialized. Session timeout set to: %s", self.SESSION_TIMEOUT
         )
 
     def _update_last_activity(self, client_id: str):
@@ -43,12 +133,15 @@ class ChatManager:
         if session:
             session.last_activity = now_tz()
             logger.debug(
-                f"Updated last activity for client '{client_id}' to {session.last_activity}"
+                "Updated last activity for client '%s' to %s",
+                client_id,
+                session.last_activity,
             )
         else:
             # This could happen if an action occurs right as a session times out.
             logger.warning(
-                f"Attempted to update last activity for non-existent session: '{client_id}'"
+                "Attempted to update last activity for non-existent session: '%s'",
+                client_id,
             )
 
     async def handle_connect(self, client_id: str) -> str | None:
@@ -61,14 +154,18 @@ class ChatManager:
 
         if session:
             # --- Existing Session (Reconnect) ---
-            logger.info(f"Handling reconnect for existing session client '{client_id}'")
+            logger.info(
+                "Handling reconnect for existing session client '%s'", client_id
+            )
             self._update_last_activity(client_id)  # Mark activity on reconnect
 
             active_topic_id = session.active_topic_id
             # Validate that the active topic still exists in our topics store
             if active_topic_id and active_topic_id not in self.topics:
                 logger.warning(
-                    f"Reconnect: Active topic '{active_topic_id}' not found for client '{client_id}'. Clearing."
+                    "Reconnect: Active topic '%s' not found for client '%s'. Clearing.",
+                    active_topic_id,
+                    client_id,
                 )
                 active_topic_id = None
                 session.active_topic_id = None  # Clear invalid ID from session
@@ -83,7 +180,9 @@ class ChatManager:
                     active_topic_id = latest_topic.id
                     session.active_topic_id = active_topic_id  # Update session state
                     logger.info(
-                        f"Reconnect: Restored active topic to latest ('{active_topic_id}') for client '{client_id}'"
+                        "Reconnect: Restored active topic to latest ('%s') for client '%s'",
+                        active_topic_id,
+                        client_id,
                     )
 
             return (
@@ -93,7 +192,8 @@ class ChatManager:
         else:
             # --- New Session ---
             logger.info(
-                f"Creating new session for client '{client_id}'. No default topic will be created."
+                "Creating new session for client '%s'. No default topic will be created.",
+                client_id,
             )
             new_session = Session(client_id=client_id, last_activity=now_tz())
             self.sessions[client_id] = new_session
@@ -109,19 +209,24 @@ class ChatManager:
         session = self.sessions.get(client_id)
         if not session:
             logger.error(
-                f"Cannot create topic: Session not found for client '{client_id}'"
+                "Cannot create topic: Session not found for client '%s'", client_id
             )
             return None
 
         agent = agent_manager.get_agent_by_id(agent_id)
         if not agent:
-            logger.error(f"Cannot create topic: Agent not found with ID '{agent_id}'")
+            logger.error("Cannot create topic: Agent not found with ID '%s'", agent_id)
             return None
 
-        # Generate topic ID and create the Topic object
+        # Generate topic ID and create the Topic object, named once ("Chat N")
         topic_id = str(uuid.uuid4())
+        session.topics_created += 1
         topic = Topic(
-            id=topic_id, client_id=client_id, agent_id=agent_id, timestamp=now_tz()
+            id=topic_id,
+            client_id=client_id,
+            agent_id=agent_id,
+            name=f"Chat {session.topics_created}",
+            timestamp=now_tz(),
         )
         self.topics[topic_id] = topic  # Store the new topic
 
@@ -130,23 +235,106 @@ class ChatManager:
         self._update_last_activity(client_id)
 
         logger.info(
-            f"Created new topic '{topic_id}' for agent '{agent.name}' by client '{client_id}'"
+            "Created new topic '%s' for agent '%s' by client '%s'",
+            topic_id,
+            agent.name,
+            client_id,
         )
-        # Notify the client about the updated list of topics AFTER creation
-        await self.send_topic_list_update(client_id)
+        # Notify the client about the new topic AFTER creation (not the whole list)
+        await self.send_topic_event(client_id, "topic_added", topic)
+        return topic
+
+    def _owned_topic(self, client_id: str, topic_id: str) -> Topic | None:
+        """The topic if it exists and belongs to `client_id`, else None."""
+        topic = self.topics.get(topic_id)
+        if topic is None or topic.client_id != client_id:
+            return None
         return topic
 
+    async def rename_topic(self, client_id: str, topic_id: str, name: str) -> bool:
+        """Renames a client's topic and sends topic_updated. False if not found."""
+        topic = self._owned_topic(client_id, topic_id)
+        if topic is None:
+            return False
+        topic.name = name
+        self._update_last_activity(client_id)
+        logger.info("Client '%s' renamed topic '%s'", client_id, topic_id)
+        await self.send_topic_event(client_id, "topic_updated", topic)
+        return True
+
+    async def delete_topic(self, client_id: str, topic_id: str) -> bool:
+        """
+        Deletes a client's topic and its history and sends topic_removed.
+        If it was the active topic, the client is left with no active topic.
+        Returns False if the topic does not exist or is not the client's.
+        """
+        topic = self._owned_topic(client_id, topic_id)
+        if topic is None:
+            return False
+        self._remove_topic(topic_id)
+        self._update_last_activity(client_id)
+        logger.info("Client '%s' deleted topic '%s'", client_id, topic_id)
+        await connection_manager.send_json(
+            {"type": "topic_removed", "payload": {"topic_id": topic_id}}, client_id
+        )
+        session = self.sessions.get(client_id)
+        if session and session.active_topic_id == topic_id:
+            session.active_topic_id = None
+            await self.send_active_topic_update(client_id, None)
+        return True
+
+    def _remove_topic(self, topic_id: str):
+        """Drops a topic and releases its history right away."""
+        topic = self.topics.pop(topic_id, None)
+        if self._history_source is not None:
+            self._history_source.discard(topic_id)
+        if topic is not None:
+            # In-flight work may still hold the object; do not let it keep the history
+            topic.messages.clear()
+            topic.task_results.clear()
+
+    def replace_topic(self, topic: Topic):
+        """
+        Stores `topic` in place of any topic with the same ID (e.g., on import).
+        A snapshot history not loaded yet belongs to the old topic and is dropped.
+        """
+        if self._history_source is not None:
+            self._history_source.discard(topic.id)
+        self.topics[topic.id] = topic
+
     def get_topics_for_client(self, client_id: str) -> list[Topic]:
         """Retrieves all topics for a specific client, sorted by creation time (oldest first)."""
         client_topics = [t for t in self.topics.values() if t.client_id == client_id]
         return sorted(client_topics, key=lambda t: t.timestamp)
 
     def get_topic(self, topic_id: str) -> Topic | None:
-        """Retrieves a single topic by its ID."""
-        return self.topics.get(topic_id)
+        """
+        Retrieves a single topic by its ID.
+        Topics restored from a snapshot get their history loaded on first access.
+        """
+        topic = self.topics.get(topic_id)
+        if topic is not None and self._history_source is not None:
+            self._history_source.hydrate(topic)
+            if not self._history_source.pending:
+                # Every restored history is in memory now; release the snapshot file
+                self._history_source.close()
+                self._history_source = None
+        return topic
+
+    def set_history_source(self, source):
+        """Installs a lazy history loader (e.g., a SnapshotReader) for restored topics."""
+        if self._history_source is not None:
+            self._history_source.close()
+        self._history_source = source
 
     async def add_message_and_process(
-        self, client_id: str, topic_id: str, user_message_content: str
+        self,
+        client_id: str,
+        topic_id: str,
+        user_message_content: str,
+        agent_ids: list[str] | None = None,
+        client_message_id: str | None = None,
+        tickets: list[GenerationTicket] | None = None,
     ):
         """
         Core logic for handling a new user message:
@@ -154,179 +342,393 @@ class ChatManager:
         2. Updates session activity.
         3. Creates and stores the user Message object.
         4. Sends the user message update to the client.
-        5. Simulates triggering the agent response.
+        5. Simulates triggering the agent response, once a generation slot is free.
         6. Simulates triggering a background task.
+        `agent_ids` asks several agents at once (default: the topic's agent).
+        Their generations run concurrently, each in its own generation slot,
+        and their streams interleave on the socket, told apart by message_id.
+        `client_message_id` is the client's idempotency key: a message whose
+        key was already seen is answered by replay_submission, with no new
+        message or generation.
+        `tickets` are generation tickets the caller already reserved, one per
+        agent; without them they are reserved here, and AdmissionRejected is
+        raised, before storing anything, when the queue cannot take them all.
+        Tickets that end up unused are discarded either way.
         """
-        topic = self.get_topic(topic_id)
-        # Validate topic existence and ownership
-        if not topic:
-            logger.warning(f"Cannot add message: Topic '{topic_id}' not found.")
-            # Optionally inform client via WebSocket error message
-            await connection_manager.send_json(
-                {
-                    "type": "error",
-                    "payload": {"detail": f"Chat topic {topic_id} not found."},
-                },
-                client_id,
-            )
-            return
-        if topic.client_id != client_id:
-            logger.warning(
-                f"Permission denied: Topic '{topic_id}' does not belong to client '{client_id}'."
-            )
-            await connection_manager.send_json(
-                {
-                    "type": "error",
-                    "payload": {"detail": "Access denied to this chat topic."},
-                },
-                client_id,
-            )
-            return
+        with get_tracer().start_as_current_span(
+            "chat.add_message_and_process",
+            attributes={"client_id": client_id, "topic_id": topic_id},
+        ):
+            topic = self.get_topic(topic_id)
+            # Validate topic existence and ownership
+            if not topic:
+                logger.warning("Cannot add message: Topic '%s' not found.", topic_id)
+                # Optionally inform client via WebSocket error message
+                await connection_manager.send_json(
+                    {
+                        "type": "error",
+                        "payload": {"detail": f"Chat topic {topic_id} not found."},
+                    },
+                    client_id,
+                )
+                return
+            if topic.client_id != client_id:
+                logger.warning(
+                    "Permission denied: Topic '%s' does not belong to client '%s'.",
+                    topic_id,
+                    client_id,
+                )
+                await connection_manager.send_json(
+                    {
+                        "type": "error",
+                        "payload": {"detail": "Access denied to this chat topic."},
+                    },
+                    client_id,
+                )
+                return
 
-        # Update activity timestamp for the session
-        self._update_last_activity(client_id)
+            if client_message_id:
+                submission = self.find_submission(client_id, client_message_id)
+                if submission is not None:
+                    await self.replay_submission(
+                        client_id, client_message_id, submission
+                    )
+                    return
 
-        # 1. Create and store the user message
-        logger.info(f"[ChatManager] Adding user message to topic '{topic_id}'")
-        user_message_id = str(uuid.uuid4())
-        user_message = Message(
-            id=user_message_id,
-            topic_id=topic_id,
-            sender="user",
-            content=user_message_content,
-            timestamp=now_tz(),
-        )
-        logger.info(f"[ChatManager] User Message CREATED with ID: {user_message.id}")
-        topic.messages.append(user_message)
-        # Send update to the originating client
-        await self.send_message_update(client_id, user_message)
-        logger.info(
-            f"[ChatManager] User message update sent call completed for '{client_id}'"
-        )
+            # Generation slots (or queue places): reserved by the caller, before
+            # it created the topic, or here, before storing anything
+            agent_ids = agent_ids or [topic.agent_id]
+            if tickets is None:
+                tickets = generation_limiter.reserve_many(len(agent_ids))
+            try:
+                # Update activity timestamp for the session
+                self._update_last_activity(client_id)
 
-        # 2. Simulate Agent Response (replace with actual logic)
-        await self._simulate_agent_response(client_id, topic, user_message)
+                # 1. Create and store the user message
+                logger.info("[ChatManager] Adding user message to topic '%s'", topic_id)
+                user_message_id = str(uuid.uuid4())
+                user_message = StoredMessage(
+                    pack_id(user_message_id), "user", user_message_content, now_us()
+                )
+                logger.info(
+                    "[ChatManager] User Message CREATED with ID: %s", user_message_id
+                )
+                topic.messages.append(user_message)
+                socket = connection_manager.active_connections.get(client_id)
+                responses = [
+                    ResponseStream(
+                        agent_id, str(uuid.uuid4()), client_message_id, socket
+                    )
+                    for agent_id in agent_ids
+                ]
+                if client_message_id:
+                    self._remember_submission(
+                        client_id,
+                        client_message_id,
+                        Submission(topic_id, user_message, responses),
+                    )
+                # Send update to the originating client
+                await self.send_message_update(
+                    client_id, topic_id, user_message, client_message_id
+                )
+                logger.info(
+                    "[ChatManager] User message update sent call completed for '%s'",
+                    client_id,
+                )
 
-        # 3. Simulate Background Task (replace with actual logic)
-        logger.info(
-            f"[ChatManager] Triggering background task simulation for topic '{topic_id}'"
-        )
-        # Create task without awaiting its completion here
-        asyncio.create_task(
-            self._simulate_background_task(client_id, topic_id, user_message_content)
-        )
+                # 2. Simulate Agent Response (replace with actual logic)
+                position = max(ticket.position for ticket in tickets)
+                if position:
+                    logger.info(
+                        "[ChatManager] Generation for topic '%s' queued at position %s",
+                        topic_id,
+                        position,
+                    )
+                    await self.send_generation_queued(client_id, topic_id, position)
+                # Total latency is that of the slowest agent, not the sum
+                await asyncio.gather(
+                    *(
+                        self._generate(ticket, client_id, topic, user_message, response)
+                        for ticket, response in zip(tickets, responses)
+                    )
+                )
+            finally:
+                # Tickets whose generation never started (cancelled while
+                # sending or queued) would otherwise hold their place forever
+                for ticket in tickets:
+                    ticket.discard()
+
+            # 3. Simulate Background Task (replace with actual logic)
+            logger.info(
+                "[ChatManager] Triggering background task simulation for topic '%s'",
+                topic_id,
+            )
+            # Create task without awaiting its completion here; keep a reference
+            # until it finishes so it is not garbage-collected or lost on drain
+            task = asyncio.create_task(
+                self._simulate_background_task(
+                    client_id, topic_id, user_message_content
+                )
+            )
+            self.background_tasks.add(task)
+            task.add_done_callback(self.background_tasks.discard)
+
+    async def _generate(
+        self,
+        ticket: GenerationTicket,
+        client_id: str,
+        topic: Topic,
+        user_message: StoredMessage,
+        response: ResponseStream,
+    ):
+        async with ticket:
+            await self._simulate_agent_response(
+                client_id, topic, user_message, response
+            )
 
     async def _simulate_agent_response(
-        self, client_id: str, topic: Topic, user_message: Message
+        self,
+        client_id: str,
+        topic: Topic,
+        user_message: StoredMessage,
+        response: ResponseStream,
     ):
-        """Placeholder for actual agent interaction logic."""
-        logger.info(f"[Agent Sim] Preparing response for topic '{topic.id}'...")
-        agent = agent_manager.get_agent_by_id(topic.agent_id)
-        agent_name = agent.name if agent else "Unknown Agent"
+        """Streams one agent's response to the client and stores it."""
+        agent_id = response.agent_id
+        with get_tracer().start_as_current_span(
+            "agent.generate",
+            attributes={"topic_id": topic.id, "agent_id": agent_id},
+        ) as span:
+            started = time.perf_counter()
+            logger.info(
+                "[Agent Sim] Preparing response of '%s' for topic '%s'...",
+                agent_id,
+                topic.id,
+            )
+            agent = agent_manager.get_agent_by_id(agent_id)
 
-        # Simulate processing delay
-        await asyncio.sleep(random.uniform(0.5, 1.5))
+            # Basic collision check (very unlikely but harmless)
+            if pack_id(response.message_id) == user_message.id:
+                logger.warning(
+                    "[Agent Sim] UUID collision! Regenerating agent message ID."
+                )
+                response.message_id = str(uuid.uuid4())
+            agent_message_id = response.message_id
 
-        # Generate response content (simple echo for now)
-        full_response_content = (
-            f"Okay, I received: '{user_message.content}' (from {agent_name})"
-        )
-        words = full_response_content.split()
-
-        # Create and store the agent message
-        agent_message_id = str(uuid.uuid4())
-        # Basic collision check (very unlikely but harmless)
-        if agent_message_id == user_message.id:
-            logger.warning("[Agent Sim] UUID collision! Regenerating agent message ID.")
-            agent_message_id = str(uuid.uuid4())
-
-        # Simulate streaming
-        current_chunk = ""
-        chunk_size = random.randint(
-            2, 5
-        )  # Simulate variable chunk sizes (words per chunk)
-        word_count = 0
-
-        for word in words:
-            current_chunk += word + " "
-            word_count += 1
-            if word_count >= chunk_size:
-                # Send the chunk
-                await self.send_agent_message_chunk(
-                    client_id=client_id,
-                    topic_id=topic.id,
-                    message_id=agent_message_id,
-                    content_chunk=current_chunk,
-                    is_first_chunk=(
-                        word_count == chunk_size
-                    ),  # Mark the very first chunk
+            # The stream is tied to a connection (response.socket): while that
+            # connection is gone, chunks stop being sent but the response is
+            # still completed and stored (a reconnect loads it via
+            # topic_state, or a resent message re-attaches the stream).
+            # Deleting the topic stops the generation.
+            topic_removed = False
+            failure: AgentGenerationError | None = None
+            parts = response.parts
+            first_sent = False
+            try:
+                async with contextlib.aclosing(
+                    agent_manager.stream_response(agent, user_message.content)
+                ) as chunks:
+                    async for chunk in chunks:
+                        if self.topics.get(topic.id) is not topic:
+                            topic_removed = True
+                            break
+                        parts.append(chunk)
+                        if response.socket is None:
+                            continue
+                        if (
+                            connection_manager.active_connections.get(client_id)
+                            is not response.socket
+                        ):
+                            response.socket = None
+                            span.add_event("stream_cancelled")
+                            logger.info(
+                                "[Agent Sim] Connection for '%s' went away; stopped streaming message %s",
+                                client_id,
+                                agent_message_id,
+                            )
+                            continue
+                        await self.send_agent_message_chunk(
+                            client_id=client_id,
+                            topic_id=topic.id,
+                            message_id=agent_message_id,
+                            content_chunk=chunk,
+                            is_first_chunk=len(parts) == 1,
+                            agent_id=agent_id,
+                        )
+                        if not first_sent:
+                            first_sent = True
+                            ttft = time.perf_counter() - started
+                            agent_time_to_first_chunk_seconds.observe(ttft)
+                            span.add_event("first_token", {"ttft_seconds": ttft})
+            except AgentGenerationError as e:
+                failure = e
+                response.error = e.reason
+                agent_generation_failures_total.labels(e.reason).inc()
+                span.record_exception(e)
+                span.set_status(StatusCode.ERROR, e.reason)
+                logger.warning(
+                    "[Agent Sim] Generation for topic '%s' failed (%s): %s",
+                    topic.id,
+                    e.reason,
+                    e,
                 )
-                # Reset for next chunk
-                current_chunk = ""
-                word_count = 0
-                chunk_size = random.randint(2, 5)
-                # Simulate network delay between chunks
-                await asyncio.sleep(random.uniform(0.1, 0.4))
-
-        # Send any remaining part as the last chunk
-        if current_chunk:
-            await self.send_agent_message_chunk(
-                client_id=client_id,
-                topic_id=topic.id,
-                message_id=agent_message_id,
-                content_chunk=current_chunk,
-                is_first_chunk=(len(words) <= chunk_size and current_chunk != ""),
-            )
+            finally:
+                response.parts = None
 
-        await self.send_agent_stream_end(client_id, topic.id, agent_message_id)
-        logger.info(
-            f"[Agent Sim] Sent stream end signal for message ID: {agent_message_id}"
-        )
+            if topic_removed or self.topics.get(topic.id) is not topic:
+                span.add_event("topic_removed")
+                return  # Topic deleted mid-stream; its history is gone
 
-        final_agent_message = Message(
-            id=agent_message_id,  # Use the same ID as the stream
-            topic_id=topic.id,
-            sender="agent",
-            content=full_response_content,  # Store the full assembled content
-            timestamp=now_tz(),  # Timestamp can be start or end of generation
-        )
-        topic.messages.append(final_agent_message)
+            if not failure:
+                # Same ID as the stream, full assembled content, end-of-generation time
+                response.message = StoredMessage(
+                    pack_id(agent_message_id),
+                    "agent",
+                    "".join(parts).rstrip(),
+                    now_us(),
+                    agent_id,
+                )
+                topic.messages.append(response.message)
+                logger.info(
+                    "[Agent Sim] Stored complete agent message (ID: %s) in history.",
+                    agent_message_id,
+                )
+
+            if (
+                response.socket is not None
+                and connection_manager.active_connections.get(client_id)
+                is response.socket
+            ):
+                await self.send_agent_stream_end(
+                    client_id,
+                    topic.id,
+                    agent_message_id,
+                    agent_id,
+                    error=failure.reason if failure else None,
+                    client_message_id=response.client_message_id,
+                )
+                agent_stream_duration_seconds.observe(time.perf_counter() - started)
+                logger.info(
+                    "[Agent Sim] Sent stream end signal for message ID: %s",
+                    agent_message_id,
+                )
+
+    # --- Idempotent submission ---
+
+    def _remember_submission(
+        self, client_id: str, client_message_id: str, submission: Submission
+    ):
+        window = self._submissions.setdefault(client_id, OrderedDict())
+        window[client_message_id] = submission
+        if len(window) > settings.idempotency_window_size:
+            window.popitem(last=False)  # Forget the oldest key
+
+    def find_submission(
+        self, client_id: str, client_message_id: str
+    ) -> Submission | None:
+        """The submission recently made with this key, if its topic still exists."""
+        window = self._submissions.get(client_id)
+        submission = window.get(client_message_id) if window else None
+        if submission is not None and submission.topic_id not in self.topics:
+            del window[client_message_id]  # Topic deleted: a resend starts over
+            return None
+        return submission
+
+    async def replay_submission(
+        self, client_id: str, client_message_id: str, submission: Submission
+    ):
+        """
+        Answers a resent message without new work: makes its topic active,
+        resends the user message and finished responses, and re-attaches
+        responses still generating (or queued) to the current connection
+        after sending what they generated so far.
+        """
+        duplicate_messages_total.inc()
+        topic_id = submission.topic_id
         logger.info(
-            f"[Agent Sim] Stored complete agent message (ID: {agent_message_id}) in history."
+            "[ChatManager] Duplicate message '%s' from '%s'; replaying topic '%s'",
+            client_message_id,
+            client_id,
+            topic_id,
         )
+        session = self.sessions.get(client_id)
+        if session:
+            session.active_topic_id = topic_id
+        await self.send_active_topic_update(client_id, topic_id)
+        await self.send_message_update(
+            client_id, topic_id, submission.user_message, client_message_id
+        )
+        socket = connection_manager.active_connections.get(client_id)
+        for response in submission.responses:
+            if response.parts is not None and response.socket is socket:
+                continue  # Already streaming to this connection
+            if response.parts is not None:
+                # Still generating (or queued): send what was generated so far
+                # and let the next chunks go to this connection. Frames to a
+                # connection keep their order, so the catch-up arrives first
+                generated = "".join(response.parts)
+                response.socket = socket
+                if generated:
+                    await self.send_agent_message_chunk(
+                        client_id=client_id,
+                        topic_id=topic_id,
+                        message_id=response.message_id,
+                        content_chunk=generated,
+                        is_first_chunk=True,
+                        agent_id=response.agent_id,
+                    )
+                continue
+            # Finished
+            if response.message is not None:
+                await self.send_message_update(client_id, topic_id, response.message)
+            await self.send_agent_stream_end(
+                client_id,
+                topic_id,
+                response.message_id,
+                response.agent_id,
+                error=response.error,
+                client_message_id=client_message_id,
+            )
 
     async def _simulate_background_task(
         self, client_id: str, topic_id: str, task_input: str
     ):
         """Placeholder for triggering and handling background tasks."""
-        delay = random.uniform(2.0, 5.0)
-        logger.info(
-            f"[Task Sim] Simulating background task for topic '{topic_id}' (input: '{task_input[:30]}...', delay: {delay:.1f}s)"
-        )
-        await asyncio.sleep(delay)
-
-        # Important: Re-check if session/topic are still valid after the delay
-        topic = self.get_topic(topic_id)
-        session = self.sessions.get(client_id)
-        if not session or not topic or topic.client_id != client_id:
-            logger.warning(
-                f"[Task Sim] Task completed for topic '{topic_id}', but session/topic invalid or client disconnected. Result not sent."
+        with get_tracer().start_as_current_span(
+            "chat.background_task", attributes={"topic_id": topic_id}
+        ):
+            delay = random.uniform(2.0, 5.0)
+            logger.info(
+                "[Task Sim] Simulating background task for topic '%s' (input: '%s...', delay: %.1fs)",
+                topic_id,
+                task_input[:30],
+                delay,
             )
-            return
+            await asyncio.sleep(delay)
 
-        # Create and store the task result
-        result_id = str(uuid.uuid4())
-        result_content = f"Task '{task_input[:20]}...' completed successfully."
-        task_result = TaskResult(
-            id=result_id, topic_id=topic_id, content=result_content, timestamp=now_tz()
-        )
-        topic.task_results.append(task_result)  # Add to topic's result list
+            # Important: Re-check if session/topic are still valid after the delay
+            topic = self.get_topic(topic_id)
+            session = self.sessions.get(client_id)
+            if not session or not topic or topic.client_id != client_id:
+                logger.warning(
+                    "[Task Sim] Task completed for topic '%s', but session/topic invalid or client disconnected. Result not sent.",
+                    topic_id,
+                )
+                return
 
-        logger.info(
-            f"[Task Sim] Task result created for topic '{topic_id}'. Sending update to client '{client_id}'."
-        )
-        # Send the result to the client
-        await self.send_task_result_update(client_id, task_result)
+            # Create and store the task result
+            result_id = str(uuid.uuid4())
+            result_content = f"Task '{task_input[:20]}...' completed successfully."
+            task_result = StoredTaskResult(pack_id(result_id), result_content, now_us())
+            topic.task_results.append(task_result)  # Add to topic's result list
+
+            logger.info(
+                "[Task Sim] Task result created for topic '%s'. Sending update to client '%s'.",
+                topic_id,
+                client_id,
+            )
+            # Send the result to the client
+            await self.send_task_result_update(client_id, topic_id, task_result)
 
     async def change_agent_for_topic(
         self,
@@ -334,6 +736,8 @@ class ChatManager:
         current_topic_id: str,
         new_agent_id: str,
         first_message: str,
+        client_message_id: str | None = None,
+        tickets: list[GenerationTicket] | None = None,
     ) -> str | None:
         """
         Handles the scenario where a user changes the agent mid-conversation.
@@ -343,19 +747,29 @@ class ChatManager:
         """
         self._update_last_activity(client_id)  # Count as activity
         logger.info(
-            f"Client '{client_id}' changing agent to '{new_agent_id}' from topic '{current_topic_id}'. Creating new topic."
+            "Client '%s' changing agent to '%s' from topic '%s'. Creating new topic.",
+            client_id,
+            new_agent_id,
+            current_topic_id,
         )
 
         # Create the new topic (this also updates the session's active topic ID)
         new_topic = await self.create_topic(client_id, new_agent_id)
         if not new_topic:
             logger.error(
-                f"Failed to create new topic during agent change for client '{client_id}'"
+                "Failed to create new topic during agent change for client '%s'",
+                client_id,
             )
             return None  # Indicate failure
 
         # Process the user's message within the context of the *new* topic
-        await self.add_message_and_process(client_id, new_topic.id, first_message)
+        await self.add_message_and_process(
+            client_id,
+            new_topic.id,
+            first_message,
+            client_message_id=client_message_id,
+            tickets=tickets,
+        )
         # Return the ID of the newly created and now active topic
         return new_topic.id
 
@@ -368,65 +782,126 @@ class ChatManager:
         # Ensure topic exists and belongs to the requesting client
         if topic and topic.client_id == client_id:
             logger.debug(
-                f"Sending full topic state for topic '{topic_id}' to client '{client_id}'"
+                "Sending full topic state for topic '%s' to client '%s'",
+                topic_id,
+                client_id,
             )
             state_data = {
                 "type": "topic_state",
                 "payload": {
                     "topic_id": topic.id,
                     "agent_id": topic.agent_id,
-                    "messages": [msg.model_dump(mode="json") for msg in topic.messages],
+                    "messages": [msg.to_json(topic.id) for msg in topic.messages],
                     "task_results": [
-                        res.model_dump(mode="json") for res in topic.task_results
+                        res.to_json(topic.id) for res in topic.task_results
                     ],
                 },
             }
             await connection_manager.send_json(state_data, client_id)
         else:
             logger.warning(
-                f"Attempted state send for invalid/mismatched topic '{topic_id}' client '{client_id}'"
+                "Attempted state send for invalid/mismatched topic '%s' client '%s'",
+                topic_id,
+                client_id,
             )
 
+    @staticmethod
+    def _topic_summary(topic: Topic) -> dict:
+        return {"id": topic.id, "agent_id": topic.agent_id, "name": topic.name}
+
     async def send_topic_list_update(self, client_id: str):
-        """Sends the client's current list of topics (summary info)."""
+        """
+        Sends the client's full list of topics (summary info). Only used on
+        connect and resync; later changes are sent as topic_* events.
+        """
         topics_list = self.get_topics_for_client(client_id)  # Sorted oldest first
         logger.debug(
-            f"Sending topic list update ({len(topics_list)} topics) to client '{client_id}'"
+            "Sending topic list update (%s topics) to client '%s'",
+            len(topics_list),
+            client_id,
         )
-        # Generate default names like "Chat 1", "Chat 2" if topic.name is None
-        topic_list_data = [
-            {"id": t.id, "agent_id": t.agent_id, "name": t.name or f"Chat {i + 1}"}
-            for i, t in enumerate(topics_list)
-        ]
+        # Topics created before names were assigned at creation (e.g., restored
+        # from an older snapshot) get their "Chat N" name now, once
+        for i, topic in enumerate(topics_list):
+            if topic.name is None:
+                topic.name = f"Chat {i + 1}"
+        session = self.sessions.get(client_id)
+        if session:
+            session.topics_created = max(session.topics_created, len(topics_list))
+        topic_list_data = [self._topic_summary(t) for t in topics_list]
         update_data = {"type": "topic_list_update", "payload": topic_list_data}
         await connection_manager.send_json(update_data, client_id)
 
-    async def send_message_update(self, client_id: str, message: Message):
-        """Sends a single new message object."""
+    async def send_topic_event(self, client_id: str, event: str, topic: Topic):
+        """Sends one topic's summary as a topic_added or topic_updated event."""
+        logger.debug("Sending %s for topic '%s' to '%s'", event, topic.id, client_id)
+        await connection_manager.send_json(
+            {"type": event, "payload": self._topic_summary(topic)}, client_id
+        )
+
+    async def send_message_update(
+        self,
+        client_id: str,
+        topic_id: str,
+        message: StoredMessage,
+        client_message_id: str | None = None,
+    ):
+        """Sends a single new message object (a user message with its idempotency key)."""
+        payload = message.to_json(topic_id)
+        if client_message_id:
+            payload["client_message_id"] = client_message_id
         logger.debug(
-            f"Sending message update (ID: {message.id}) to client '{client_id}'"
+            "Sending message update (ID: %s) to client '%s'", payload["id"], client_id
         )
-        update_data = {
-            "type": "new_message",
-            "payload": message.model_dump(mode="json"),
-        }
+        update_data = {"type": "new_message", "payload": payload}
         await connection_manager.send_json(update_data, client_id)
 
-    async def send_task_result_update(self, client_id: str, task_result: TaskResult):
+    async def send_task_result_update(
+        self, client_id: str, topic_id: str, task_result: StoredTaskResult
+    ):
         """Sends a single new task result object."""
+        payload = task_result.to_json(topic_id)
         logger.debug(
-            f"Sending task result update (ID: {task_result.id}) to client '{client_id}'"
+            "Sending task result update (ID: %s) to client '%s'",
+            payload["id"],
+            client_id,
         )
+        update_data = {"type": "new_task_result", "payload": payload}
+        await connection_manager.send_json(update_data, client_id)
+
+    async def send_generation_queued(
+        self, client_id: str, topic_id: str, position: int
+    ):
+        """Tells the client its agent response waits for a free generation slot."""
         update_data = {
-            "type": "new_task_result",
-            "payload": task_result.model_dump(mode="json"),
+            "type": "generation_queued",
+            "payload": {"topic_id": topic_id, "position": position},
         }
         await connection_manager.send_json(update_data, client_id)
 
+    async def send_rate_limited(
+        self,
+        client_id: str,
+        rejection: AdmissionRejected,
+        client_message_id: str | None = None,
+    ):
+        """Tells the client its message was not accepted and when to retry."""
+        logger.info("Rejected send_message from '%s': %s", client_id, rejection)
+        payload = {
+            "reason": rejection.reason,
+            "retry_after": round(rejection.retry_after, 1),
+        }
+        if client_message_id:
+            payload["client_message_id"] = client_message_id
+        update_data = {"type": "rate_limited", "payload": payload}
+        await connection_manager.send_json(update_data, client_id)
+
     async def send_active_topic_update(self, client_id: str, topic_id: str | None):
         """Informs the client which topic ID should be considered active (can be None)."""
         logger.debug(
-            f"Sending active topic update (Topic: {topic_id}) to client '{client_id}'"
+            "Sending active topic update (Topic: %s) to client '%s'",
+            topic_id,
+            client_id,
         )
         update_data = {"type": "active_topic_update", "payload": {"topic_id": topic_id}}
         await connection_manager.send_json(update_data, client_id)
@@ -437,7 +912,7 @@ class ChatManager:
         """Starts the background task that periodically cleans up inactive sessions."""
         if self._cleanup_task is None or self._cleanup_task.done():
             logger.info(
-                f"Starting session cleanup task (timeout: {self.SESSION_TIMEOUT})..."
+                "Starting session cleanup task (timeout: %s)...", self.SESSION_TIMEOUT
             )
             self._cleanup_task = asyncio.create_task(self._run_cleanup_loop())
         else:
@@ -455,7 +930,8 @@ class ChatManager:
                 logger.info("Session cleanup task cancelled normally.")
             except Exception as e:
                 logger.error(
-                    f"Exception while waiting for cleanup task cancellation: {e}",
+                    "Exception while waiting for cleanup task cancellation: %s",
+                    e,
                     exc_info=True,
                 )
             finally:
@@ -466,6 +942,58 @@ class ChatManager:
                 "Session cleanup task stop requested, but task not running or already completed."
             )
 
+    async def _cleanup_inactive_sessions(self) -> int:
+        """
+        One cleanup sweep: removes sessions inactive beyond the timeout,
+        their topics, and any lingering WebSocket. Returns the number removed.
+        """
+        now = now_tz()
+        # Identify clients whose last activity is older than the timeout
+        inactive_client_ids = {
+            client_id
+            for client_id, session in self.sessions.items()
+            if now - session.last_activity > self.SESSION_TIMEOUT
+        }
+
+        # If no inactive sessions, nothing to do until the next check
+        if not inactive_client_ids:
+            return 0
+
+        logger.info(
+            "Session cleanup: Found %s inactive sessions.", len(inactive_client_ids)
+        )
+        # 1. Remove associated topics from memory, in a single pass over all topics
+        topics_to_remove = [
+            tid for tid, t in self.topics.items() if t.client_id in inactive_client_ids
+        ]
+        if topics_to_remove:
+            logger.debug(
+                "Removing %s topics for inactive clients.", len(topics_to_remove)
+            )
+            for topic_id in topics_to_remove:
+                self._remove_topic(topic_id)
+
+        for client_id in inactive_client_ids:
+            # 2. Remove the session object itself
+            if self.sessions.pop(client_id, None) is not None:
+                logger.debug("Removed inactive session data for client '%s'", client_id)
+            rate_limiter.forget(client_id)
+            self._submissions.pop(client_id, None)
+
+            # 3. Attempt to close any potentially lingering WebSocket connection
+            websocket = connection_manager.active_connections.get(client_id)
+            if websocket:
+                logger.info(
+                    "Closing potentially lingering WebSocket for inactive client '%s'",
+                    client_id,
+                )
+                # Send standard close frame
+                await websocket.close(code=1000, reason="Session timed out")
+                # Ensure removal from connection manager (should also happen in router finally block)
+                connection_manager.disconnect(client_id, websocket)
+
+        return len(inactive_client_ids)
+
     async def _run_cleanup_loop(self):
         """The actual loop performing periodic session cleanup."""
         logger.info("Session cleanup loop started.")
@@ -473,56 +1001,9 @@ class ChatManager:
             # Wait for the check interval (e.g., 60 seconds)
             await asyncio.sleep(60)
             try:
-                now = now_tz()
-                # Identify clients whose last activity is older than the timeout
-                inactive_client_ids = [
-                    client_id
-                    for client_id, session in self.sessions.items()
-                    if now - session.last_activity > self.SESSION_TIMEOUT
-                ]
-
-                # If no inactive sessions, continue to next check
-                if not inactive_client_ids:
-                    # logger.debug("Session cleanup: No inactive sessions found.") # Optional: reduce log noise
-                    continue
-
-                logger.info(
-                    f"Session cleanup: Found {len(inactive_client_ids)} inactive sessions: {inactive_client_ids}"
-                )
-                for client_id in inactive_client_ids:
-                    # 1. Remove associated topics from memory
-                    # Iterate over a copy of keys/items if modifying the dict during iteration
-                    topics_to_remove = [
-                        tid
-                        for tid, t in list(self.topics.items())
-                        if t.client_id == client_id
-                    ]
-                    if topics_to_remove:
-                        logger.debug(
-                            f"Removing {len(topics_to_remove)} topics for inactive client '{client_id}'."
-                        )
-                        for topic_id in topics_to_remove:
-                            if topic_id in self.topics:
-                                del self.topics[topic_id]  # Remove topic data
-
-                    # 2. Remove the session object itself
-                    if client_id in self.sessions:
-                        del self.sessions[client_id]  # Remove session data
-                        logger.debug(
-                            f"Removed inactive session data for client '{client_id}'"
-                        )
-
-                    # 3. Attempt to close any potentially lingering WebSocket connection
-                    websocket = connection_manager.active_connections.get(client_id)
-                    if websocket:
-                        logger.info(
-                            f"Closing potentially lingering WebSocket for inactive client '{client_id}'"
-                        )
-                        # Send standard close frame
-                        await websocket.close(code=1000, reason="Session timed out")
-                        # Ensure removal from connection manager (should also happen in router finally block)
-                        connection_manager.disconnect(client_id)
-
+                sweep_started = time.perf_counter()
+                await self._cleanup_inactive_sessions()
+                cleanup_sweep_seconds.observe(time.perf_counter() - sweep_started)
             except asyncio.CancelledError:
                 # Expected when stop_cleanup_task is called
                 logger.info(
@@ -532,7 +1013,7 @@ class ChatManager:
             except Exception as e:
                 # Log unexpected errors but allow the loop to continue
                 logger.error(
-                    f"Error occurred in session cleanup loop: {e}", exc_info=True
+                    "Error occurred in session cleanup loop: %s", e, exc_info=True
                 )
                 # Consider waiting longer after an error to prevent rapid logging
                 await asyncio.sleep(300)
@@ -546,16 +1027,23 @@ class ChatManager:
         message_id: str,
         content_chunk: str,
         is_first_chunk: bool,
+        agent_id: str,
     ):
         """Sends a single chunk of an agent's streaming message."""
-        logger.debug(
-            f"Sending agent msg chunk (ID: {message_id}, First: {is_first_chunk}) to client '{client_id}'"
-        )
+        if _chunk_log_sampler.should_log():
+            logger.debug(
+                "Sending agent msg chunk (ID: %s, First: %s) to client '%s'",
+                message_id,
+                is_first_chunk,
+                client_id,
+                extra={"client_id": client_id, "topic_id": topic_id},
+            )
         update_data = {
             "type": "agent_message_chunk",
             "payload": {
                 "topic_id": topic_id,
                 "message_id": message_id,
+                "agent_id": agent_id,
                 "content_chunk": content_chunk,
                 "is_first_chunk": is_first_chunk,
                 # Add timestamp if needed, though less critical for chunks
@@ -566,16 +1054,29 @@ class ChatManager:
         await connection_manager.send_json(update_data, client_id)
 
     async def send_agent_stream_end(
-        self, client_id: str, topic_id: str, message_id: str
+        self,
+        client_id: str,
+        topic_id: str,
+        message_id: str,
+        agent_id: str,
+        error: str | None = None,
+        client_message_id: str | None = None,
     ):
-        """Signals the end of a streamed agent message."""
+        """
+        Signals the end of a streamed agent message (`error`: why it failed;
+        `client_message_id`: key of the user message it answers).
+        """
         logger.debug(
-            f"Sending agent msg stream end (ID: {message_id}) to client '{client_id}'"
+            "Sending agent msg stream end (ID: %s) to client '%s'",
+            message_id,
+            client_id,
         )
-        update_data = {
-            "type": "agent_stream_end",
-            "payload": {"topic_id": topic_id, "message_id": message_id},
-        }
+        payload = {"topic_id": topic_id, "message_id": message_id, "agent_id": agent_id}
+        if error:
+            payload["error"] = error
+        if client_message_id:
+            payload["client_message_id"] = client_message_id
+        update_data = {"type": "agent_stream_end", "payload": payload}
         await connection_manager.send_json(update_data, client_id)
 
 
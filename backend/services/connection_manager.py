@@ -1,7 +1,60 @@
+import asyncio
+import json
 import logging
-from fastapi import WebSocket
+import time
+import zlib
+from fastapi import WebSocket, WebSocketDisconnect
+from opentelemetry.trace import StatusCode
+
+from backend.config import settings
+from backend.logging_config import LogSampler
+from backend.services.metrics import (
+    ws_bytes_sent_total,
+    ws_compressed_frames_total,
+    ws_compression_saved_bytes_total,
+    ws_compression_seconds,
+    ws_connections_reaped_total,
+    ws_frames_sent_total,
+    ws_send_failures_total,
+)
+from backend.services.tracing import is_recording, start_child_span
 
 logger = logging.getLogger(__name__)
+_send_log_sampler = LogSampler(logger, logging.DEBUG, "ws.send")
+
+# Subprotocol a client offers to accept compressed frames. Large frames are
+# then sent as binary frames holding the raw-deflate (RFC 1951) compressed
+# UTF-8 JSON; everything else stays a text frame. Each frame is compressed
+# on its own, so no zlib context is held per connection while idle.
+COMPRESSION_SUBPROTOCOL = "chat.deflate"
+# Sent to idle clients; the client answers {"type": "pong"}
+_SERVER_PING = {"type": "ping"}
+# Frames at least this big are compressed in a worker thread (~1 ms at level 1)
+_COMPRESS_IN_THREAD_MIN_BYTES = 128 * 1024
+
+
+class EncodedFrame:
+    """
+    A frame serialized ahead of time, e.g. once for many recipients or from
+    cached JSON fragments. `send_json` sends its text as is.
+    """
+
+    __slots__ = ("type", "text")
+
+    def __init__(self, frame_type: str, text: str):
+        self.type = frame_type
+        self.text = text
+
+
+def deflate_frame(data: bytes) -> bytes:
+    """Compresses one frame payload with the configured level and window."""
+    compressor = zlib.compressobj(
+        settings.ws_compression_level,
+        zlib.DEFLATED,
+        -settings.ws_compression_window_bits,  # Negative: raw deflate, no header
+        settings.ws_compression_mem_level,
+    )
+    return compressor.compress(data) + compressor.flush()
 
 
 class ConnectionManager:
@@ -13,11 +66,22 @@ class ConnectionManager:
     - Handling connection acceptance and preventing duplicates.
     - Providing methods to send messages (text, JSON) to specific clients.
     - Handling disconnection cleanup.
+    - Pinging idle clients and reaping connections that stop answering.
     """
 
     def __init__(self):
         # dictionary to store active WebSocket connections {client_id: WebSocket}
         self.active_connections: dict[str, WebSocket] = {}
+        # Clients that negotiated COMPRESSION_SUBPROTOCOL
+        self.compressed_clients: set[str] = set()
+        # One frame at a time per connection, in call order: a big frame
+        # compressing in a worker thread must not be overtaken by a small one
+        self._send_locks: dict[str, asyncio.Lock] = {}
+        # Heartbeat state (time.monotonic()): last frame received from each
+        # client, and when an unanswered server ping was sent
+        self.last_seen: dict[str, float] = {}
+        self._ping_sent_at: dict[str, float] = {}
+        self._heartbeat_task: asyncio.Task | None = None
         logger.info("ConnectionManager initialized.")
 
     async def connect(self, websocket: WebSocket, client_id: str) -> bool:
@@ -31,33 +95,62 @@ class ConnectionManager:
         Returns:
             True if the connection was accepted, False if rejected (duplicate).
         """
-        await websocket.accept()
+        # Compression is negotiated per connection via the subprotocol offer
+        compress = (
+            settings.ws_compression_enabled
+            and COMPRESSION_SUBPROTOCOL in websocket.scope.get("subprotocols", ())
+        )
+        await websocket.accept(
+            subprotocol=COMPRESSION_SUBPROTOCOL if compress else None
+        )
         # Prevent multiple active connections for the same client ID
         if client_id in self.active_connections:
             logger.warning(
-                f"Client '{client_id}' attempting duplicate connection. Closing new attempt."
+                "Client '%s' attempting duplicate connection. Closing new attempt.",
+                client_id,
             )
             # Send a specific close code and reason
             await websocket.close(code=1008, reason="Session already active")
             return False  # Indicate connection failed
 
         self.active_connections[client_id] = websocket
+        self._send_locks[client_id] = asyncio.Lock()
+        self.last_seen[client_id] = time.monotonic()
+        if compress:
+            self.compressed_clients.add(client_id)
         logger.info(
-            f"Client '{client_id}' connected. Total connections: {len(self.active_connections)}"
+            "Client '%s' connected (compression=%s). Total connections: %s",
+            client_id,
+            compress,
+            len(self.active_connections),
         )
         return True  # Indicate connection successful
 
-    def disconnect(self, client_id: str):
+    def disconnect(self, client_id: str, websocket: WebSocket | None = None):
         """
         Removes a client's WebSocket connection from the manager.
         Safe to call even if the client is already disconnected.
+        When `websocket` is given, nothing is removed unless it is still the
+        client's registered connection (the client may have reconnected after
+        the old connection was reaped).
         """
+        if (
+            websocket is not None
+            and self.active_connections.get(client_id) is not websocket
+        ):
+            return
         if client_id in self.active_connections:
             # Remove the websocket object from the dictionary
             removed_ws = self.active_connections.pop(client_id, None)
+            self.compressed_clients.discard(client_id)
+            self._send_locks.pop(client_id, None)
+            self.last_seen.pop(client_id, None)
+            self._ping_sent_at.pop(client_id, None)
             if removed_ws:
                 logger.info(
-                    f"Client '{client_id}' disconnected. Total connections: {len(self.active_connections)}"
+                    "Client '%s' disconnected. Total connections: %s",
+                    client_id,
+                    len(self.active_connections),
                 )
             # else: # This case implies disconnect was called after pop already happened, likely okay.
             #     logger.debug(f"Disconnect called for '{client_id}', but WebSocket already removed.")
@@ -73,54 +166,235 @@ class ConnectionManager:
             except Exception as e:
                 # Log errors during send attempts, connection might be closing
                 logger.error(
-                    f"Error sending text message to '{client_id}': {e}", exc_info=True
+                    "Error sending text message to '%s': %s",
+                    client_id,
+                    e,
+                    exc_info=True,
                 )
                 # Consider closing the connection if send fails repeatedly
                 # await self._handle_send_error(client_id)
         # else: # Optional: Log if trying to send to a client not currently connected
         #     logger.warning(f"[WS Send Text] WebSocket not found for client_id '{client_id}'")
 
-    async def send_json(self, data: dict, client_id: str):
+    async def send_json(self, data: dict | EncodedFrame, client_id: str):
         """
-        Sends JSON serializable data to a specific connected client.
-        Logs message type and payload ID for debugging.
+        Sends JSON serializable data (or an already encoded frame) to a
+        specific connected client.
+        Logs message type and payload ID at DEBUG, subject to "ws.send" sampling.
         """
         websocket = self.active_connections.get(client_id)
+        encoded = isinstance(data, EncodedFrame)
         if websocket:  # Check if connection exists for this client_id
+            log_type = data.type if encoded else data.get("type", "N/A")
+            # Only created (name and attributes included) when the current
+            # action is being traced
+            span = (
+                start_child_span(f"ws.send {log_type}", {"client_id": client_id})
+                if is_recording()
+                else None
+            )
+            compress = client_id in self.compressed_clients
+            send_lock = self._send_locks[client_id]
             try:
-                # Extract info for logging before sending
-                log_type = data.get("type", "N/A")
-                log_payload = data.get("payload", {})
-                # Safely get 'id' from payload if it's a dictionary
-                log_msg_id = (
-                    log_payload.get("id", "N/A")
-                    if isinstance(log_payload, dict)
-                    else "N/A"
-                )
-
-                logger.info(
-                    f"[WS Send] Attempting to send JSON to '{client_id}'. Type='{log_type}', PayloadID='{log_msg_id}'"
-                )
-                await websocket.send_json(data)  # Perform the send operation
-                logger.debug(
-                    f"[WS Send] Successfully sent JSON to '{client_id}'. Type='{log_type}'"
+                # Same encoding as WebSocket.send_json, done here so the size can be recorded
+                text = (
+                    data.text
+                    if encoded
+                    else json.dumps(data, separators=(",", ":"), ensure_ascii=False)
                 )
+                async with send_lock:  # Frames leave in the order they were sent
+                    if compress and len(text) >= settings.ws_compression_min_bytes:
+                        size = await self._send_compressed(websocket, text, log_type)
+                    else:
+                        await websocket.send_text(text)  # Perform the send operation
+                        size = (
+                            len(text) if text.isascii() else len(text.encode("utf-8"))
+                        )
+                ws_frames_sent_total.labels(log_type).inc()
+                ws_bytes_sent_total.labels(log_type).inc(size)
+                if span:
+                    span.set_attribute("bytes", size)
+                # Per-frame log: skipped entirely unless DEBUG is on and sampled in
+                if _send_log_sampler.should_log():
+                    log_payload = None if encoded else data.get("payload")
+                    logger.debug(
+                        "[WS Send] Sent JSON to '%s'. Type='%s', PayloadID='%s'",
+                        client_id,
+                        log_type,
+                        (
+                            log_payload.get("id", "N/A")
+                            if isinstance(log_payload, dict)
+                            else "N/A"
+                        ),
+                        extra={"client_id": client_id, "frame_type": log_type},
+                    )
 
             except Exception as e:
+                ws_send_failures_total.labels(log_type).inc()
+                if span:
+                    span.record_exception(e)
+                    span.set_status(StatusCode.ERROR, str(e))
                 # Log errors during send, connection might be closing
                 logger.error(
-                    f"Error sending JSON to '{client_id}' (Type='{data.get('type', 'N/A')}'): {e}",
+                    "Error sending JSON to '%s' (Type='%s'): %s",
+                    client_id,
+                    log_type,
+                    e,
                     exc_info=True,
                 )
-                # Consider common error handling, e.g., closing the connection
-                # await self._handle_send_error(client_id)
+                if isinstance(e, (WebSocketDisconnect, RuntimeError, OSError)):
+                    # The socket is closed: unregister it now, or a reconnect
+                    # is refused until the receive loop (or the heartbeat)
+                    # notices
+                    self.disconnect(client_id, websocket)
+            finally:
+                if span:
+                    span.end()
         else:
             # Log clearly if the intended recipient is not connected
-            log_type = data.get("type", "N/A")
+            log_type = data.type if encoded else data.get("type", "N/A")
+            ws_send_failures_total.labels(log_type).inc()
             logger.warning(
-                f"[WS Send] WebSocket NOT FOUND for client_id '{client_id}' when trying to send type '{log_type}'"
+                "[WS Send] WebSocket NOT FOUND for client_id '%s' when trying to send type '%s'",
+                client_id,
+                log_type,
             )
 
+    async def _send_compressed(
+        self, websocket: WebSocket, text: str, frame_type: str
+    ) -> int:
+        """
+        Sends `text` as a compressed binary frame, or as plain text when
+        compression does not make it smaller. Returns the bytes sent.
+        """
+        raw = text.encode("utf-8")
+        started = time.perf_counter()
+        if len(raw) >= _COMPRESS_IN_THREAD_MIN_BYTES:
+            # zlib releases the GIL, so big frames don't stall the event loop
+            compressed = await asyncio.to_thread(deflate_frame, raw)
+        else:
+            compressed = deflate_frame(raw)
+        ws_compression_seconds.observe(time.perf_counter() - started)
+        if len(compressed) >= len(raw):
+            await websocket.send_text(text)
+            return len(raw)
+        await websocket.send_bytes(compressed)
+        ws_compressed_frames_total.labels(frame_type).inc()
+        ws_compression_saved_bytes_total.labels(frame_type).inc(
+            len(raw) - len(compressed)
+        )
+        return len(compressed)
+
+    def touch(self, client_id: str):
+        """Records that a frame was received from the client (any frame counts as a pong)."""
+        self.last_seen[client_id] = time.monotonic()
+        self._ping_sent_at.pop(client_id, None)
+
+    # --- Heartbeats ---
+
+    async def start_heartbeat_task(self):
+        """Starts the background task that pings idle clients and reaps dead ones."""
+        if settings.ws_heartbeat_interval_seconds <= 0:
+            logger.info("WebSocket heartbeats disabled.")
+            return
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            logger.info(
+                "Starting WebSocket heartbeat task (interval: %ss, timeout: %ss)...",
+                settings.ws_heartbeat_interval_seconds,
+                settings.ws_heartbeat_timeout_seconds,
+            )
+            self._heartbeat_task = asyncio.create_task(self._run_heartbeat_loop())
+
+    async def stop_heartbeat_task(self):
+        if self._heartbeat_task and not self._heartbeat_task.done():
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._heartbeat_task = None
+                logger.info("WebSocket heartbeat task stopped.")
+
+    async def _run_heartbeat_loop(self):
+        interval = settings.ws_heartbeat_interval_seconds
+        timeout = settings.ws_heartbeat_timeout_seconds
+        while True:
+            await asyncio.sleep(min(interval, timeout))
+            try:
+                await self._heartbeat_sweep(interval, timeout)
+            except Exception as e:
+                logger.error("Error during heartbeat sweep: %s", e, exc_info=True)
+
+    async def _heartbeat_sweep(self, interval: float, timeout: float):
+        """
+        Pings clients idle for `interval`; reaps those that sent nothing
+        within `timeout` of the ping. Active clients are never pinged.
+        """
+        now = time.monotonic()
+        to_ping: list[str] = []
+        to_reap: list[str] = []
+        for client_id in self.active_connections:
+            ping_sent_at = self._ping_sent_at.get(client_id)
+            if ping_sent_at is not None:
+                if now - ping_sent_at >= timeout:
+                    to_reap.append(client_id)
+            elif now - self.last_seen.get(client_id, now) >= interval:
+                to_ping.append(client_id)
+
+        for client_id in to_reap:
+            await self._reap(client_id)
+        if to_ping:
+            for client_id in to_ping:
+                self._ping_sent_at[client_id] = now
+            # Concurrent, and bounded so one stuck socket can't stall the sweep;
+            # an unfinished ping simply goes unanswered and is reaped next time
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(
+                        *(self.send_json(_SERVER_PING, cid) for cid in to_ping)
+                    ),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Some heartbeat pings did not complete in %ss", timeout)
+
+    async def _reap(self, client_id: str):
+        """Drops a connection that stopped answering pings and closes its socket."""
+        websocket = self.active_connections.get(client_id)
+        if websocket is None:
+            return
+        logger.warning(
+            "Client '%s' missed its heartbeat; closing dead connection.", client_id
+        )
+        ws_connections_reaped_total.inc()
+        # Removed first so a reconnect is accepted even if the close hangs
+        self.disconnect(client_id, websocket)
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=1001, reason="Heartbeat timeout"),
+                settings.ws_heartbeat_timeout_seconds,
+            )
+        except Exception as e:
+            logger.debug("Closing reaped connection for '%s' failed: %s", client_id, e)
+
+    async def close_all(self, code: int, reason: str, timeout: float = 5.0):
+        """Closes every active connection, e.g., at the end of a drain."""
+        connections = list(self.active_connections.items())
+        for client_id, websocket in connections:
+            self.disconnect(client_id, websocket)
+
+        async def close(client_id: str, websocket: WebSocket):
+            try:
+                await asyncio.wait_for(
+                    websocket.close(code=code, reason=reason), timeout
+                )
+            except Exception as e:
+                logger.debug("Closing connection for '%s' failed: %s", client_id, e)
+
+        await asyncio.gather(*(close(cid, ws) for cid, ws in connections))
+        logger.info("Closed %s connections (%s: %s)", len(connections), code, reason)
+
     async def broadcast(self, message: str):
         """Sends a plain text message to ALL currently connected clients."""
         # Note: Use this function with caution, especially in scaled environments.
@@ -128,13 +402,13 @@ class ConnectionManager:
         disconnected_clients = []
         # Iterate over a copy of the items to avoid runtime modification errors
         active_connections_copy = list(self.active_connections.items())
-        logger.info(f"Broadcasting message to {len(active_connections_copy)} clients.")
+        logger.info("Broadcasting message to %s clients.", len(active_connections_copy))
 
         for client_id, connection in active_connections_copy:
             try:
                 await connection.send_text(message)
             except Exception as e:
-                logger.error(f"Error broadcasting to client '{client_id}': {e}")
+                logger.error("Error broadcasting to client '%s': %s", client_id, e)
                 # Mark client for disconnection if broadcast fails
                 disconnected_clients.append(client_id)
 
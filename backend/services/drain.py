@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import random
+import time
+
+from pydantic import BaseModel
+
+from backend.config import settings
+from backend.services.admission import (
+    REASON_DRAINING,
+    AdmissionRejected,
+    admission_rejections_total,
+    generation_limiter,
+)
+from backend.services.chat_manager import chat_manager
+from backend.services.connection_manager import connection_manager
+
+logger = logging.getLogger(__name__)
+
+# Close code telling clients the server is restarting and they should reconnect
+SERVICE_RESTART = 1012
+
+
+class DrainStatus(BaseModel):
+    """Progress of a drain, as reported by GET /admin/drain."""
+
+    draining: bool
+    done: bool
+    elapsed_seconds: float | None = None
+    deadline_seconds: float | None = None
+    active_connections: int
+    active_generations: int
+    queued_generations: int
+    background_tasks: int
+
+
+class DrainController:
+    """
+    Takes the instance out of rotation before a deploy.
+
+    Once a drain starts, /ready reports 503 so the load balancer stops
+    routing here, new WebSocket connections and new messages are refused,
+    and every connected client is told to reconnect elsewhere after a
+    random delay (so they do not all reconnect at once). In-flight agent
+    streams, queued generations and background tasks are then given until
+    the deadline to finish, after which remaining connections are closed
+    with code 1012 (service restart).
+    """
+
+    def __init__(self):
+        self.draining = False
+        self._started_at: float | None = None
+        self._deadline: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def status(self) -> DrainStatus:
+        elapsed = (
+            time.monotonic() - self._started_at
+            if self._started_at is not None
+            else None
+        )
+        return DrainStatus(
+            draining=self.draining,
+            done=self._task is not None and self._task.done(),
+            elapsed_seconds=elapsed,
+            deadline_seconds=self._deadline,
+            active_connections=len(connection_manager.active_connections),
+            active_generations=generation_limiter.active,
+            queued_generations=generation_limiter.queued,
+            background_tasks=len(chat_manager.background_tasks),
+        )
+
+    def check(self):
+        """Raises AdmissionRejected for new work while draining."""
+        if self.draining:
+            admission_rejections_total.labels(REASON_DRAINING).inc()
+            raise AdmissionRejected(REASON_DRAINING, self.reconnect_delay())
+
+    def reconnect_delay(self) -> float:
+        """Random delay a client should wait before reconnecting."""
+        return round(random.uniform(0, settings.drain_reconnect_jitter_seconds), 2)
+
+    def start(self, deadline_seconds: float | None = None) -> asyncio.Task:
+        """Starts draining in the background; later calls return the same drain."""
+        if self._task is None:
+            self.draining = True
+            self._started_at = time.monotonic()
+            self._deadline = (
+                deadline_seconds
+                if deadline_seconds is not None
+                else settings.drain_timeout_seconds
+            )
+            self._task = asyncio.create_task(self._drain(self._deadline))
+        return self._task
+
+    async def drain(self, deadline_seconds: float | None = None):
+        """Drains (or waits for the drain already in progress) until done."""
+        await self.start(deadline_seconds)
+
+    def _busy(self) -> bool:
+        return bool(
+            generation_limiter.active
+            or generation_limiter.queued
+            or chat_manager.background_tasks
+        )
+
+    async def _drain(self, deadline_seconds: float):
+        logger.info(
+            "Drain started (deadline %ss, %s connections)",
+            deadline_seconds,
+            len(connection_manager.active_connections),
+        )
+        await asyncio.gather(
+            *(
+                connection_manager.send_json(
+                    {
+                        "type": "server_draining",
+                        "payload": {"reconnect_after": self.reconnect_delay()},
+                    },
+                    client_id,
+                )
+                for client_id in list(connection_manager.active_connections)
+            )
+        )
+
+        deadline = self._started_at + deadline_seconds
+        next_report = 0.0
+        while self._busy() and time.monotonic() < deadline:
+            if time.monotonic() >= next_report:
+                status = self.status()
+                logger.info(
+                    "Draining: %s generations running, %s queued, %s background tasks, %.0fs left",
+                    status.active_generations,
+                    status.queued_generations,
+                    status.background_tasks,
+                    deadline - time.monotonic(),
+                )
+                next_report = time.monotonic() + settings.drain_report_interval_seconds
+            await asyncio.sleep(0.1)
+
+        if self._busy():
+            status = self.status()
+            logger.warning(
+                "Drain deadline reached with %s generations, %s queued and %s background tasks unfinished",
+                status.active_generations,
+                status.queued_generations,
+                status.background_tasks,
+            )
+        await connection_manager.close_all(SERVICE_RESTART, "Server draining")
+        logger.info("Drain finished in %.1fs", time.monotonic() - self._started_at)
+
+
+# Create a singleton controller; drains start from POST /admin/drain or at shutdown
+drain_controller = DrainController()
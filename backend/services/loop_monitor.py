@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from pydantic import BaseModel
+
+from backend.config import settings
+from backend.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+event_loop_lag_seconds = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between a scheduled event-loop wakeup and when it actually ran.",
+    buckets=LAG_BUCKETS,
+)
+event_loop_stalls_total = registry.counter(
+    "event_loop_stalls_total",
+    "Times the event loop was blocked longer than the slow-callback threshold.",
+)
+
+
+class StallSample(BaseModel):
+    """Stack of the loop thread captured while it was blocked."""
+
+    detected_at: float  # time.time() when the watchdog took the sample
+    blocked_seconds: float  # How long the loop had been blocked at that moment
+    stack: list[str]
+
+
+class LoopMonitor:
+    """
+    Measures event-loop lag and samples the stack of long stalls.
+
+    A probe task on the loop sleeps for `interval` and records how late it
+    woke up. A watchdog thread checks the probe's heartbeat; when the loop
+    has not run the probe for longer than `threshold`, the callback running
+    right now is the culprit, so the watchdog captures the loop thread's
+    stack (once per stall) and logs it.
+    """
+
+    def __init__(self, interval: float, threshold: float, max_samples: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples: deque[StallSample] = deque(maxlen=max_samples)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Starts the probe task on the running loop and the watchdog thread."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            "Event-loop monitor started (interval=%ss, slow-callback threshold=%ss)",
+            self.interval,
+            self.threshold,
+        )
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.interval + 1)
+            self._watchdog = None
+        logger.info("Event-loop monitor stopped.")
+
+    async def _probe(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            event_loop_lag_seconds.observe(max(0.0, now - expected))
+
+    def _watch(self):
+        check_every = min(self.interval, self.threshold) / 2
+        sampled_heartbeat = None
+        while not self._stopping.wait(check_every):
+            heartbeat = self._heartbeat
+            # Heartbeats arrive every `interval` when the loop is healthy
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.threshold or heartbeat == sampled_heartbeat:
+                continue
+            sampled_heartbeat = heartbeat  # One sample per stall
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)
+            del frame
+            event_loop_stalls_total.inc()
+            self.samples.append(
+                StallSample(
+                    detected_at=time.time(), blocked_seconds=blocked, stack=stack
+                )
+            )
+            logger.warning(
+                "Event loop blocked for %.3fs; loop thread stack:\n%s",
+                blocked,
+                "".join(stack),
+            )
+
+
+# Create a singleton monitor; started from the lifespan when enabled in settings
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval_seconds,
+    threshold=settings.loop_slow_callback_seconds,
+)
@@ -0,0 +1,273 @@
+import asyncio
+import datetime
+import heapq
+import logging
+import sys
+import tracemalloc
+from collections import Counter
+
+from pydantic import BaseModel
+
+from backend.services.chat_manager import ChatManager
+
+logger = logging.getLogger(__name__)
+
+# Topics measured between yields to the event loop while building a report
+_YIELD_EVERY = 5000
+
+# Leaf types: their getsizeof already includes everything they own
+_ATOMIC_TYPES = (str, bytes, int, float, bool, type(None), datetime.datetime)
+
+
+def estimate_size(obj: object, seen: set[int] | None = None) -> int:
+    """
+    Approximate deep size of an object graph in bytes.
+
+    Follows containers, instance __dict__ and __slots__. Objects already in
+    `seen` (shared within one measurement) are counted once. Interned strings
+    shared across topics are counted for each topic, so totals overestimate
+    slightly; the figures are for spotting growth, not exact accounting.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _ATOMIC_TYPES):
+        return size
+
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key, seen) + estimate_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item, seen)
+
+    # Pydantic models keep field values in __dict__ plus a fields-set set
+    instance_dict = getattr(obj, "__dict__", None)
+    if instance_dict is not None:
+        size += estimate_size(instance_dict, seen)
+    for cls in type(obj).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            if slot in ("__dict__", "__weakref__"):
+                continue
+            value = getattr(obj, slot, None)
+            if value is not None:
+                size += estimate_size(value, seen)
+    return size
+
+
+class TopicMemory(BaseModel):
+    topic_id: str
+    client_id: str
+    messages: int
+    task_results: int
+    bytes: int
+
+
+class SessionMemory(BaseModel):
+    client_id: str
+    topics: int
+    bytes: int  # Session object plus all of its topics
+
+
+class MemoryReport(BaseModel):
+    """Estimated in-memory size of ChatManager state and pending asyncio work."""
+
+    sessions: int
+    topics: int
+    unloaded_histories: int  # Topic histories still in the warm-restart snapshot
+    session_bytes_total: int
+    topic_bytes_total: int
+    session_bytes_mean: float
+    topic_bytes_mean: float
+    orphaned_topics: int  # Topics whose owning session no longer exists
+    largest_topics: list[TopicMemory]
+    largest_sessions: list[SessionMemory]
+    pending_tasks: dict[str, int]  # Coroutine qualname -> count, most common first
+
+
+def pending_tasks_by_coroutine() -> dict[str, int]:
+    """Groups the loop's unfinished tasks by the qualified name of their coroutine."""
+    counts: Counter[str] = Counter()
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", None) or type(coro).__name__
+        counts[name] += 1
+    return dict(counts.most_common())
+
+
+async def build_memory_report(manager: ChatManager, top: int = 20) -> MemoryReport:
+    """
+    Measures every session and topic without hydrating lazily loaded histories.
+    Yields to the event loop periodically so large states do not stall it.
+    """
+    topics = list(manager.topics.values())
+    sessions = dict(manager.sessions)
+
+    topic_bytes_total = 0
+    largest_topics: list[tuple[int, int, TopicMemory]] = []
+    per_session: dict[str, list[int]] = {}  # client_id -> [bytes, topic count]
+    orphaned = 0
+    for i, topic in enumerate(topics):
+        size = estimate_size(topic)
+        topic_bytes_total += size
+        entry = TopicMemory(
+            topic_id=topic.id,
+            client_id=topic.client_id,
+            messages=len(topic.messages),
+            task_results=len(topic.task_results),
+            bytes=size,
+        )
+        # The index breaks ties so entries are never compared directly
+        if len(largest_topics) < top:
+            heapq.heappush(largest_topics, (size, i, entry))
+        elif size > largest_topics[0][0]:
+            heapq.heapreplace(largest_topics, (size, i, entry))
+        if topic.client_id in sessions:
+            totals = per_session.setdefault(topic.client_id, [0, 0])
+            totals[0] += size
+            totals[1] += 1
+        else:
+            orphaned += 1
+        if i % _YIELD_EVERY == _YIELD_EVERY - 1:
+            await asyncio.sleep(0)
+
+    session_bytes_total = 0
+    session_entries: list[SessionMemory] = []
+    for i, (client_id, session) in enumerate(sessions.items()):
+        topic_bytes, topic_count = per_session.get(client_id, (0, 0))
+        own = estimate_size(session)
+        session_bytes_total += own
+        session_entries.append(
+            SessionMemory(
+                client_id=client_id, topics=topic_count, bytes=own + topic_bytes
+            )
+        )
+        if i % _YIELD_EVERY == _YIELD_EVERY - 1:
+            await asyncio.sleep(0)
+
+    history_source = manager._history_source
+    return MemoryReport(
+        sessions=len(sessions),
+        topics=len(topics),
+        unloaded_histories=history_source.pending if history_source else 0,
+        session_bytes_total=session_bytes_total,
+        topic_bytes_total=topic_bytes_total,
+        session_bytes_mean=session_bytes_total / len(sessions) if sessions else 0.0,
+        topic_bytes_mean=topic_bytes_total / len(topics) if topics else 0.0,
+        orphaned_topics=orphaned,
+        largest_topics=[e for _, _, e in sorted(largest_topics, reverse=True)],
+        largest_sessions=heapq.nlargest(top, session_entries, key=lambda e: e.bytes),
+        pending_tasks=pending_tasks_by_coroutine(),
+    )
+
+
+# --- On-demand tracemalloc ---
+
+
+class AllocationDiff(BaseModel):
+    location: str  # "file:line" of the allocating frame
+    size_diff: int
+    size: int
+    count_diff: int
+    count: int
+
+
+class TracemallocStatus(BaseModel):
+    tracing: bool
+    traced_bytes: int = 0
+    peak_bytes: int = 0
+    snapshots: int = 0  # Snapshots taken since tracing started
+
+
+class TracemallocDiff(TracemallocStatus):
+    # Empty for the first snapshot, which only sets the baseline
+    top: list[AllocationDiff] = []
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+
+
+class TracemallocTracker:
+    """
+    Starts/stops tracemalloc on request and diffs consecutive snapshots.
+    Tracing slows every allocation, so it is never enabled implicitly.
+    """
+
+    def __init__(self):
+        self._previous: tracemalloc.Snapshot | None = None
+        self._snapshots = 0
+        self._snapshot_lock = asyncio.Lock()  # One snapshot/diff at a time
+
+    def status(self) -> TracemallocStatus:
+        if not tracemalloc.is_tracing():
+            return TracemallocStatus(tracing=False)
+        current, peak = tracemalloc.get_traced_memory()
+        return TracemallocStatus(
+            tracing=True,
+            traced_bytes=current,
+            peak_bytes=peak,
+            snapshots=self._snapshots,
+        )
+
+    def start(self, frames: int = 1) -> TracemallocStatus:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._previous = None
+            self._snapshots = 0
+            logger.info("tracemalloc started (frames=%s)", frames)
+        return self.status()
+
+    def stop(self) -> TracemallocStatus:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+        self._previous = None
+        self._snapshots = 0
+        return self.status()
+
+    async def snapshot(self, top: int = 25) -> TracemallocDiff:
+        """
+        Takes a snapshot and returns the top allocation changes since the
+        previous one. Raises RuntimeError when tracing has not been started.
+        Snapshotting and diffing walk every traced block, so both run in a
+        worker thread instead of stalling the event loop.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first.")
+        async with self._snapshot_lock:
+            snapshot = await asyncio.to_thread(_take_snapshot)
+            if not tracemalloc.is_tracing():  # Stopped while snapshotting
+                raise RuntimeError("tracemalloc was stopped during the snapshot.")
+            previous, self._previous = self._previous, snapshot
+            self._snapshots += 1
+            status = self.status()
+            if previous is None:
+                return TracemallocDiff(**status.model_dump())
+            stats = await asyncio.to_thread(snapshot.compare_to, previous, "lineno")
+
+        return TracemallocDiff(
+            **status.model_dump(),
+            top=[
+                AllocationDiff(
+                    location=f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    size_diff=stat.size_diff,
+                    size=stat.size,
+                    count_diff=stat.count_diff,
+                    count=stat.count,
+                )
+                for stat in stats[:top]
+            ],
+        )
+
+
+# Create a singleton tracker for the admin API
+tracemalloc_tracker = TracemallocTracker()
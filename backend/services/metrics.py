@@ -0,0 +1,305 @@
+import logging
+import math
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# --- Minimal Prometheus-compatible metrics ---
+# Everything runs on the single event loop, so recording is a dict lookup plus
+# an integer/float update: no locks and no string formatting in the hot path.
+# Text exposition is only built when /metrics is scraped.
+
+# Default latency buckets (seconds), from sub-millisecond to slow generations
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)  # fmt: skip
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(
+    names: tuple[str, ...], values: tuple[str, ...], extra: str = ""
+) -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Common label handling: children are created once per label combination."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Returns the child for these label values (cache it for hot paths)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = (
+            f"# HELP {self.name} {_escape(self.documentation)}\n"
+            f"# TYPE {self.name} {self.type_name}\n"
+        )
+        return header + "".join(line + "\n" for line in self._samples())
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._children[()].value += amount
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down. An optional callback is evaluated only at
+    scrape time, which suits sizes that are cheap to read (e.g., len(dict)).
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Callable[[], float] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._children[()].value = value
+
+    def inc(self, amount: float = 1):
+        self._children[()].value += amount
+
+    def dec(self, amount: float = 1):
+        self._children[()].value -= amount
+
+    def _samples(self):
+        if self._callback is not None:
+            try:
+                self._children[()].value = self._callback()
+            except Exception as e:
+                logger.warning("Gauge callback for '%s' failed: %s", self.name, e)
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Bucketed distribution; counts are made cumulative only when rendered."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self):
+        bounds = self.buckets + (math.inf,)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Holds metrics in registration order and renders the text exposition format."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Callable[[], float] | None = None,
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+# Create a singleton registry for the application
+registry = MetricsRegistry()
+
+# --- WebSocket pipeline metrics ---
+# Gauges for state sizes are attached with callbacks where the state lives
+# (see backend/main.py) to avoid import cycles.
+ws_message_handling_seconds = registry.histogram(
+    "ws_message_handling_seconds",
+    "Time spent handling one inbound WebSocket message, by message type.",
+    ["message_type"],
+)
+agent_time_to_first_chunk_seconds = registry.histogram(
+    "agent_time_to_first_chunk_seconds",
+    "Time from starting an agent response to sending its first chunk.",
+)
+agent_stream_duration_seconds = registry.histogram(
+    "agent_stream_duration_seconds",
+    "Time from starting an agent response to sending its stream end.",
+)
+duplicate_messages_total = registry.counter(
+    "duplicate_messages_total",
+    "Resent send_message frames answered from an earlier submission (same idempotency key).",
+)
+agent_generation_failures_total = registry.counter(
+    "agent_generation_failures_total",
+    "Agent responses that failed, by reason (error, timeout).",
+    ["reason"],
+)
+ws_frames_sent_total = registry.counter(
+    "ws_frames_sent_total", "WebSocket frames sent, by frame type.", ["type"]
+)
+ws_bytes_sent_total = registry.counter(
+    "ws_bytes_sent_total", "WebSocket payload bytes sent, by frame type.", ["type"]
+)
+ws_send_failures_total = registry.counter(
+    "ws_send_failures_total",
+    "WebSocket sends that raised or had no connection, by frame type.",
+    ["type"],
+)
+ws_compressed_frames_total = registry.counter(
+    "ws_compressed_frames_total",
+    "WebSocket frames sent deflate-compressed, by frame type.",
+    ["type"],
+)
+ws_compression_saved_bytes_total = registry.counter(
+    "ws_compression_saved_bytes_total",
+    "Payload bytes saved by frame compression, by frame type.",
+    ["type"],
+)
+ws_compression_seconds = registry.histogram(
+    "ws_compression_seconds",
+    "Time spent compressing one outbound WebSocket frame.",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025),
+)
+ws_connections_reaped_total = registry.counter(
+    "ws_connections_reaped_total",
+    "WebSocket connections closed for missing their heartbeat.",
+)
+cleanup_sweep_seconds = registry.histogram(
+    "cleanup_sweep_seconds", "Duration of one inactive-session cleanup sweep."
+)
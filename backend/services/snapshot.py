@@ -0,0 +1,207 @@
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+from pydantic import BaseModel, TypeAdapter
+
+from backend.models.chat import Session, StoredMessage, StoredTaskResult, Topic
+from backend.services.chat_manager import ChatManager
+
+logger = logging.getLogger(__name__)
+
+# --- Snapshot File Layout ---
+# MAGIC | history blob 0 | history blob 1 | ... | index | footer
+#
+# - Each history blob is the zlib-compressed JSON of one topic's messages
+#   and task results.
+# - The index is the zlib-compressed JSON of every session plus each topic's
+#   summary (without history) and the (offset, length) of its history blob.
+# - The footer stores the index offset/length followed by MAGIC again, so the
+#   reader can find the index without scanning the blobs.
+MAGIC = b"CHATSNP1"
+_FOOTER = struct.Struct("<QQ8s")
+
+
+class TopicHistory(BaseModel):
+    """The lazily-loaded part of a topic."""
+
+    # Validated from the stored API-model JSON straight into storage records
+    messages: list[StoredMessage] = []
+    task_results: list[StoredTaskResult] = []
+
+
+class SnapshotIndex(BaseModel):
+    """Everything loaded eagerly at startup."""
+
+    sessions: list[Session]
+    topics: list[Topic]  # Summaries only, histories are empty
+    histories: list[tuple[int, int]]  # (offset, length) per topic, same order
+
+
+_HISTORY_ADAPTER = TypeAdapter(TopicHistory)
+_INDEX_ADAPTER = TypeAdapter(SnapshotIndex)
+_HISTORY_FIELDS = {"messages", "task_results"}
+
+
+class SnapshotReader:
+    """
+    Serves topic histories from a memory-mapped snapshot file on demand.
+    Installed on the ChatManager as its history source after a load.
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._locations: dict[str, tuple[int, int]] = {}
+
+    def read_index(self) -> SnapshotIndex:
+        """Validates the file markers and decodes the eager index."""
+        if self._map[: len(MAGIC)] != MAGIC or len(self._map) < _FOOTER.size:
+            raise ValueError("Not a chat snapshot file")
+        index_offset, index_length, magic = _FOOTER.unpack_from(
+            self._map, len(self._map) - _FOOTER.size
+        )
+        if magic != MAGIC:
+            raise ValueError("Snapshot footer is corrupt or truncated")
+        raw = zlib.decompress(self._map[index_offset : index_offset + index_length])
+        index = _INDEX_ADAPTER.validate_json(raw)
+        self._locations = {
+            topic.id: location for topic, location in zip(index.topics, index.histories)
+        }
+        return index
+
+    @property
+    def pending(self) -> int:
+        """Number of topics whose history has not been loaded yet."""
+        return len(self._locations)
+
+    def raw_history(self, topic_id: str) -> bytes | None:
+        """Returns the still-compressed history blob for an unloaded topic."""
+        location = self._locations.get(topic_id)
+        if location is None:
+            return None
+        offset, length = location
+        return self._map[offset : offset + length]
+
+    def read_history(self, topic_id: str) -> TopicHistory | None:
+        """Decodes an unloaded topic's history without loading it (e.g., for an export)."""
+        blob = self.raw_history(topic_id)
+        if blob is None:
+            return None
+        return _HISTORY_ADAPTER.validate_json(zlib.decompress(blob))
+
+    def hydrate(self, topic: Topic):
+        """Loads the topic's history into it on first access (no-op afterwards)."""
+        history = self.read_history(topic.id)
+        if history is None:
+            return
+        del self._locations[topic.id]
+        # Keep anything appended before the history was first needed
+        topic.messages[:0] = history.messages
+        topic.task_results[:0] = history.task_results
+
+    def discard(self, topic_id: str):
+        """Forgets the history of a topic removed before it was ever loaded."""
+        self._locations.pop(topic_id, None)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def save_snapshot(manager: ChatManager, path: Path, compress_level: int = 1) -> int:
+    """
+    Writes sessions and topics to `path` atomically (temp file + rename).
+    Histories never loaded since the last restore are copied byte-for-byte.
+    Returns the number of bytes written.
+    """
+    started = time.perf_counter()
+    source = manager._history_source
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    topics: list[Topic] = []
+    histories: list[tuple[int, int]] = []
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for topic in list(manager.topics.values()):
+            blob = source.raw_history(topic.id) if source else None
+            if blob is not None and (topic.messages or topic.task_results):
+                # Partially loaded topic: merge old history with new entries
+                source.hydrate(topic)
+                blob = None
+            if blob is None:
+                blob = zlib.compress(
+                    topic.model_dump_json(include=_HISTORY_FIELDS).encode("utf-8"),
+                    compress_level,
+                )
+            f.write(blob)
+            topics.append(topic.model_copy(update={"messages": [], "task_results": []}))
+            histories.append((offset, len(blob)))
+            offset += len(blob)
+
+        index = SnapshotIndex(
+            sessions=list(manager.sessions.values()),
+            topics=topics,
+            histories=histories,
+        )
+        index_blob = zlib.compress(_INDEX_ADAPTER.dump_json(index), compress_level)
+        f.write(index_blob)
+        f.write(_FOOTER.pack(offset, len(index_blob), MAGIC))
+        size = offset + len(index_blob) + _FOOTER.size
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    logger.info(
+        "Snapshot saved to '%s': %s sessions, %s topics, %s bytes in %.2fs",
+        path,
+        len(index.sessions),
+        len(topics),
+        size,
+        time.perf_counter() - started,
+    )
+    return size
+
+
+def load_snapshot(manager: ChatManager, path: Path) -> bool:
+    """
+    Restores sessions and topic summaries from `path`.
+    Topic histories stay on disk until ChatManager.get_topic first touches them.
+    Returns False if there was no usable snapshot.
+    """
+    if not path.exists():
+        logger.info("No snapshot found at '%s', starting with empty state.", path)
+        return False
+
+    started = time.perf_counter()
+    reader: SnapshotReader | None = None
+    try:
+        reader = SnapshotReader(path)
+        index = reader.read_index()
+    except Exception as e:
+        logger.error("Failed to read snapshot '%s': %s", path, e, exc_info=True)
+        if reader:
+            reader.close()
+        return False
+
+    for session in index.sessions:
+        manager.sessions[session.client_id] = session
+    for topic in index.topics:
+        manager.topics[topic.id] = topic
+    if reader.pending:
+        manager.set_history_source(reader)
+    else:
+        reader.close()
+    logger.info(
+        "Snapshot loaded from '%s': %s sessions, %s topics in %.2fs (histories load on first access)",
+        path,
+        len(index.sessions),
+        len(index.topics),
+        time.perf_counter() - started,
+    )
+    return True
@@ -0,0 +1,299 @@
+import logging
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from typing import Annotated, Literal, Union
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from backend.models.chat import (
+    Message,
+    Session,
+    StoredMessage,
+    StoredTaskResult,
+    TaskResult,
+    Topic,
+)
+from backend.services.chat_manager import ChatManager
+
+logger = logging.getLogger(__name__)
+
+
+# --- NDJSON Record Schema ---
+# Every exported line is one of these records, tagged by 'kind'.
+# Topics are exported without their messages/results, which follow
+# the topic line as individual records so no line grows unbounded.
+
+
+class SessionRecord(BaseModel):
+    kind: Literal["session"]
+    data: Session
+
+
+class TopicRecord(BaseModel):
+    kind: Literal["topic"]
+    data: Topic
+
+
+class MessageRecord(BaseModel):
+    kind: Literal["message"]
+    data: Message
+
+
+class TaskResultRecord(BaseModel):
+    kind: Literal["task_result"]
+    data: TaskResult
+
+
+ExportRecord = Annotated[
+    Union[SessionRecord, TopicRecord, MessageRecord, TaskResultRecord],
+    Field(discriminator="kind"),
+]
+
+# Precompiled adapters: a whole import batch is validated in a single call
+_RECORD_BATCH_ADAPTER = TypeAdapter(list[ExportRecord])
+_SESSION_ADAPTER = TypeAdapter(Session)
+_MESSAGE_ADAPTER = TypeAdapter(Message)
+_TASK_RESULT_ADAPTER = TypeAdapter(TaskResult)
+
+# Fields dumped for a topic line (history is streamed as separate records)
+_TOPIC_HEADER_EXCLUDE = {"messages", "task_results"}
+
+
+def _record_line(kind: bytes, data_json: bytes) -> bytes:
+    """Wraps an already-serialized model into a single NDJSON record line."""
+    return b'{"kind":"' + kind + b'","data":' + data_json + b"}\n"
+
+
+async def iter_export_lines(
+    manager: ChatManager, lines_per_chunk: int = 500
+) -> AsyncIterator[bytes]:
+    """
+    Streams the manager's state as NDJSON, one record per line.
+
+    Only the key lists are copied up front; each model is serialized when
+    its line is produced, so memory stays flat regardless of state size.
+    Histories still in the restored snapshot are decoded one topic at a time
+    for the export only, so it does not load them into memory for good.
+    Lines are grouped into chunks to keep the number of writes low.
+    """
+    buffer: list[bytes] = []
+
+    # Sessions first so topics can be attached to an existing session on import
+    for client_id in list(manager.sessions):
+        session = manager.sessions.get(client_id)
+        if session is None:  # Removed by cleanup while exporting
+            continue
+        buffer.append(_record_line(b"session", _SESSION_ADAPTER.dump_json(session)))
+        if len(buffer) >= lines_per_chunk:
+            yield b"".join(buffer)
+            buffer.clear()
+
+    for topic_id in list(manager.topics):
+        topic = manager.topics.get(topic_id)
+        if topic is None:
+            continue
+        # Copy the list references so appends during export do not break iteration
+        messages = list(topic.messages)
+        task_results = list(topic.task_results)
+        # Looked up per topic: the source is closed once every history is loaded
+        source = manager._history_source
+        history = source.read_history(topic_id) if source is not None else None
+        if history is not None:
+            # Entries added since the restore follow the snapshot history
+            messages[:0] = history.messages
+            task_results[:0] = history.task_results
+        buffer.append(
+            _record_line(
+                b"topic",
+                topic.model_dump_json(exclude=_TOPIC_HEADER_EXCLUDE).encode("utf-8"),
+            )
+        )
+        for message in messages:
+            buffer.append(
+                _record_line(
+                    b"message", _MESSAGE_ADAPTER.dump_json(message.to_model(topic.id))
+                )
+            )
+            if len(buffer) >= lines_per_chunk:
+                yield b"".join(buffer)
+                buffer.clear()
+        for result in task_results:
+            buffer.append(
+                _record_line(
+                    b"task_result",
+                    _TASK_RESULT_ADAPTER.dump_json(result.to_model(topic.id)),
+                )
+            )
+            if len(buffer) >= lines_per_chunk:
+                yield b"".join(buffer)
+                buffer.clear()
+        if len(buffer) >= lines_per_chunk:
+            yield b"".join(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def gzip_stream(
+    chunks: AsyncIterable[bytes], level: int = 6
+) -> AsyncIterator[bytes]:
+    """Compresses a byte stream into gzip format incrementally."""
+    # wbits=31 -> gzip container
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def iter_import_lines(
+    chunks: AsyncIterable[bytes], compressed: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Splits a (possibly gzip/zlib compressed) byte stream into NDJSON lines.
+    Only the trailing partial line is buffered between chunks.
+    Raises zlib.error for compressed data in any other format (e.g., raw
+    deflate without the zlib header).
+    """
+    # wbits=47 auto-detects a gzip or zlib header
+    decompressor = zlib.decompressobj(47) if compressed else None
+    remainder = b""
+    async for chunk in chunks:
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        if not chunk:
+            continue
+        data = remainder + chunk
+        lines = data.split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if decompressor is not None:
+        remainder += decompressor.flush()
+    if remainder.strip():
+        yield remainder
+
+
+class ImportStats(BaseModel):
+    """Counts of records applied (or skipped) by a bulk import."""
+
+    sessions: int = 0
+    topics: int = 0
+    messages: int = 0
+    task_results: int = 0
+    skipped: int = 0
+    batches: int = 0
+
+
+class _ImportStage:
+    """
+    Records validated so far. Nothing reaches the manager until commit(),
+    so an import that fails on a later batch leaves the state untouched.
+    """
+
+    def __init__(self):
+        self.sessions: dict[str, Session] = {}
+        self.topics: dict[str, Topic] = {}
+        # History for topics that already exist in the manager, by topic ID
+        self.messages: dict[str, list[StoredMessage]] = {}
+        self.task_results: dict[str, list[StoredTaskResult]] = {}
+        self.skipped = 0
+
+    def _stage_history(self, manager: ChatManager, topic_id: str, field: str, entry):
+        """Adds a message or task result to its staged or existing topic."""
+        topic = self.topics.get(topic_id)
+        if topic is not None:  # Imported in this same body
+            getattr(topic, field).append(entry)
+        elif topic_id in manager.topics:
+            getattr(self, field).setdefault(topic_id, []).append(entry)
+        else:
+            self.skipped += 1
+
+    def add_batch(self, manager: ChatManager, batch: Iterable[bytes]):
+        """Validates a batch of NDJSON lines in one call and stages the records."""
+        records = _RECORD_BATCH_ADAPTER.validate_json(b"[" + b",".join(batch) + b"]")
+        for record in records:
+            if isinstance(record, MessageRecord):
+                self._stage_history(
+                    manager,
+                    record.data.topic_id,
+                    "messages",
+                    StoredMessage.from_model(record.data),
+                )
+            elif isinstance(record, TaskResultRecord):
+                self._stage_history(
+                    manager,
+                    record.data.topic_id,
+                    "task_results",
+                    StoredTaskResult.from_model(record.data),
+                )
+            elif isinstance(record, TopicRecord):
+                topic = record.data
+                # Replaced topics lose what was staged for the old one
+                self.messages.pop(topic.id, None)
+                self.task_results.pop(topic.id, None)
+                self.topics[topic.id] = topic
+            else:  # SessionRecord
+                self.sessions[record.data.client_id] = record.data
+
+    def commit(self, manager: ChatManager, stats: ImportStats):
+        """Applies every staged record at once (no awaits in between)."""
+        manager.sessions.update(self.sessions)
+        stats.sessions = len(self.sessions)
+        stats.skipped = self.skipped
+        for topic in self.topics.values():
+            manager.replace_topic(topic)
+            stats.messages += len(topic.messages)
+            stats.task_results += len(topic.task_results)
+        stats.topics = len(self.topics)
+        for staged, field in (
+            (self.messages, "messages"),
+            (self.task_results, "task_results"),
+        ):
+            for topic_id, entries in staged.items():
+                topic = manager.topics.get(topic_id)
+                if topic is None:  # Deleted while the body was streaming
+                    stats.skipped += len(entries)
+                    continue
+                getattr(topic, field).extend(entries)
+                setattr(stats, field, getattr(stats, field) + len(entries))
+
+
+async def import_lines(
+    manager: ChatManager, lines: AsyncIterable[bytes], batch_size: int = 5000
+) -> ImportStats:
+    """
+    Loads NDJSON export records into the manager in batches.
+
+    Each batch is validated with a single precompiled TypeAdapter call, so
+    no per-line JSON parsing or model construction happens in Python.
+    The import is all or nothing: records are staged until the whole body
+    has been read and validated, so a ValidationError (or a broken stream)
+    changes nothing. Existing sessions/topics with the same IDs are replaced.
+    """
+    stats = ImportStats()
+    stage = _ImportStage()
+    batch: list[bytes] = []
+    async for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            stage.add_batch(manager, batch)
+            stats.batches += 1
+            batch.clear()
+    if batch:
+        stage.add_batch(manager, batch)
+        stats.batches += 1
+    stage.commit(manager, stats)
+    logger.info(
+        "Bulk import complete: %s sessions, %s topics, %s messages, %s task results (%s skipped, %s batches)",
+        stats.sessions,
+        stats.topics,
+        stats.messages,
+        stats.task_results,
+        stats.skipped,
+        stats.batches,
+    )
+    return stats
@@ -0,0 +1,269 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from backend.services.metrics import registry
+
+try:  # Optional: brotli variants are only built when the module is installed
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# --- Static assets served from memory ---
+# Every file under the static directory is read once, hashed and compressed
+# (gzip, plus brotli when available) when loaded. Responses are then a dict
+# lookup and a bytes write: no filesystem access and no compression per
+# request. Pages link to content-hashed URLs (/static/js/app.<hash>.js),
+# which are cached as immutable; a changed file gets a new URL.
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"  # Cache, but revalidate with If-None-Match every time
+# Variants smaller than this fraction of the original are not worth keeping
+_MIN_SAVING = 0.9
+
+static_responses_total = registry.counter(
+    "static_responses_total",
+    "Responses for static assets and the index page, by kind, status and encoding.",
+    ["kind", "status", "encoding"],
+)
+
+
+def _compress(body: bytes) -> dict[str, bytes]:
+    variants = {"identity": body}
+    # mtime=0 keeps the gzip bytes (and so the ETag) stable across restarts
+    variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return {
+        encoding: data
+        for encoding, data in variants.items()
+        if encoding == "identity" or len(data) < len(body) * _MIN_SAVING
+    }
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    """Codings the client accepts (q > 0) from an Accept-Encoding header."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CompressedBody:
+    """One response body with its precompressed variants and strong ETags."""
+
+    __slots__ = ("content_type", "digest", "variants")
+
+    def __init__(self, body: bytes, content_type: str):
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.variants = _compress(body)
+
+    def etag(self, encoding: str) -> str:
+        # Strong ETags must differ per representation (RFC 9110 8.8.3)
+        suffix = "" if encoding == "identity" else f"-{encoding}"
+        return f'"{self.digest[:20]}{suffix}"'
+
+    def negotiate(self, accept_encoding: str | None) -> str:
+        """Smallest variant the client accepts."""
+        if accept_encoding and len(self.variants) > 1:
+            accepted = _accepted_encodings(accept_encoding)
+            for encoding in ("br", "gzip"):
+                if encoding in self.variants and (
+                    encoding in accepted or "*" in accepted
+                ):
+                    return encoding
+        return "identity"
+
+    def respond(
+        self,
+        accept_encoding: str | None,
+        if_none_match: str | None,
+        cache_control: str,
+    ) -> tuple[int, dict[str, str], bytes]:
+        """Returns (status, headers, body), honouring If-None-Match with a 304."""
+        encoding = self.negotiate(accept_encoding)
+        etag = self.etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return 304, headers, b""
+        headers["Content-Type"] = self.content_type
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, headers, self.variants[encoding]
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/ prefixes are ignored
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class StaticAssets:
+    """
+    In-memory copy of a static directory, addressable by original path
+    (e.g., "js/app.js") and by content-hashed path ("js/app.<hash>.js").
+    """
+
+    def __init__(self, directory: Path, url_prefix: str = "/static"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self._assets: dict[str, CompressedBody] = {}  # Original path -> body
+        self._hashed: dict[str, str] = {}  # Hashed path -> original path
+        self._stamps: dict[str, tuple[int, int]] = {}  # (mtime_ns, size) per file
+        self.version = 0  # Incremented whenever the set of hashed URLs changes
+
+    def load(self) -> bool:
+        """
+        Loads new and changed files (unchanged ones are kept) and drops
+        deleted ones. Returns True when anything changed. Blocking (reads and
+        compresses files): at startup, or from a worker thread while serving.
+        """
+        started = time.perf_counter()
+        seen: set[str] = set()
+        changed = False
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full = Path(root, name)
+                path = full.relative_to(self.directory).as_posix()
+                seen.add(path)
+                stat = full.stat()
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                if self._stamps.get(path) == stamp:
+                    continue
+                content_type = (
+                    mimetypes.guess_type(name)[0] or "application/octet-stream"
+                )
+                if content_type.startswith("text/") or content_type in (
+                    "application/javascript",
+                    "application/json",
+                ):
+                    content_type += "; charset=utf-8"
+                self._assets[path] = CompressedBody(full.read_bytes(), content_type)
+                self._stamps[path] = stamp
+                changed = True
+        for path in self._assets.keys() - seen:
+            del self._assets[path]
+            del self._stamps[path]
+            changed = True
+        if changed:
+            self._hashed = {
+                self._hashed_path(path, body): path
+                for path, body in self._assets.items()
+            }
+            self.version += 1
+            logger.info(
+                "Loaded %s static assets from '%s' in %.1f ms (brotli=%s)",
+                len(self._assets),
+                self.directory,
+                (time.perf_counter() - started) * 1000,
+                brotli is not None,
+            )
+        return changed
+
+    @staticmethod
+    def _hashed_path(path: str, body: CompressedBody) -> str:
+        stem, dot, suffix = path.rpartition(".")
+        if not dot:
+            return f"{path}.{body.digest[:12]}"
+        return f"{stem}.{body.digest[:12]}.{suffix}"
+
+    def url_for(self, path: str) -> str:
+        """Content-hashed URL of an asset (the plain URL if it is unknown)."""
+        body = self._assets.get(path)
+        if body is None:
+            logger.warning("Unknown static asset referenced: '%s'", path)
+            return f"{self.url_prefix}/{path}"
+        return f"{self.url_prefix}/{self._hashed_path(path, body)}"
+
+    def lookup(self, path: str) -> tuple[CompressedBody, str] | None:
+        """Returns (body, Cache-Control) for a hashed or original path."""
+        original = self._hashed.get(path)
+        # .get(): a reload in a worker thread may be dropping the file right now
+        body = self._assets.get(original) if original is not None else None
+        if body is not None:
+            return body, IMMUTABLE
+        body = self._assets.get(path)
+        if body is not None:
+            return body, REVALIDATE
+        return None
+
+
+class CachedPage:
+    """
+    A page rendered once and re-rendered only when its inputs change.
+    `fingerprint` (e.g., file mtimes) is evaluated at most once per
+    `check_interval` seconds. It and any re-render run in a worker thread,
+    as both may read files and compress, so the event loop never waits on them.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[], str],
+        fingerprint: Callable[[], object],
+        check_interval: float = 1.0,
+    ):
+        self._render = render
+        self._fingerprint = fingerprint
+        self.check_interval = check_interval
+        self._body: CompressedBody | None = None
+        self._stamp: object = None
+        self._next_check = 0.0
+        self._refresh_lock = asyncio.Lock()  # One check at a time
+
+    async def get(self) -> CompressedBody:
+        if self._body is None or time.monotonic() >= self._next_check:
+            async with self._refresh_lock:
+                # Another request may have checked while this one waited
+                if self._body is None or time.monotonic() >= self._next_check:
+                    await asyncio.to_thread(self._refresh)
+                    self._next_check = time.monotonic() + self.check_interval
+        return self._body
+
+    def _refresh(self):
+        stamp = self._fingerprint()
+        if self._body is None or stamp != self._stamp:
+            self._body = CompressedBody(
+                self._render().encode(), "text/html; charset=utf-8"
+            )
+            self._stamp = stamp
+            logger.info("Rendered page cache (etag %s)", self._body.etag("identity"))
+
+
+def directory_fingerprint(directory: Path) -> tuple[tuple[str, int], ...]:
+    """(path, mtime_ns) of every file under `directory`, for change detection."""
+    return tuple(
+        sorted(
+            (os.path.join(root, name), os.stat(os.path.join(root, name)).st_mtime_ns)
+            for root, _, files in os.walk(directory)
+            for name in files
+        )
+    )
+
+
+# Create a singleton for the bundled frontend assets; loaded at startup
+static_assets = StaticAssets(Path(__file__).resolve().parent.parent / "static")
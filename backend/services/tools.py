@@ -0,0 +1,300 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Literal
+
+from backend.config import settings
+from backend.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# --- Agent tool execution ---
+# Tools are registered once with how they must run:
+#
+# - inline: coroutine functions, awaited on the event loop (async I/O).
+# - thread: blocking functions (sync I/O), run in a shared thread pool.
+# - process: CPU-heavy functions, run in a shared process pool. They must be
+#   module-level functions with picklable arguments and results.
+#
+# Each tool has its own timeout and concurrency limit. Calls over the limit
+# wait for a free slot; the timeout covers the run itself, not that wait.
+# A thread or process that times out cannot be interrupted: the caller gets
+# the timeout right away, but the run keeps its slot until it really ends, so
+# the limit also bounds abandoned runs.
+# Results of deterministic tools are cached (LRU, per tool) by their
+# arguments, and identical calls made while one is running share its result.
+
+ToolMode = Literal["inline", "thread", "process"]
+
+REASON_UNKNOWN = "unknown_tool"
+REASON_TIMEOUT = "timeout"
+REASON_ERROR = "error"
+
+tool_calls_total = registry.counter(
+    "tool_calls_total",
+    "Agent tool calls, by tool and result (ok, cached, coalesced, timeout, error).",
+    ["tool", "result"],
+)
+tool_call_seconds = registry.histogram(
+    "tool_call_seconds",
+    "Run time of agent tool calls that executed (excludes cache hits), by tool.",
+    ["tool"],
+)
+
+
+class ToolError(Exception):
+    """A tool call failed; `reason` is REASON_UNKNOWN, REASON_TIMEOUT or REASON_ERROR."""
+
+    def __init__(self, tool: str, reason: str, detail: str):
+        super().__init__(f"Tool '{tool}' {reason}: {detail}")
+        self.tool = tool
+        self.reason = reason
+
+
+class Tool:
+    """A registered tool and its execution policy."""
+
+    __slots__ = (
+        "name",
+        "fn",
+        "mode",
+        "timeout_seconds",
+        "max_concurrency",
+        "deterministic",
+        "cache_size",
+        "_slots",
+        "_cache",
+        "_in_flight",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        mode: ToolMode,
+        timeout_seconds: float,
+        max_concurrency: int,
+        deterministic: bool,
+        cache_size: int,
+    ):
+        self.name = name
+        self.fn = fn
+        self.mode = mode
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrency = max(max_concurrency, 1)
+        self.deterministic = deterministic
+        self.cache_size = cache_size
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def cache_key(self, arguments: dict[str, Any]) -> str | None:
+        """Canonical JSON of the arguments, or None when they are not JSON."""
+        if not self.deterministic or self.cache_size <= 0:
+            return None
+        try:
+            return json.dumps(arguments, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+
+    def _remember(self, key: str, result: Any):
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def _check_mode(fn: Callable, mode: ToolMode):
+    is_async = inspect.iscoroutinefunction(fn)
+    if mode == "inline" and not is_async:
+        raise ValueError(
+            f"Inline tool '{fn.__name__}' must be a coroutine function; "
+            "use mode 'thread' for blocking functions"
+        )
+    if mode != "inline" and is_async:
+        raise ValueError(f"Tool '{fn.__name__}' is async; use mode 'inline'")
+    if mode == "process" and fn.__qualname__ != fn.__name__:
+        # Sent to the worker by reference: it must be importable by name
+        raise ValueError(f"Process tool '{fn.__qualname__}' must be module-level")
+
+
+class ToolExecutor:
+    """
+    Registry of agent tools and the pools they run in.
+    Pools are created on first use and shut down with the application.
+    """
+
+    def __init__(self):
+        self._tools: dict[str, Tool] = {}
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+
+    def register(
+        self,
+        fn: Callable,
+        *,
+        name: str | None = None,
+        mode: ToolMode = "inline",
+        timeout_seconds: float | None = None,
+        max_concurrency: int | None = None,
+        deterministic: bool = False,
+        cache_size: int | None = None,
+    ) -> Tool:
+        """Registers `fn` as a tool; raises ValueError if it cannot run in `mode`."""
+        _check_mode(fn, mode)
+        tool = Tool(
+            name or fn.__name__,
+            fn,
+            mode,
+            timeout_seconds or settings.tool_timeout_seconds,
+            max_concurrency or settings.tool_max_concurrency,
+            deterministic,
+            settings.tool_cache_size if cache_size is None else cache_size,
+        )
+        if tool.name in self._tools:
+            raise ValueError(f"Tool '{tool.name}' already registered")
+        self._tools[tool.name] = tool
+        return tool
+
+    def tool(self, **options) -> Callable[[Callable], Callable]:
+        """Decorator form of register(); the function is returned unchanged."""
+
+        def decorate(fn: Callable) -> Callable:
+            self.register(fn, **options)
+            return fn
+
+        return decorate
+
+    def get(self, name: str) -> Tool | None:
+        return self._tools.get(name)
+
+    def unregister(self, name: str):
+        self._tools.pop(name, None)
+
+    def agent_function(self, name: str) -> Callable:
+        """
+        An async function with the tool's name, signature and docstring that
+        calls it through the executor, for agent frameworks that take plain
+        functions as tools (e.g., pydantic-ai's Agent(tools=[...])).
+        """
+        tool = self._tools[name]
+
+        async def call(**arguments):
+            return await self.call(name, **arguments)
+
+        return functools.update_wrapper(call, tool.fn)
+
+    async def call(self, name: str, /, **arguments) -> Any:
+        """Runs a tool with keyword arguments. Raises ToolError when it fails."""
+        tool = self._tools.get(name)
+        if tool is None:
+            tool_calls_total.labels(name, REASON_UNKNOWN).inc()
+            raise ToolError(name, REASON_UNKNOWN, "no such tool")
+        key = tool.cache_key(arguments)
+        if key is None:
+            return await self._run(tool, arguments)
+
+        if key in tool._cache:
+            tool._cache.move_to_end(key)
+            tool_calls_total.labels(name, "cached").inc()
+            return tool._cache[key]
+        pending = tool._in_flight.get(key)
+        if pending is None:
+            # The shared run is a task of its own, not part of the first
+            # caller's, so it outlives any caller that gives up
+            pending = asyncio.create_task(self._run_shared(tool, key, arguments))
+            # Marks the exception as retrieved when every caller gave up
+            pending.add_done_callback(lambda t: t.cancelled() or t.exception())
+            tool._in_flight[key] = pending
+        else:
+            tool_calls_total.labels(name, "coalesced").inc()
+        # Shielded: a caller that gives up does not cancel the shared run
+        return await asyncio.shield(pending)
+
+    async def _run_shared(self, tool: Tool, key: str, arguments: dict[str, Any]):
+        try:
+            result = await self._run(tool, arguments)
+        finally:
+            del tool._in_flight[key]
+        tool._remember(key, result)  # Failures are not cached
+        return result
+
+    async def _run(self, tool: Tool, arguments: dict[str, Any]) -> Any:
+        await tool._slots.acquire()
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(tool.timeout_seconds) as deadline:
+                if tool.mode == "inline":
+                    try:
+                        result = await tool.fn(**arguments)
+                    finally:
+                        tool._slots.release()
+                else:
+                    result = await self._run_in_pool(tool, arguments)
+        except TimeoutError as e:
+            if not deadline.expired():
+                raise self._failed(tool, e) from e  # Raised by the tool itself
+            tool_calls_total.labels(tool.name, REASON_TIMEOUT).inc()
+            logger.warning(
+                "Tool '%s' timed out after %ss", tool.name, tool.timeout_seconds
+            )
+            raise ToolError(
+                tool.name, REASON_TIMEOUT, f"no result within {tool.timeout_seconds}s"
+            ) from e
+        except Exception as e:
+            raise self._failed(tool, e) from e
+        tool_call_seconds.labels(tool.name).observe(time.perf_counter() - started)
+        tool_calls_total.labels(tool.name, "ok").inc()
+        return result
+
+    async def _run_in_pool(self, tool: Tool, arguments: dict[str, Any]) -> Any:
+        """Runs in the tool's pool; the slot taken by _run is released when the run ends."""
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool(tool.mode), functools.partial(tool.fn, **arguments)
+            )
+        except BaseException:
+            tool._slots.release()
+            raise
+        # Not released on timeout: the run cannot be stopped and keeps its slot
+        future.add_done_callback(lambda _: tool._slots.release())
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _failed(tool: Tool, error: Exception) -> ToolError:
+        tool_calls_total.labels(tool.name, REASON_ERROR).inc()
+        logger.warning("Tool '%s' failed: %r", tool.name, error)
+        return ToolError(tool.name, REASON_ERROR, repr(error))
+
+    def _pool(self, mode: ToolMode) -> Executor:
+        if mode == "thread":
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    settings.tool_thread_workers, thread_name_prefix="tool"
+                )
+            return self._thread_pool
+        if self._process_pool is None:
+            # Spawned, not forked: forking a process that runs threads (the
+            # event loop's executors) can deadlock the child
+            self._process_pool = ProcessPoolExecutor(
+                settings.tool_process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._process_pool
+
+    def shutdown(self):
+        """Stops the pools without waiting; queued calls are cancelled."""
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = self._process_pool = None
+
+
+# Create a singleton executor shared by every agent
+tool_executor = ToolExecutor()
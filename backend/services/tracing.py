@@ -0,0 +1,148 @@
+import logging
+from typing import IO
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SimpleSpanProcessor,
+    SpanExporter,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import Span, SpanKind
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- OpenTelemetry tracing for the WebSocket pipeline ---
+# One trace per inbound WebSocket action:
+#   ws.<message_type>                      (router dispatch, root span)
+#     chat.add_message_and_process
+#       agent.generate                     (event "first_token" carries TTFT)
+#         ws.send agent_message_chunk ...  (one span per frame sent)
+#       chat.background_task               (may end after the root span)
+# The provider is private to the backend (not the global OTel provider), so it
+# can be replaced at runtime, e.g. with an InMemorySpanExporter in tests:
+#
+#     exporter = InMemorySpanExporter()
+#     configure_tracing(exporter=exporter)
+#     ...
+#     spans = exporter.get_finished_spans()
+
+SERVICE_NAME = "ai-agent-chat-backend"
+
+_provider: TracerProvider | None = None
+_tracer: trace.Tracer = trace.NoOpTracer()
+_trace_file: IO[str] | None = None
+
+
+def get_tracer() -> trace.Tracer:
+    """Returns the active tracer (a no-op tracer while tracing is disabled)."""
+    return _tracer
+
+
+def _exporter_from_settings() -> SpanExporter | None:
+    global _trace_file
+    if settings.trace_exporter == "console":
+        return ConsoleSpanExporter()
+    if settings.trace_exporter == "file":
+        _trace_file = open(settings.trace_file_path, "a", encoding="utf-8")
+        return ConsoleSpanExporter(
+            out=_trace_file, formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    if settings.trace_exporter == "otlp":
+        # Endpoint/headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter()
+    return None
+
+
+def configure_tracing(
+    exporter: SpanExporter | None = None, sample_ratio: float | None = None
+) -> TracerProvider | None:
+    """
+    (Re)configures tracing. Without arguments the exporter and head-sampling
+    ratio come from settings, and spans are exported in batches from a
+    background thread. An explicit exporter is called synchronously when each
+    span ends, so its spans are visible immediately (meant for tests).
+    Returns the provider, or None when tracing is disabled.
+    """
+    global _provider, _tracer
+    shutdown_tracing()
+
+    if exporter is not None:
+        processor = SimpleSpanProcessor(exporter)
+        exporter_name = type(exporter).__name__
+    else:
+        exporter = _exporter_from_settings()
+        if exporter is None:
+            return None
+        processor = BatchSpanProcessor(exporter)
+        exporter_name = settings.trace_exporter
+
+    ratio = settings.trace_sample_ratio if sample_ratio is None else sample_ratio
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        # Sampling is decided once at the root span; children follow their parent
+        sampler=ParentBased(TraceIdRatioBased(ratio)),
+    )
+    _provider.add_span_processor(processor)
+    _tracer = _provider.get_tracer("backend")
+    logger.info(
+        "Tracing enabled (exporter=%s, sample_ratio=%s)",
+        exporter_name,
+        ratio,
+    )
+    return _provider
+
+
+def shutdown_tracing():
+    """Flushes pending spans and disables tracing (call on shutdown)."""
+    global _provider, _tracer, _trace_file
+    _tracer = trace.NoOpTracer()
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+    if _trace_file is not None:
+        _trace_file.close()
+        _trace_file = None
+
+
+def start_action_span(name: str, attributes: dict | None = None) -> Span:
+    """
+    Starts the root span of a new trace for one inbound action, ignoring any
+    span that happens to be current. The caller activates it with
+    `trace.use_span(span, end_on_exit=True)` or attaches/ends it manually.
+    """
+    return _tracer.start_span(
+        name,
+        context=otel_context.Context(),
+        kind=SpanKind.SERVER,
+        attributes=attributes,
+    )
+
+
+def is_recording() -> bool:
+    """
+    Whether the current trace is being recorded (False when tracing is disabled
+    or the trace was sampled out). Per-frame paths check this before building
+    a span name or attributes, so untraced sends cost a single context lookup.
+    """
+    return trace.get_current_span().is_recording()
+
+
+def start_child_span(name: str, attributes: dict | None = None) -> Span | None:
+    """
+    Starts a span under the current one, or returns None when the current
+    trace is not being recorded (see is_recording).
+    """
+    if not is_recording():
+        return None
+    return _tracer.start_span(name, attributes=attributes)
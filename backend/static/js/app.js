@@ -54,10 +54,15 @@ const app = createApp({
     const topics = ref([]); // List of chat topics for this client {id, agent_id, name}
     const currentTopicId = ref(null); // ID of the currently displayed topic (null for new chat screen)
     const selectedAgentId = ref(null); // Agent ID selected in the dropdown (for new chats or agent changes)
+    const compareAgentIds = ref([]); // Extra agents asked alongside the selected one (side by side)
     const messages = ref({}); // Cache of messages per topic: { topic_id: Message[] }
     const taskResults = ref({}); // Cache of task results per topic: { topic_id: TaskResult[] }
     const newMessage = ref(""); // Model for the chat input textarea
     const streamingMessages = ref({}); // Track streaming status: { message_id: boolean }
+    // Sent messages not yet fully answered, by idempotency key:
+    // { client_message_id: { payload, expected, answered } }. Resent after a reconnect;
+    // the server replays them instead of processing them twice.
+    const unconfirmedSends = {};
 
     // Template Refs (links to DOM elements)
     const chatInput = ref(null); // Reference to the <textarea> element
@@ -108,6 +113,25 @@ const app = createApp({
       }
     }
 
+    // Large server frames arrive deflate-compressed as binary frames when the
+    // browser can inflate them (negotiated via this WebSocket subprotocol)
+    const COMPRESSION_PROTOCOL = "chat.deflate";
+    const canInflate = typeof DecompressionStream !== "undefined";
+    // Frames are decoded in arrival order, even while one is being inflated
+    let receiveQueue = Promise.resolve();
+    // Delay before reconnecting after a server restart (set by server_draining)
+    let reconnectDelayMs = null;
+
+    async function decodeFrame(frameData) {
+      if (typeof frameData === "string") {
+        return JSON.parse(frameData);
+      }
+      const inflated = new Blob([frameData])
+        .stream()
+        .pipeThrough(new DecompressionStream("deflate-raw"));
+      return JSON.parse(await new Response(inflated).text());
+    }
+
     // WebSocket Connection Handling
     function connectWebSocket() {
       // Establishes the WebSocket connection if not already open.
@@ -121,7 +145,10 @@ const app = createApp({
       console.log("Attempting WebSocket connection to:", wsUrl);
 
       try {
-        ws.value = new WebSocket(wsUrl);
+        ws.value = canInflate
+          ? new WebSocket(wsUrl, [COMPRESSION_PROTOCOL])
+          : new WebSocket(wsUrl);
+        ws.value.binaryType = "arraybuffer";
         setupWebSocketListeners(); // Attach event listeners
       } catch (error) {
         console.error("Failed to create WebSocket:", error);
@@ -142,17 +169,17 @@ const app = createApp({
       };
 
       ws.value.onmessage = (event) => {
-        // Handles messages received from the server.
-        try {
-          const data = JSON.parse(event.data);
-          handleWebSocketMessage(data); // Delegate to the message handler
-        } catch (e) {
-          console.error(
-            "Failed to parse incoming WebSocket message:",
-            event.data,
-            e
-          );
-        }
+        // Handles messages received from the server (text or compressed binary).
+        receiveQueue = receiveQueue
+          .then(() => decodeFrame(event.data))
+          .then((data) => handleWebSocketMessage(data)) // Delegate to the message handler
+          .catch((e) => {
+            console.error(
+              "Failed to parse incoming WebSocket message:",
+              event.data,
+              e
+            );
+          });
       };
 
       ws.value.onerror = (error) => {
@@ -173,6 +200,12 @@ const app = createApp({
           alert(
             "Session Conflict: This AI Agent Chat is already open in another tab or window. Please close the other instance."
           );
+        } else if (event.code === 1012) {
+          // Service restart (drain): reconnect, landing on another instance
+          const delay = reconnectDelayMs ?? Math.random() * 5000;
+          reconnectDelayMs = null;
+          console.log(`Server restarting; reconnecting in ${delay}ms`);
+          setTimeout(connectWebSocket, delay);
         } else if (event.code === 1011) {
           // Server error during connection
           alert(
@@ -194,9 +227,21 @@ const app = createApp({
         case "initial_state":
           handleInitialState(payload);
           break;
+        case "agents_updated":
+          handleAgentsUpdated(payload);
+          break;
         case "topic_list_update":
           handleTopicListUpdate(payload);
           break;
+        case "topic_added":
+          handleTopicAdded(payload);
+          break;
+        case "topic_updated":
+          handleTopicUpdated(payload);
+          break;
+        case "topic_removed":
+          handleTopicRemoved(payload);
+          break;
         case "topic_state":
           handleTopicState(payload);
           break;
@@ -218,6 +263,26 @@ const app = createApp({
         case "error":
           handleServerError(payload);
           break;
+        case "rate_limited":
+          handleRateLimited(payload);
+          break;
+        case "server_draining":
+          // Server is going away; reconnect after the suggested jittered delay
+          reconnectDelayMs = (payload.reconnect_after || 0) * 1000;
+          console.info(
+            `[WS Handle] Server draining; reconnecting in ${reconnectDelayMs}ms after close`
+          );
+          break;
+        case "generation_queued":
+          // Agent response waits for a free slot; chunks follow when it starts
+          console.info(
+            `[WS Handle] Response for topic ${payload.topic_id} queued at position ${payload.position}`
+          );
+          break;
+        case "ping":
+          // Server heartbeat: answer so the connection is not reaped
+          ws.value.send(JSON.stringify({ type: "pong" }));
+          break;
         case "pong":
           // Optional: Handle server pong response for keepalive
           // console.debug("Pong received from server.");
@@ -249,6 +314,8 @@ const app = createApp({
         );
       }
 
+      resendUnconfirmed();
+
       // If starting fresh (no active topic), focus the input field
       if (initialActiveTopicId === null) {
         console.log(
@@ -258,6 +325,41 @@ const app = createApp({
       }
     }
 
+    function resendUnconfirmed() {
+      // The connection may have dropped before the server saw these, or
+      // before their responses arrived; same keys, so never processed twice
+      for (const [key, pending] of Object.entries(unconfirmedSends)) {
+        console.log(`[WS] Resending unconfirmed message ${key}`);
+        ws.value.send(
+          JSON.stringify({ type: "send_message", payload: pending.payload })
+        );
+      }
+    }
+
+    function confirmSend(clientMessageId, messageId) {
+      // One response to a sent message has ended (replays may repeat it)
+      const pending = unconfirmedSends[clientMessageId];
+      if (!pending) return;
+      pending.answered.add(messageId);
+      if (pending.answered.size >= pending.expected) {
+        delete unconfirmedSends[clientMessageId];
+      }
+    }
+
+    function handleAgentsUpdated(payload) {
+      // Agent catalog changed on the server; no reconnect needed
+      console.log(
+        `[WS Handle] Agent catalog v${payload.version} (${payload.agents.length} agents)`
+      );
+      agents.value = payload.agents || [];
+      if (!agents.value.some((a) => a.id === selectedAgentId.value)) {
+        selectedAgentId.value = getDefaultAgentId();
+      }
+      compareAgentIds.value = compareAgentIds.value.filter((id) =>
+        agents.value.some((a) => a.id === id)
+      );
+    }
+
     function handleTopicListUpdate(payload) {
       console.log(
         `[WS Handle] Updating topic list (${payload?.length || 0} topics)`
@@ -279,6 +381,36 @@ const app = createApp({
       }
     }
 
+    // Incremental topic events; the full list only arrives on connect and resync
+    function handleTopicAdded(payload) {
+      console.log(`[WS Handle] Topic added: ${payload.id}`);
+      if (!topics.value.some((t) => t.id === payload.id)) {
+        topics.value.push(payload);
+      }
+    }
+
+    function handleTopicUpdated(payload) {
+      const index = topics.value.findIndex((t) => t.id === payload.id);
+      if (index === -1) {
+        // Missed the topic_added event; ask for the full list again
+        console.warn(`[WS Handle] Update for unknown topic ${payload.id}; resyncing`);
+        ws.value.send(JSON.stringify({ type: "resync_topics" }));
+        return;
+      }
+      topics.value[index] = payload;
+    }
+
+    function handleTopicRemoved(payload) {
+      const topicId = payload.topic_id;
+      console.log(`[WS Handle] Topic removed: ${topicId}`);
+      topics.value = topics.value.filter((t) => t.id !== topicId);
+      delete messages.value[topicId];
+      delete taskResults.value[topicId];
+      if (currentTopicId.value === topicId) {
+        currentTopicId.value = null;
+      }
+    }
+
     function handleTopicState(payload) {
       console.log(
         `[WS Handle] Receiving full state for topic: ${payload?.topic_id}`
@@ -313,19 +445,19 @@ const app = createApp({
         if (!messages.value[payload.topic_id]) {
           messages.value[payload.topic_id] = [];
         }
-        if (
-          !messages.value[payload.topic_id].some((m) => m.id === payload.id)
-        ) {
-          // Ensure isStreaming is false for non-streamed messages
-          streamingMessages.value[payload.id] = false;
+        const index = messages.value[payload.topic_id].findIndex(
+          (m) => m.id === payload.id
+        );
+        // Ensure isStreaming is false for non-streamed messages
+        streamingMessages.value[payload.id] = false;
+        if (index === -1) {
           messages.value[payload.topic_id].push(payload);
           if (payload.topic_id === currentTopicId.value) {
             scrollToBottom();
           }
         } else {
-          console.warn(
-            `[WS Handle] Duplicate full message ID ${payload.id} received, skipped.`
-          );
+          // Sent again (replayed resend): the server's copy is complete
+          messages.value[payload.topic_id][index] = payload;
         }
       } else {
         console.warn(
@@ -337,7 +469,8 @@ const app = createApp({
 
     function handleAgentMessageChunk(payload) {
       // Handles incoming chunks of a streaming agent message.
-      const { topic_id, message_id, content_chunk, is_first_chunk } = payload;
+      const { topic_id, message_id, agent_id, content_chunk, is_first_chunk } =
+        payload;
       console.log(
         `[WS Handle] Agent Chunk for msg ${message_id} in topic ${topic_id}. First: ${is_first_chunk}`
       );
@@ -370,6 +503,7 @@ const app = createApp({
             id: message_id,
             topic_id: topic_id,
             sender: "agent",
+            agent_id: agent_id, // Several agents may stream into one topic at once
             content: content_chunk, // Start with the first chunk
             timestamp: new Date().toISOString(), // Use client time for start, backend stores final
             // isStreaming: true // Computed property handles this now
@@ -391,7 +525,11 @@ const app = createApp({
         // though direct property update should work with refs.
         messages.value[topic_id][messageIndex] = {
           ...existingMessage,
-          content: existingMessage.content + content_chunk,
+          // A first chunk for a known message is a replay catching up after
+          // a reconnect: it holds everything generated so far
+          content: is_first_chunk
+            ? content_chunk
+            : existingMessage.content + content_chunk,
         };
         // Ensure it's marked as streaming if it wasn't already
         if (!streamingMessages.value[message_id]) {
@@ -407,10 +545,20 @@ const app = createApp({
 
     function handleAgentStreamEnd(payload) {
       // Marks a streamed message as complete.
-      const { topic_id, message_id } = payload;
+      const { topic_id, message_id, agent_id, error, client_message_id } =
+        payload;
+      if (client_message_id) {
+        confirmSend(client_message_id, message_id);
+      }
       console.log(
         `[WS Handle] Agent Stream End for msg ${message_id} in topic ${topic_id}`
       );
+      if (error) {
+        // Generation failed; the partial response is not kept by the server
+        handleServerError({
+          detail: `${getAgentName(agent_id)} failed to respond (${error}).`,
+        });
+      }
 
       if (topic_id && message_id) {
         // Mark the message as no longer streaming
@@ -492,6 +640,21 @@ const app = createApp({
       alert(`Server Error: ${payload.detail || "An unknown error occurred."}`);
     }
 
+    function handleRateLimited(payload) {
+      // The message was not accepted; nothing was stored on the server
+      const seconds = Math.ceil(payload.retry_after || 1);
+      const reason =
+        payload.reason === "server_busy"
+          ? "The server is busy."
+          : "You are sending messages too quickly.";
+      console.warn("[WS Handle] Rate limited:", payload);
+      if (payload.client_message_id) {
+        // Not accepted, so not resent on reconnect either
+        delete unconfirmedSends[payload.client_message_id];
+      }
+      alert(`${reason} Please try again in ${seconds}s.`);
+    }
+
     // Chat Interaction Logic
     function sendMessage() {
       // Sends the content of the textarea as a message.
@@ -516,6 +679,20 @@ const app = createApp({
         topic_id: currentTopicId.value, // null if starting a new chat
         current_agent_id: selectedAgentId.value, // Agent selected in UI
       };
+      const extraAgentIds = compareAgentIds.value.filter(
+        (id) => id !== selectedAgentId.value
+      );
+      if (extraAgentIds.length > 0) {
+        // Ask all of them at once; they answer side by side in this topic
+        messagePayload.agent_ids = [selectedAgentId.value, ...extraAgentIds];
+      }
+      // Idempotency key: a resend of this payload is never processed twice
+      messagePayload.client_message_id = uuidv4();
+      unconfirmedSends[messagePayload.client_message_id] = {
+        payload: messagePayload,
+        expected: messagePayload.agent_ids?.length || 1,
+        answered: new Set(),
+      };
 
       console.log("[Action] Sending message:", messagePayload);
       // Send the message object via WebSocket
@@ -557,6 +734,31 @@ const app = createApp({
       // to keep the frontend state consistent with the backend confirmation.
     }
 
+    function renameTopic(topic) {
+      if (!isConnected.value) return;
+      const name = window.prompt("Rename chat", topic.name || "");
+      if (name === null || !name.trim() || name.trim() === topic.name) return;
+      ws.value.send(
+        JSON.stringify({
+          type: "rename_topic",
+          payload: { topic_id: topic.id, name: name.trim() },
+        })
+      );
+      // The list is updated when the server confirms with 'topic_updated'
+    }
+
+    function deleteTopic(topic) {
+      if (!isConnected.value) return;
+      if (!window.confirm(`Delete "${topic.name}"? This cannot be undone.`)) return;
+      ws.value.send(
+        JSON.stringify({
+          type: "delete_topic",
+          payload: { topic_id: topic.id },
+        })
+      );
+      // Removed locally when the server confirms with 'topic_removed'
+    }
+
     function handleAgentChange() {
       // Handles the user changing the agent via the dropdown.
       console.log(
@@ -792,6 +994,7 @@ const app = createApp({
       topics,
       currentTopicId,
       selectedAgentId,
+      compareAgentIds,
       newMessage,
       isLeftPanelOpen,
       isRightPanelOpen,
@@ -809,6 +1012,8 @@ const app = createApp({
       // Methods
       sendMessage,
       selectTopic,
+      renameTopic,
+      deleteTopic,
       handleAgentChange,
       getAgentName,
       formatTimestamp,
@@ -0,0 +1,159 @@
+"""
+Latency of asking several agents one after another vs at once (fan-out).
+
+Registers `--agents` synthetic agents with fixed timing (time to first token
+`--ttft`, `--tokens-per-second`, and response lengths spread evenly between
+`--min-tokens` and `--max-tokens`), then sends the same message to a topic:
+
+- sequential: one add_message_and_process call per agent, each awaited
+  (what switching agents in the UI amounts to).
+- fanout: a single add_message_and_process call with all agent ids.
+
+Reports the median wall time of each mode over `--repeats` rounds, next to
+the slowest single agent and the sum of all agents, and how often the chunk
+stream switches between agents (0 means the responses arrived one after
+another). The connection manager is replaced by a stub that records frames.
+
+Usage (from the repository root):
+
+    python -m benchmarks.agent_fanout --agents 4 --repeats 5 --output fanout.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+from pathlib import Path
+
+from backend.config import settings
+from backend.models.llm_agent import Constant, LLMAgent, SyntheticProfile
+from backend.services import chat_manager as chat_manager_module
+from backend.services.agent_manager import agent_manager
+from backend.services.chat_manager import ChatManager
+
+CLIENT_ID = "fanout_bench"
+
+
+class RecordingConnectionManager:
+    """Accepts every frame and keeps the agent of each streamed chunk."""
+
+    def __init__(self):
+        # Streams are only sent to the connection they started on
+        self.active_connections: dict = {CLIENT_ID: object()}
+        self.chunk_agents: list[str] = []
+
+    async def send_json(self, data: dict, client_id: str):
+        if data.get("type") == "agent_message_chunk":
+            self.chunk_agents.append(data["payload"]["agent_id"])
+
+    def disconnect(self, client_id: str):
+        self.active_connections.pop(client_id, None)
+
+
+def bench_agents(args: argparse.Namespace) -> list[LLMAgent]:
+    step = (args.max_tokens - args.min_tokens) / max(args.agents - 1, 1)
+    return [
+        LLMAgent(
+            id=f"agent_fanout_{i}",
+            name=f"Fan-out {i}",
+            model="synthetic",
+            synthetic=SyntheticProfile(
+                time_to_first_token_seconds=Constant(value=args.ttft),
+                tokens_per_second=Constant(value=args.tokens_per_second),
+                response_tokens=Constant(value=round(args.min_tokens + i * step)),
+            ),
+        )
+        for i in range(args.agents)
+    ]
+
+
+def expected_seconds(agent: LLMAgent) -> float:
+    profile = agent.synthetic
+    return (
+        profile.time_to_first_token_seconds.value
+        + profile.response_tokens.value / profile.tokens_per_second.value
+    )
+
+
+def agent_switches(chunk_agents: list[str]) -> int:
+    return sum(1 for a, b in zip(chunk_agents, chunk_agents[1:]) if a != b)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    settings.agents_config_path = None  # Only the benchmark agents
+    agents = bench_agents(args)
+    agent_manager.replace_agents(agents)
+    agent_ids = [agent.id for agent in agents]
+    recorder = RecordingConnectionManager()
+    chat_manager_module.connection_manager = recorder
+
+    manager = ChatManager()
+    await manager.handle_connect(CLIENT_ID)
+    topic = await manager.create_topic(CLIENT_ID, agent_ids[0])
+
+    times: dict[str, list[float]] = {"sequential": [], "fanout": []}
+    switches: dict[str, int] = {}
+    for _ in range(args.repeats):
+        recorder.chunk_agents.clear()
+        started = time.perf_counter()
+        for agent_id in agent_ids:
+            await manager.add_message_and_process(
+                CLIENT_ID, topic.id, "compare", [agent_id]
+            )
+        times["sequential"].append(time.perf_counter() - started)
+        switches["sequential"] = agent_switches(recorder.chunk_agents)
+
+        recorder.chunk_agents.clear()
+        started = time.perf_counter()
+        await manager.add_message_and_process(CLIENT_ID, topic.id, "compare", agent_ids)
+        times["fanout"].append(time.perf_counter() - started)
+        switches["fanout"] = agent_switches(recorder.chunk_agents)
+
+    for task in manager.background_tasks:
+        task.cancel()
+    await asyncio.gather(*manager.background_tasks, return_exceptions=True)
+
+    per_agent = [expected_seconds(agent) for agent in agents]
+    report: dict = {
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "expected": {
+            "slowest_agent_ms": round(max(per_agent) * 1000, 1),
+            "sum_of_agents_ms": round(sum(per_agent) * 1000, 1),
+        },
+        "stored_agent_messages": sum(
+            1 for message in topic.messages if message.sender == "agent"
+        ),
+    }
+    for mode, samples in times.items():
+        report[mode] = {
+            "median_ms": round(statistics.median(samples) * 1000, 1),
+            "agent_switches_in_stream": switches[mode],
+        }
+    report["speedup"] = round(
+        report["sequential"]["median_ms"] / report["fanout"]["median_ms"], 2
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--min-tokens", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=80)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
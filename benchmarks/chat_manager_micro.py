@@ -0,0 +1,268 @@
+"""
+Microbenchmarks of ChatManager hot paths at increasing state sizes.
+
+Covers `handle_connect` (new and returning clients), `create_topic`,
+`get_topics_for_client`, `send_full_topic_state` payload building and one
+cleanup sweep (`_cleanup_inactive_sessions`). Each scale is populated with N
+sessions owning one topic each; the connection manager is replaced by a stub
+that drops frames, so only ChatManager work is measured.
+
+Every benchmark runs twice: once for timing, once under tracemalloc for peak
+and retained memory (tracemalloc slows execution, so times come from the
+first pass only).
+
+Usage (from the repository root):
+
+    python -m benchmarks.chat_manager_micro --scales 1000,100000,1000000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from pathlib import Path
+
+from backend.models.chat import (
+    Session,
+    StoredMessage,
+    StoredTaskResult,
+    Topic,
+    now_tz,
+    now_us,
+)
+from backend.models.llm_agent import LLMAgent
+from backend.services import chat_manager as chat_manager_module
+from backend.services.agent_manager import agent_manager
+from backend.services.chat_manager import ChatManager
+
+BENCH_AGENT_ID = "agent_bench"
+
+
+class StubConnectionManager:
+    """Accepts every frame and discards it."""
+
+    def __init__(self):
+        self.active_connections: dict = {}
+        self.frames = 0
+
+    async def send_json(self, data: dict, client_id: str):
+        self.frames += 1
+
+    def disconnect(self, client_id: str):
+        self.active_connections.pop(client_id, None)
+
+
+def populate(manager: ChatManager, size: int, history: int, expired_fraction: float):
+    """
+    Fills the manager with `size` sessions and one topic per session.
+    Models are built with model_construct to keep setup of large scales fast;
+    the first client's topic gets `history` messages for state payload tests.
+    """
+    now = now_tz()
+    expired_at = now - manager.SESSION_TIMEOUT - timedelta(minutes=1)
+    expired_every = int(1 / expired_fraction) if expired_fraction > 0 else 0
+    for i in range(size):
+        client_id = f"client_{i}"
+        topic_id = str(uuid.uuid4())
+        expired = expired_every and i % expired_every == expired_every - 1
+        manager.sessions[client_id] = Session.model_construct(
+            client_id=client_id,
+            active_topic_id=topic_id,
+            last_activity=expired_at if expired else now,
+        )
+        manager.topics[topic_id] = Topic.model_construct(
+            id=topic_id,
+            client_id=client_id,
+            agent_id=BENCH_AGENT_ID,
+            name=None,
+            messages=[],
+            task_results=[],
+            timestamp=now,
+        )
+
+    first_topic = manager.topics[manager.sessions["client_0"].active_topic_id]
+    for i in range(history):
+        first_topic.messages.append(
+            StoredMessage(
+                uuid.uuid4().int,
+                "user" if i % 2 == 0 else "agent",
+                f"history message {i} " * 8,
+                now_us(),
+            )
+        )
+        if i % 10 == 0:
+            first_topic.task_results.append(
+                StoredTaskResult(uuid.uuid4().int, "done", now_us())
+            )
+
+
+async def run_ops(
+    op: Callable[[int], Awaitable[object]], ops: int, max_seconds: float
+) -> list[float]:
+    """Runs op(i) up to `ops` times (or until the time budget is spent)."""
+    durations: list[float] = []
+    deadline = time.perf_counter() + max_seconds
+    for i in range(ops):
+        started = time.perf_counter()
+        await op(i)
+        durations.append(time.perf_counter() - started)
+        if started > deadline:
+            break
+    return durations
+
+
+async def measure_memory(op: Callable[[int], Awaitable[object]], ops: int) -> dict:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for i in range(ops):
+            await op(i)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes": peak - before, "retained_bytes": current - before}
+
+
+def summarize(durations: list[float]) -> dict:
+    ordered = sorted(durations)
+    return {
+        "ops": len(ordered),
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 2),
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 2),
+        "p99_us": round(
+            ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1e6, 2
+        ),
+        "max_us": round(ordered[-1] * 1e6, 2),
+    }
+
+
+def benchmarks(
+    manager: ChatManager, size: int
+) -> dict[str, Callable[[int], Awaitable[object]]]:
+    """Operation factories, each taking the iteration index."""
+
+    async def handle_connect_new(i: int):
+        await manager.handle_connect(f"new_client_{i}")
+
+    async def handle_connect_existing(i: int):
+        await manager.handle_connect(f"client_{(i * 7919) % size}")
+
+    async def create_topic(i: int):
+        await manager.create_topic(f"client_{(i * 7919) % size}", BENCH_AGENT_ID)
+
+    async def get_topics_for_client(i: int):
+        manager.get_topics_for_client(f"client_{(i * 7919) % size}")
+
+    first_topic_id = manager.sessions["client_0"].active_topic_id
+
+    async def send_full_topic_state(i: int):
+        await manager.send_full_topic_state("client_0", first_topic_id)
+
+    return {
+        "handle_connect_new": handle_connect_new,
+        "handle_connect_existing": handle_connect_existing,
+        "create_topic": create_topic,
+        "get_topics_for_client": get_topics_for_client,
+        "send_full_topic_state": send_full_topic_state,
+    }
+
+
+async def bench_cleanup_sweep(manager: ChatManager) -> dict:
+    """Times one sweep, restores the removed state, then measures its memory."""
+    now = now_tz()
+    expired = {
+        cid: s
+        for cid, s in manager.sessions.items()
+        if now - s.last_activity > manager.SESSION_TIMEOUT
+    }
+    expired_topics = {
+        tid: t for tid, t in manager.topics.items() if t.client_id in expired
+    }
+
+    started = time.perf_counter()
+    removed = await manager._cleanup_inactive_sessions()
+    elapsed = time.perf_counter() - started
+
+    manager.sessions.update(expired)
+    manager.topics.update(expired_topics)
+    memory = await measure_memory(lambda i: manager._cleanup_inactive_sessions(), 1)
+    return {"removed_sessions": removed, "sweep_ms": round(elapsed * 1000, 3), **memory}
+
+
+async def run_scale(size: int, args: argparse.Namespace) -> dict:
+    manager = ChatManager()
+    setup_started = time.perf_counter()
+    populate(manager, size, args.history, args.expired_fraction)
+    results: dict = {
+        "sessions": len(manager.sessions),
+        "topics": len(manager.topics),
+        "setup_s": round(time.perf_counter() - setup_started, 2),
+    }
+
+    for name, op in benchmarks(manager, size).items():
+        durations = await run_ops(op, args.ops, args.max_seconds)
+        # Memory pass reuses the same op; indices are offset to avoid re-hitting caches
+        memory = await measure_memory(
+            lambda i, op=op: op(i + args.ops), min(len(durations), args.memory_ops)
+        )
+        results[name] = {**summarize(durations), **memory}
+
+    results["cleanup_sweep"] = await bench_cleanup_sweep(manager)
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    report = {
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "scales": {},
+    }
+    for size in args.scales:
+        report["scales"][str(size)] = await run_scale(size, args)
+        print(f"scale {size}: done", flush=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scales",
+        type=lambda v: [int(x) for x in v.split(",")],
+        default=[1_000, 100_000, 1_000_000],
+        help="comma-separated session/topic counts",
+    )
+    parser.add_argument("--ops", type=int, default=200, help="max ops per benchmark")
+    parser.add_argument("--memory-ops", type=int, default=20)
+    parser.add_argument(
+        "--max-seconds", type=float, default=5.0, help="time budget per benchmark"
+    )
+    parser.add_argument(
+        "--history", type=int, default=200, help="messages in the state-payload topic"
+    )
+    parser.add_argument("--expired-fraction", type=float, default=0.1)
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Drop frames instead of sending them; only ChatManager work is measured
+    chat_manager_module.connection_manager = StubConnectionManager()
+    if not agent_manager.get_agent_by_id(BENCH_AGENT_ID):
+        agent_manager.add_agent(
+            LLMAgent(id=BENCH_AGENT_ID, name="Benchmark Agent", model="simulated")
+        )
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
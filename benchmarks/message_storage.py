@@ -0,0 +1,146 @@
+"""
+Per-message cost of the topic history layout: Pydantic models vs storage records.
+
+Compares, in one process and on the same generated content:
+
+- model: what topics stored before, a validated `Message` per entry
+  (string UUID, repeated topic_id, aware datetime).
+- record: `StoredMessage` (slotted; packed id, integer timestamp, no topic_id).
+
+For each layout it reports retained bytes per message (tracemalloc, content
+strings excluded since both layouts share them), construction time per
+message, and the time to build the topic_state "messages" payload per message
+(`model_dump(mode="json")` vs `to_json`). Timings are the median of
+`--repeats` interleaved rounds.
+
+Usage (from the repository root):
+
+    python -m benchmarks.message_storage --messages 100000 --output storage.json
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from backend.models.chat import Message, StoredMessage, now_tz, now_us, pack_id
+
+TOPIC_ID = str(uuid.uuid4())
+
+
+def build_models(ids: list[str], contents: list[str]) -> list:
+    return [
+        Message(
+            id=message_id,
+            topic_id=TOPIC_ID,
+            sender="user" if i % 2 == 0 else "agent",
+            content=content,
+            timestamp=now_tz(),
+        )
+        for i, (message_id, content) in enumerate(zip(ids, contents))
+    ]
+
+
+def build_records(ids: list[str], contents: list[str]) -> list:
+    return [
+        StoredMessage(
+            pack_id(message_id), "user" if i % 2 == 0 else "agent", content, now_us()
+        )
+        for i, (message_id, content) in enumerate(zip(ids, contents))
+    ]
+
+
+def dump_models(messages: list) -> list[dict]:
+    return [message.model_dump(mode="json") for message in messages]
+
+
+def dump_records(messages: list) -> list[dict]:
+    return [message.to_json(TOPIC_ID) for message in messages]
+
+
+LAYOUTS: dict[str, tuple[Callable, Callable]] = {
+    "model": (build_models, dump_models),
+    "record": (build_records, dump_records),
+}
+
+
+def retained_bytes(build: Callable, ids: list[str], contents: list[str]) -> int:
+    """Bytes still allocated after building (and keeping) every message."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        messages = build(ids, contents)
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del messages
+    return after - before
+
+
+def timed(fn: Callable, *args) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def run(args: argparse.Namespace) -> dict:
+    # IDs are generated up front: both layouts receive the same strings
+    ids = [str(uuid.uuid4()) for _ in range(args.messages)]
+    contents = [f"message {i} " * args.content_words for i in range(args.messages)]
+    n = args.messages
+
+    report: dict = {"params": {k: v for k, v in vars(args).items() if k != "output"}}
+    build_times: dict[str, list[float]] = {name: [] for name in LAYOUTS}
+    dump_times: dict[str, list[float]] = {name: [] for name in LAYOUTS}
+    for _ in range(args.repeats):
+        for name, (build, dump) in LAYOUTS.items():
+            elapsed, messages = timed(build, ids, contents)
+            build_times[name].append(elapsed)
+            elapsed, _ = timed(dump, messages[: args.payload_messages])
+            dump_times[name].append(elapsed)
+            del messages
+
+    for name, (build, _) in LAYOUTS.items():
+        report[name] = {
+            "bytes_per_message": round(retained_bytes(build, ids, contents) / n, 1),
+            "build_us_per_message": round(
+                statistics.median(build_times[name]) / n * 1e6, 3
+            ),
+            "payload_us_per_message": round(
+                statistics.median(dump_times[name]) / args.payload_messages * 1e6, 3
+            ),
+        }
+    report["bytes_saved_per_message"] = round(
+        report["model"]["bytes_per_message"] - report["record"]["bytes_per_message"], 1
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument(
+        "--payload-messages",
+        type=int,
+        default=500,
+        help="messages in the timed topic_state payload",
+    )
+    parser.add_argument("--content-words", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
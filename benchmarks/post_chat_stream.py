@@ -0,0 +1,109 @@
+"""
+Bytes and CPU per response for POST /chat/ in cumulative vs delta mode.
+
+Drives the real `post_chat` endpoint from `src/main.py` with the agent's model
+overridden by a local streaming function, so no network access or API key is
+needed. The chat history lives in a throwaway SQLite file.
+
+Usage (from the repository root):
+
+    python -m benchmarks.post_chat_stream --tokens 2000 --runs 5
+"""
+
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# src/main.py requires the key at import time; the Gemini model is never called
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-unused")
+
+from pydantic_ai.messages import ModelMessage  # noqa: E402
+from pydantic_ai.models.function import AgentInfo, FunctionModel  # noqa: E402
+
+from src.main import Database, get_agent, post_chat  # noqa: E402
+
+
+def make_stream_function(tokens: int, token_interval: float):
+    """Builds a model that streams `tokens` words, pausing between each."""
+
+    async def stream_function(messages: list[ModelMessage], info: AgentInfo):
+        for i in range(tokens):
+            yield f"word{i} "
+            await asyncio.sleep(token_interval)
+
+    return stream_function
+
+
+async def measure(database: Database, delta: bool, prompt: str) -> dict:
+    """Consumes one streamed response and returns its size and CPU cost."""
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    response = await post_chat(prompt, delta=delta, database=database)
+    total_bytes = 0
+    lines = 0
+    async for chunk in response.body_iterator:
+        total_bytes += len(chunk)
+        lines += chunk.count(b"\n")
+    return {
+        "bytes": total_bytes,
+        "lines": lines,
+        "cpu_s": time.process_time() - cpu_start,
+        "wall_s": time.perf_counter() - wall_start,
+    }
+
+
+async def run(tokens: int, token_interval: float, runs: int) -> dict:
+    results: dict[str, list[dict]] = {"cumulative": [], "delta": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        async with Database.connect(Path(tmp) / "bench.sqlite") as database:
+            model = FunctionModel(
+                stream_function=make_stream_function(tokens, token_interval)
+            )
+            # Built here, before any timed request, not by the app's lifespan
+            with get_agent().override(model=model):
+                for i in range(runs):
+                    # Alternate modes so both see the same growth in chat history
+                    for mode in ("cumulative", "delta"):
+                        results[mode].append(
+                            await measure(database, mode == "delta", f"prompt {i}")
+                        )
+
+    summary = {}
+    for mode, samples in results.items():
+        summary[mode] = {
+            key: sum(s[key] for s in samples) / len(samples)
+            for key in ("bytes", "lines", "cpu_s", "wall_s")
+        }
+    summary["ratio"] = {
+        "bytes": summary["cumulative"]["bytes"] / summary["delta"]["bytes"],
+        "cpu_s": summary["cumulative"]["cpu_s"] / summary["delta"]["cpu_s"],
+    }
+    return {
+        "params": {"tokens": tokens, "token_interval": token_interval, "runs": runs},
+        "per_response": summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--token-interval", type=float, default=0.001)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.tokens, args.token_interval, args.runs))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Cold-start cost of the two apps: import time and time to first accepted connection.
+
+Every measurement runs in a fresh interpreter, so nothing is already
+imported or cached in-process:
+
+- import: `python -X importtime -c "import <module>"`; reports the module's
+  cumulative import time and the heaviest top-level packages it pulled in.
+- first connection: starts `uvicorn <module>:app` on a free localhost port and
+  polls until it accepts a connection (a WebSocket handshake that receives
+  initial_state for backend.main, `GET /` for src.main). The time is measured
+  from process spawn, so it includes interpreter start, imports and the
+  lifespan startup.
+
+src.main needs GEMINI_API_KEY set; a dummy value is used when it is missing
+(the agent is only built in the background and never called).
+
+Usage (from the repository root):
+
+    python -m benchmarks.startup_time --runs 5 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import WebSocketException
+
+ROOT = Path(__file__).resolve().parent.parent
+TARGETS = {"backend.main": "websocket", "src.main": "http"}
+
+
+def environment() -> dict:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    env.setdefault("GEMINI_API_KEY", "benchmark-dummy-key")
+    return env
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_importtime(stderr: str) -> tuple[dict[str, int], dict[str, int]]:
+    """Cumulative microseconds per module, and for top-level imports only."""
+    cumulative: dict[str, int] = {}
+    top_level: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumul, name = line.split("|")
+        if not cumul.strip().isdigit():
+            continue  # Header line
+        module = name.strip()
+        cumulative[module] = int(cumul)
+        # Imports made directly by the measured module are indented one level
+        if name.startswith(" " * 3) and not name.startswith(" " * 4):
+            top_level[module.split(".")[0]] = top_level.get(
+                module.split(".")[0], 0
+            ) + int(cumul)
+    return cumulative, top_level
+
+
+def measure_import(module: str) -> tuple[float, dict[str, int]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative, top_level = parse_importtime(result.stderr)
+    return cumulative[module] / 1e6, top_level
+
+
+async def accepted(kind: str, port: int) -> bool:
+    try:
+        if kind == "websocket":
+            async with connect(f"ws://127.0.0.1:{port}/ws/startup-bench") as ws:
+                frame = json.loads(await ws.recv())
+                return frame["type"] == "initial_state"
+        url = f"http://127.0.0.1:{port}/"
+        with await asyncio.to_thread(urllib.request.urlopen, url, timeout=2) as r:
+            return r.status == 200
+    except (OSError, WebSocketException):
+        return False  # Not listening yet
+
+
+async def measure_first_connection(module: str, kind: str, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            f"{module}:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=environment(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{module} exited with code {process.returncode}")
+            if await accepted(kind, port):
+                return time.perf_counter() - started
+            await asyncio.sleep(0.005)
+        raise TimeoutError(f"{module} did not accept a connection in {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    report = {}
+    for module, kind in TARGETS.items():
+        if args.only and module != args.only:
+            continue
+        imports, heaviest = [], {}
+        for _ in range(args.runs):
+            seconds, heaviest = measure_import(module)
+            imports.append(seconds)
+        connections = [
+            await measure_first_connection(module, kind, args.timeout)
+            for _ in range(args.runs)
+        ]
+        report[module] = {
+            "import": summarize(imports),
+            "first_connection": summarize(connections),
+            "heaviest_imports_ms": {
+                name: round(us / 1000, 1)
+                for name, us in sorted(heaviest.items(), key=lambda kv: -kv[1])[
+                    : args.top
+                ]
+            },
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports shown")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--only", choices=sorted(TARGETS), help="Measure one app")
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Agent tool execution modes on local fake tools: wall time and event-loop lag.
+
+Registers fake tools on a private ToolExecutor (services/tools.py) and runs
+`--calls` concurrent calls per scenario while a ticker measures how late the
+event loop wakes up (the worst delay is what every other connection would
+see as a stall):
+
+- async_inline: `asyncio.sleep` tool, inline.
+- blocking_on_loop: the blocking `time.sleep` tool called directly on the
+  loop, i.e. without the executor (the baseline being avoided).
+- blocking_thread: the same tool in thread mode.
+- cpu_thread / cpu_process: a SHA-256 loop in thread mode (holds the GIL)
+  and in process mode.
+- timeout: the blocking tool in thread mode with a timeout shorter than its
+  run; every call must fail after about the timeout.
+- cached: the CPU tool marked deterministic, over `--distinct` argument
+  values, so only that many calls run.
+
+Each scenario also records the peak number of runs at once for the tools
+that can count them in-process, which must not exceed their concurrency
+limit.
+
+Usage (from the repository root):
+
+    python -m benchmarks.tool_pool --calls 16 --output tools.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from backend.config import settings
+from backend.services.tools import ToolError, ToolExecutor
+
+_running = 0  # Runs of the in-process fake tools in progress
+_peak = 0
+
+
+class _Counted:
+    def __enter__(self):
+        global _running, _peak
+        _running += 1
+        _peak = max(_peak, _running)
+
+    def __exit__(self, *exc_info):
+        global _running
+        _running -= 1
+
+
+async def fake_async_io(delay: float) -> float:
+    with _Counted():
+        await asyncio.sleep(delay)
+    return delay
+
+
+def fake_blocking_io(delay: float) -> float:
+    with _Counted():
+        time.sleep(delay)
+    return delay
+
+
+def fake_cpu(rounds: int, seed: int = 0) -> str:
+    digest = str(seed).encode()
+    for _ in range(rounds):
+        digest = hashlib.sha256(digest).digest()
+    return digest.hex()
+
+
+async def measure(
+    calls: list[Callable[[], Awaitable]], tick: float = 0.001
+) -> tuple[float, float, int]:
+    """(wall seconds, worst loop lag seconds, failed calls) for running `calls` at once."""
+    global _peak
+    _peak = 0
+    loop = asyncio.get_running_loop()
+    worst_lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst_lag
+        while not done:
+            expected = loop.time() + tick
+            await asyncio.sleep(tick)
+            worst_lag = max(worst_lag, loop.time() - expected)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(tick * 2)  # Ticker running before the first call
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call() for call in calls), return_exceptions=True)
+    wall = time.perf_counter() - started
+    done = True
+    await ticker_task
+    failures = [r for r in results if isinstance(r, BaseException)]
+    for failure in failures:
+        if not isinstance(failure, ToolError):
+            raise failure
+    return wall, worst_lag, len(failures)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    settings.tool_process_workers = args.process_workers
+    executor = ToolExecutor()
+    executor.register(fake_async_io, max_concurrency=args.concurrency)
+    executor.register(fake_blocking_io, mode="thread", max_concurrency=args.concurrency)
+    executor.register(
+        fake_blocking_io,
+        name="slow_blocking_io",
+        mode="thread",
+        timeout_seconds=args.delay / 4,
+        max_concurrency=args.calls,
+    )
+    executor.register(
+        fake_cpu, name="cpu_thread", mode="thread", max_concurrency=args.concurrency
+    )
+    executor.register(
+        fake_cpu, name="cpu_process", mode="process", max_concurrency=args.concurrency
+    )
+    executor.register(
+        fake_cpu,
+        name="cpu_cached",
+        mode="process",
+        max_concurrency=args.concurrency,
+        deterministic=True,
+    )
+    # Start the worker processes outside the timed scenarios
+    await executor.call("cpu_process", rounds=1)
+
+    async def blocking_on_loop():
+        return fake_blocking_io(args.delay)
+
+    n, delay, rounds = args.calls, args.delay, args.cpu_rounds
+    scenarios: dict[str, list[Callable[[], Awaitable]]] = {
+        "async_inline": [lambda: executor.call("fake_async_io", delay=delay)] * n,
+        "blocking_on_loop": [blocking_on_loop] * n,
+        "blocking_thread": [lambda: executor.call("fake_blocking_io", delay=delay)] * n,
+        "cpu_thread": [
+            (lambda i=i: executor.call("cpu_thread", rounds=rounds, seed=i))
+            for i in range(n)
+        ],
+        "cpu_process": [
+            (lambda i=i: executor.call("cpu_process", rounds=rounds, seed=i))
+            for i in range(n)
+        ],
+        "timeout": [lambda: executor.call("slow_blocking_io", delay=delay)] * n,
+        "cached": [
+            (
+                lambda i=i: executor.call(
+                    "cpu_cached", rounds=rounds, seed=i % args.distinct
+                )
+            )
+            for i in range(n)
+        ],
+    }
+
+    report: dict = {"params": {k: v for k, v in vars(args).items() if k != "output"}}
+    try:
+        for name, calls in scenarios.items():
+            wall, lag, failures = await measure(calls)
+            report[name] = {
+                "wall_ms": round(wall * 1000, 1),
+                "worst_loop_lag_ms": round(lag * 1000, 1),
+                "failed_calls": failures,
+            }
+            if name in ("async_inline", "blocking_thread"):
+                report[name]["peak_concurrent_runs"] = _peak
+        # Let the timed-out runs finish before the pools go away
+        await asyncio.sleep(delay)
+    finally:
+        executor.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4, help="Per-tool limit")
+    parser.add_argument("--delay", type=float, default=0.1, help="I/O tool seconds")
+    parser.add_argument("--cpu-rounds", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=4, help="Cached tool inputs")
+    parser.add_argument("--process-workers", type=int, default=4)
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)  # Timeout warnings are expected
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Bandwidth and CPU of outbound WebSocket frame compression.
+
+Builds representative frames the way ChatManager does (topic_state for topics
+of growing history, topic_list_update for many topics, agent_message_chunk)
+and, for each zlib level / window-bits setting, reports wire bytes, compress
+time per frame, and browser-side inflate time (measured with zlib here).
+
+Also compares per-connection memory: frames are compressed independently
+(`deflate_frame`), so an idle connection holds no zlib state, whereas a
+protocol-level permessage-deflate with context takeover keeps one deflate
+context per connection for its lifetime. That retained size is measured with
+tracemalloc (zlib allocates through the Python raw allocator).
+
+Usage (from the repository root):
+
+    python -m benchmarks.ws_compression --output compression.json
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+import uuid
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+from backend.config import settings
+from backend.models.chat import Message, TaskResult
+from backend.services.connection_manager import deflate_frame
+
+
+def _encode(frame: dict) -> bytes:
+    # Same encoding as ConnectionManager.send_json
+    return json.dumps(frame, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def topic_state_frame(messages: int) -> bytes:
+    topic_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    history = [
+        Message(
+            id=str(uuid.uuid4()),
+            topic_id=topic_id,
+            sender="user" if i % 2 == 0 else "agent",
+            content=(
+                f"Question {i}: how do I configure the session timeout?"
+                if i % 2 == 0
+                else f"Okay, I received: 'question {i}' (from Agent Alpha). "
+                "Set SESSION_TIMEOUT_MINUTES in the .env file and restart."
+            ),
+            timestamp=now,
+        ).model_dump(mode="json")
+        for i in range(messages)
+    ]
+    results = [
+        TaskResult(
+            id=str(uuid.uuid4()),
+            topic_id=topic_id,
+            content=f"Task 'question {i}...' completed successfully.",
+            timestamp=now,
+        ).model_dump(mode="json")
+        for i in range(0, messages, 10)
+    ]
+    return _encode(
+        {
+            "type": "topic_state",
+            "payload": {
+                "topic_id": topic_id,
+                "agent_id": "agent_alpha",
+                "messages": history,
+                "task_results": results,
+            },
+        }
+    )
+
+
+def topic_list_frame(topics: int) -> bytes:
+    return _encode(
+        {
+            "type": "topic_list_update",
+            "payload": [
+                {
+                    "id": str(uuid.uuid4()),
+                    "agent_id": "agent_alpha",
+                    "name": f"Chat {i}",
+                }
+                for i in range(1, topics + 1)
+            ],
+        }
+    )
+
+
+def chunk_frame() -> bytes:
+    return _encode(
+        {
+            "type": "agent_message_chunk",
+            "payload": {
+                "topic_id": str(uuid.uuid4()),
+                "message_id": str(uuid.uuid4()),
+                "content_chunk": "received: 'hello there ",
+                "is_first_chunk": False,
+            },
+        }
+    )
+
+
+def time_per_call(func, min_seconds: float = 0.2) -> float:
+    runs, started = 0, time.perf_counter()
+    while True:
+        func()
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / runs
+
+
+def measure_frame(name: str, raw: bytes, level: int, window_bits: int) -> dict:
+    settings.ws_compression_level = level
+    settings.ws_compression_window_bits = window_bits
+    compressed = deflate_frame(raw)
+    inflate = lambda: zlib.decompress(compressed, -15)  # noqa: E731
+    assert inflate() == raw
+    return {
+        "frame": name,
+        "level": level,
+        "window_bits": window_bits,
+        "raw_bytes": len(raw),
+        "wire_bytes": min(len(compressed), len(raw)),
+        "ratio": round(len(compressed) / len(raw), 3),
+        "compress_us": round(time_per_call(lambda: deflate_frame(raw)) * 1e6, 1),
+        "inflate_us": round(time_per_call(inflate) * 1e6, 1),
+        "skipped_by_threshold": len(raw) < settings.ws_compression_min_bytes,
+    }
+
+
+def retained_context_bytes(window_bits: int, mem_level: int, frame: bytes) -> int:
+    """Memory one connection would hold for a persistent deflate context."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -window_bits, mem_level)
+        compressor.compress(frame)
+        compressor.flush(zlib.Z_SYNC_FLUSH)
+        retained, _ = tracemalloc.get_traced_memory()
+        del compressor
+    finally:
+        tracemalloc.stop()
+    return retained - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", default="1,6,9")
+    parser.add_argument("--window-bits", default="10,12,15")
+    parser.add_argument("--connections", type=int, default=50_000)
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+    levels = [int(v) for v in args.levels.split(",")]
+    window_bits = [int(v) for v in args.window_bits.split(",")]
+
+    frames = {
+        "agent_message_chunk": chunk_frame(),
+        "topic_list_update_50": topic_list_frame(50),
+        "topic_list_update_1000": topic_list_frame(1000),
+        "topic_state_20": topic_state_frame(20),
+        "topic_state_200": topic_state_frame(200),
+        "topic_state_2000": topic_state_frame(2000),
+    }
+    results = [
+        measure_frame(name, raw, level, bits)
+        for name, raw in frames.items()
+        for level in levels
+        for bits in window_bits
+    ]
+
+    sample = frames["topic_state_200"]
+    memory = {}
+    for bits in window_bits:
+        for mem_level in (1, 8):
+            per_conn = retained_context_bytes(bits, mem_level, sample)
+            memory[f"window_bits={bits},mem_level={mem_level}"] = {
+                "persistent_context_bytes": per_conn,
+                f"for_{args.connections}_connections_mb": round(
+                    per_conn * args.connections / 2**20, 1
+                ),
+            }
+    report = {
+        "threshold_bytes": settings.ws_compression_min_bytes,
+        "frames": results,
+        # Per-frame compression (what the server does) retains 0 bytes per idle
+        # connection; these are the costs it avoids
+        "persistent_context_memory": memory,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
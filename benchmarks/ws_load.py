@@ -0,0 +1,397 @@
+"""
+WebSocket load test for `backend.main:app`.
+
+Starts the app with uvicorn on a localhost port in a background thread (its
+own event loop, as in production) and drives it with N simulated clients that
+follow the real protocol: connect, `send_message` (new topic first, then
+follow-ups), `select_topic` and `ping`. Reports time-to-first-chunk and
+time-to-stream-end percentiles, frames per second, server event-loop lag and
+RSS growth per session as JSON.
+
+Usage (from the repository root):
+
+    python -m benchmarks.ws_load --clients 200 --messages 5 --output run.json
+
+    # Provider-like responses from the synthetic agent backend
+    python -m benchmarks.ws_load --clients 500 --synthetic-profile profile.json
+
+`--synthetic-profile` takes a SyntheticProfile as JSON (see
+backend/models/llm_agent.py; `{}` uses the defaults). Failed generations are
+counted in errors as `agent_error` / `agent_timeout`.
+
+Admission control (services/admission.py) is relaxed by default so the run
+measures the server rather than the limits: no per-client rate limit and one
+generation slot per client. `--rate-limit-per-minute`, `--max-generations`
+and `--max-queued-generations` set them explicitly; `rate_limited` and
+`generation_queued` replies are reported under `admission`.
+
+Note: clients and server share the process (and the GIL), so absolute numbers
+are pessimistic; compare runs made with the same parameters.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+from websockets.asyncio.client import connect
+
+from backend.config import settings
+from backend.main import app
+from backend.models.llm_agent import LLMAgent, SyntheticProfile
+from backend.services.admission import generation_limiter, rate_limiter
+from backend.services.agent_manager import agent_manager
+from backend.services.chat_manager import chat_manager
+
+BENCH_AGENT_ID = "agent_bench"
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99/max in milliseconds (None when there are no samples)."""
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def read_rss_bytes() -> int:
+    """Current resident set size of this process (Linux /proc)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class Stats:
+    """Measurements shared by all simulated clients (single event loop, no locks)."""
+
+    def __init__(self):
+        self.ttfc: list[float] = []  # send_message -> first agent_message_chunk
+        self.ttse: list[float] = []  # send_message -> agent_stream_end
+        self.pong_rtt: list[float] = []
+        self.frames = 0
+        self.frames_by_type: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        # rate_limited (by reason) and generation_queued replies
+        self.admission: dict[str, int] = {}
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def admitted(self, outcome: str):
+        self.admission[outcome] = self.admission.get(outcome, 0) + 1
+
+
+class ServerThread:
+    """Runs uvicorn in a daemon thread and exposes its loop for lag probing."""
+
+    def __init__(self, port: int):
+        config = uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", ws_max_size=2**24
+        )
+        self.server = uvicorn.Server(config)
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+async def probe_loop_lag(interval: float, samples: list[float], stop: asyncio.Event):
+    """Runs on the server loop: measures how late each scheduled wake-up is."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_client(
+    index: int, url: str, args: argparse.Namespace, stats: Stats, rng: random.Random
+):
+    client_id = f"bench_{index}_{rng.getrandbits(32):08x}"
+    try:
+        async with connect(f"{url}/ws/{client_id}", max_size=2**24) as ws:
+            topic_id: str | None = None
+            topic_ids: list[str] = []
+            pending: dict[str, float] = {}  # "stream" -> send time
+            first_chunk_seen = False
+            stream_done = asyncio.Event()
+            pong_event = asyncio.Event()
+
+            async def reader():
+                nonlocal topic_id, first_chunk_seen
+                async for raw in ws:
+                    now = time.perf_counter()
+                    frame = json.loads(raw)
+                    frame_type = frame.get("type", "unknown")
+                    stats.frames += 1
+                    stats.frames_by_type[frame_type] = (
+                        stats.frames_by_type.get(frame_type, 0) + 1
+                    )
+                    payload = frame.get("payload")
+                    if frame_type == "agent_message_chunk" and not first_chunk_seen:
+                        first_chunk_seen = True
+                        stats.ttfc.append(now - pending["stream"])
+                    elif frame_type == "agent_stream_end":
+                        if payload.get("error"):
+                            stats.error(f"agent_{payload['error']}")
+                        else:
+                            stats.ttse.append(now - pending["stream"])
+                        stream_done.set()
+                    elif frame_type == "rate_limited":
+                        # Not admitted: no stream follows for this message
+                        stats.admitted(f"rate_limited_{payload['reason']}")
+                        stream_done.set()
+                    elif frame_type == "generation_queued":
+                        stats.admitted("generation_queued")
+                    elif frame_type == "active_topic_update" and payload:
+                        topic_id = payload.get("topic_id")
+                        if topic_id and topic_id not in topic_ids:
+                            topic_ids.append(topic_id)
+                    elif frame_type == "ping":
+                        # Server heartbeat: unanswered, the connection is reaped
+                        await ws.send(json.dumps({"type": "pong"}))
+                    elif frame_type == "pong":
+                        pong_event.set()
+                    elif frame_type == "error":
+                        stats.error("server_error_frame")
+
+            reader_task = asyncio.create_task(reader())
+            try:
+                for n in range(args.messages):
+                    # Occasionally start a fresh topic after the first one
+                    new_topic = topic_id is None or rng.random() < args.new_topic_ratio
+                    first_chunk_seen = False
+                    stream_done.clear()
+                    pending["stream"] = time.perf_counter()
+                    await ws.send(
+                        json.dumps(
+                            {
+                                "type": "send_message",
+                                "payload": {
+                                    "content": f"load test message {n} from {client_id}",
+                                    "current_agent_id": BENCH_AGENT_ID,
+                                    "topic_id": None if new_topic else topic_id,
+                                },
+                            }
+                        )
+                    )
+                    try:
+                        await asyncio.wait_for(stream_done.wait(), args.stream_timeout)
+                    except asyncio.TimeoutError:
+                        stats.error("stream_timeout")
+
+                    # Switch between known topics like a user browsing history
+                    if len(topic_ids) > 1 and rng.random() < args.select_ratio:
+                        await ws.send(
+                            json.dumps(
+                                {
+                                    "type": "select_topic",
+                                    "payload": {"topic_id": rng.choice(topic_ids)},
+                                }
+                            )
+                        )
+
+                    pong_event.clear()
+                    ping_sent = time.perf_counter()
+                    await ws.send(json.dumps({"type": "ping"}))
+                    try:
+                        await asyncio.wait_for(pong_event.wait(), args.stream_timeout)
+                        stats.pong_rtt.append(time.perf_counter() - ping_sent)
+                    except asyncio.TimeoutError:
+                        stats.error("pong_timeout")
+
+                    await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+            finally:
+                reader_task.cancel()
+    except Exception as e:
+        stats.error(type(e).__name__)
+
+
+async def drive(args: argparse.Namespace, server: ServerThread) -> dict:
+    stats = Stats()
+    lag_samples: list[float] = []
+    # The probe and its stop flag must live on the server loop
+    server_stop = asyncio.run_coroutine_threadsafe(_make_event(), server.loop).result()
+    probe = asyncio.run_coroutine_threadsafe(
+        probe_loop_lag(args.lag_interval, lag_samples, server_stop), server.loop
+    )
+
+    url = f"ws://127.0.0.1:{args.port}"
+    rng = random.Random(args.seed)
+    rss_before = read_rss_bytes()
+    started = time.perf_counter()
+
+    tasks = []
+    for i in range(args.clients):
+        tasks.append(
+            asyncio.create_task(
+                run_client(i, url, args, stats, random.Random(rng.getrandbits(64)))
+            )
+        )
+        if args.ramp_up:
+            await asyncio.sleep(args.ramp_up / args.clients)
+    await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - started
+    rss_after = read_rss_bytes()
+    server.loop.call_soon_threadsafe(server_stop.set)
+    await asyncio.wrap_future(probe)
+
+    sessions = len(chat_manager.sessions)
+    return {
+        "params": {
+            k: str(v) if isinstance(v, Path) else v
+            for k, v in vars(args).items()
+            if k != "output"
+        },
+        "duration_s": round(elapsed, 3),
+        "time_to_first_chunk_ms": percentiles(stats.ttfc),
+        "time_to_stream_end_ms": percentiles(stats.ttse),
+        "pong_rtt_ms": percentiles(stats.pong_rtt),
+        "frames": stats.frames,
+        "frames_per_second": round(stats.frames / elapsed, 2),
+        "frames_by_type": stats.frames_by_type,
+        "event_loop_lag_ms": percentiles(lag_samples),
+        "sessions": sessions,
+        "topics": len(chat_manager.topics),
+        "rss_before_bytes": rss_before,
+        "rss_after_bytes": rss_after,
+        "rss_growth_per_session_bytes": (
+            round((rss_after - rss_before) / sessions) if sessions else None
+        ),
+        "admission": stats.admission,
+        "errors": stats.errors,
+    }
+
+
+async def _make_event() -> asyncio.Event:
+    return asyncio.Event()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument(
+        "--messages", type=int, default=3, help="send_message per client"
+    )
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause (s)")
+    parser.add_argument(
+        "--ramp-up", type=float, default=2.0, help="seconds to connect all"
+    )
+    parser.add_argument("--new-topic-ratio", type=float, default=0.2)
+    parser.add_argument("--select-ratio", type=float, default=0.3)
+    parser.add_argument("--stream-timeout", type=float, default=30.0)
+    parser.add_argument("--lag-interval", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument(
+        "--log-level", default="WARNING", help="app log level during the run"
+    )
+    parser.add_argument(
+        "--synthetic-profile",
+        type=Path,
+        help="SyntheticProfile JSON for the benchmark agent (default: echo agent)",
+    )
+    parser.add_argument(
+        "--rate-limit-per-minute",
+        type=float,
+        default=0.0,
+        help="per-client send_message rate limit (0 disables it)",
+    )
+    parser.add_argument(
+        "--max-generations",
+        type=int,
+        help="concurrent generation slots (default: one per client)",
+    )
+    parser.add_argument(
+        "--max-queued-generations",
+        type=int,
+        help="generations that may wait for a slot (default: one per client)",
+    )
+    parser.add_argument("--output", type=Path, help="Write the JSON results here")
+    args = parser.parse_args()
+    args.port = args.port or free_port()
+    if args.max_generations is None:
+        args.max_generations = args.clients
+    if args.max_queued_generations is None:
+        args.max_queued_generations = args.clients
+    # Per-frame INFO logs would dominate the measurement
+    logging.getLogger().setLevel(args.log_level)
+    # Background task simulations still sleeping at shutdown are expected here
+    logging.getLogger("asyncio").setLevel(logging.CRITICAL)
+
+    # Only the benchmark agent; the catalog file would replace it at startup
+    settings.agents_config_path = None
+    # The limiters were built from settings at import time, so set both
+    settings.rate_limit_messages_per_minute = args.rate_limit_per_minute
+    settings.agent_max_concurrent_generations = args.max_generations
+    settings.agent_max_queued_generations = args.max_queued_generations
+    rate_limiter.rate = args.rate_limit_per_minute / 60
+    generation_limiter.max_active = max(args.max_generations, 1)
+    generation_limiter.max_queued = max(args.max_queued_generations, 0)
+    if not agent_manager.get_agent_by_id(BENCH_AGENT_ID):
+        agent_manager.add_agent(
+            LLMAgent(
+                id=BENCH_AGENT_ID,
+                name="Benchmark Agent",
+                model="simulated",
+                synthetic=(
+                    SyntheticProfile.model_validate_json(
+                        args.synthetic_profile.read_text()
+                    )
+                    if args.synthetic_profile
+                    else None
+                ),
+            )
+        )
+
+    server = ServerThread(args.port)
+    server.start()
+    try:
+        report = asyncio.run(drive(args, server))
+    finally:
+        server.stop()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,64 +4,109 @@ import asyncio
 import json
 import sqlite3
 import os
+import secrets
+import threading
 from collections.abc import AsyncIterator
 from concurrent.futures.thread import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from dotenv import load_dotenv, find_dotenv
-from httpx import AsyncClient
-from functools import partial
+from functools import cache, partial
 from pathlib import Path
-from typing import Annotated, Any, Callable, Literal, TypeVar
+from types import ModuleType
+from typing import TYPE_CHECKING, Annotated, Any, Callable, Literal, TypeVar
 
 import fastapi
 import logfire
-from fastapi import Depends, Request
-from fastapi.responses import FileResponse, Response, StreamingResponse
-from typing_extensions import LiteralString, ParamSpec, TypedDict
-
-from pydantic_ai import Agent
-from pydantic_ai.exceptions import UnexpectedModelBehavior
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
-from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai.messages import (
-    ModelMessage,
-    ModelMessagesTypeAdapter,
-    ModelRequest,
-    ModelResponse,
-    TextPart,
-    UserPromptPart,
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.responses import (
+    FileResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
 )
+from typing_extensions import LiteralString, NotRequired, ParamSpec, TypedDict
+
+from backend.services.profiler import MAX_SECONDS, ProfilerBusyError, profile_collapsed
+
+if TYPE_CHECKING:
+    # pydantic-ai (and the Gemini model it pulls in) takes ~150 ms to import,
+    # so it is only imported at runtime on first use, see get_agent()
+    from pydantic_ai import Agent
+    from pydantic_ai.messages import ModelMessage
 
 load_dotenv(find_dotenv())
 # 'if-token-present' means nothing will be sent (and the example will work) if you don't have logfire configured
 logfire.configure(send_to_logfire="if-token-present")
 
-custom_http_client = AsyncClient(timeout=30)
+# Read now so a missing key still fails at startup rather than on the first chat
+GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
 
-llm_model = GeminiModel(
-    model_name="gemini-2.0-flash",
-    provider=GoogleGLAProvider(
-        api_key=os.environ["GEMINI_API_KEY"], http_client=custom_http_client
-    ),
-)
 
+_agent: Agent | None = None
+_agent_lock = threading.Lock()
 
-def search_movie(movies: list[str]) -> None:
-    print(f"search_movie called: {movies}")
+
+def get_agent() -> Agent:
+    """Returns the Gemini agent, importing pydantic-ai and building it on first use.
+
+    The lifespan warms it up in a worker thread once the server is
+    listening, so usually the first chat finds it ready. Blocks while it is
+    built: on the event loop, use `await agent_ready()` instead.
+    """
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                from httpx import AsyncClient
+                from pydantic_ai import Agent
+                from pydantic_ai.models.gemini import GeminiModel
+                from pydantic_ai.providers.google_gla import GoogleGLAProvider
+
+                llm_model = GeminiModel(
+                    model_name="gemini-2.0-flash",
+                    provider=GoogleGLAProvider(
+                        api_key=GEMINI_API_KEY, http_client=AsyncClient(timeout=30)
+                    ),
+                )
+                _agent = Agent(model=llm_model, instrument=False)
+    return _agent
+
+
+async def agent_ready() -> Agent:
+    """get_agent() for the event loop: an unfinished build is waited for in a worker thread."""
+    if _agent is not None:
+        return _agent
+    return await asyncio.to_thread(get_agent)
+
+
+@cache
+def _messages() -> ModuleType:
+    """pydantic_ai.messages, imported on first use rather than once per message."""
+    import pydantic_ai.messages
+
+    return pydantic_ai.messages
+
+
+def _warm_up_agent() -> None:
+    try:
+        with logfire.span("warm up agent"):
+            get_agent()
+    except Exception:
+        # Not fatal here: get_agent() retries, and raises, on first use
+        logfire.exception("agent warm-up failed")
 
 
-agent = Agent(
-    model=llm_model,
-    instrument=False,
-)
 THIS_DIR = Path(__file__).parent
 
 
 @asynccontextmanager
 async def lifespan(_app: fastapi.FastAPI):
     async with Database.connect() as db:
+        # Not awaited: startup completes (and connections are accepted) while
+        # the agent is built in the background
+        asyncio.get_running_loop().run_in_executor(None, _warm_up_agent)
         yield {"db": db}
 
 
@@ -99,34 +144,47 @@ class ChatMessage(TypedDict):
     role: Literal["user", "model"]
     timestamp: str
     content: str
+    # True when `content` is only the text appended since the previous line
+    delta: NotRequired[bool]
 
 
 def to_chat_message(m: ModelMessage) -> ChatMessage:
+    ai_messages = _messages()
     first_part = m.parts[0]
-    if isinstance(m, ModelRequest):
-        if isinstance(first_part, UserPromptPart):
+    if isinstance(m, ai_messages.ModelRequest):
+        if isinstance(first_part, ai_messages.UserPromptPart):
             assert isinstance(first_part.content, str)
             return {
                 "role": "user",
                 "timestamp": first_part.timestamp.isoformat(),
                 "content": first_part.content,
             }
-    elif isinstance(m, ModelResponse):
-        if isinstance(first_part, TextPart):
+    elif isinstance(m, ai_messages.ModelResponse):
+        if isinstance(first_part, ai_messages.TextPart):
             return {
                 "role": "model",
                 "timestamp": m.timestamp.isoformat(),
                 "content": first_part.content,
             }
+    from pydantic_ai.exceptions import UnexpectedModelBehavior
+
     raise UnexpectedModelBehavior(f"Unexpected message type for chat app: {m}")
 
 
 @app.post("/chat/")
 async def post_chat(
-    prompt: Annotated[str, fastapi.Form()], database: Database = Depends(get_db)
+    prompt: Annotated[str, fastapi.Form()],
+    delta: Annotated[bool, fastapi.Form()] = False,
+    database: Database = Depends(get_db),
 ) -> StreamingResponse:
     async def stream_messages():
-        """Streams new line delimited JSON `Message`s to the client."""
+        """Streams new line delimited JSON `Message`s to the client.
+
+        By default every model line carries the full text so far. With
+        `delta` set, model lines carry only the newly generated text and a
+        final line with the complete message follows, so the bytes sent
+        grow linearly with the response length instead of quadratically.
+        """
         # stream the user prompt so that can be displayed straight away
         yield (
             json.dumps(
@@ -138,15 +196,38 @@ async def post_chat(
             ).encode("utf-8")
             + b"\n"
         )
+        from pydantic_ai.messages import ModelResponse, TextPart
+
         # get the chat history so far to pass as context to the agent
         messages = await database.get_messages()
         # run the agent with the user prompt and the chat history
+        agent = await agent_ready()
         async with agent.run_stream(prompt, message_history=messages) as result:
-            async for text in result.stream(debounce_by=0.01):
-                # text here is a `str` and the frontend wants
-                # JSON encoded ModelResponse, so we create one
-                m = ModelResponse(parts=[TextPart(text)], timestamp=result.timestamp())
+            if delta:
+                timestamp = result.timestamp().isoformat()
+                parts: list[str] = []
+                async for text in result.stream_text(delta=True, debounce_by=0.01):
+                    parts.append(text)
+                    chunk: ChatMessage = {
+                        "role": "model",
+                        "timestamp": timestamp,
+                        "content": text,
+                        "delta": True,
+                    }
+                    yield json.dumps(chunk).encode("utf-8") + b"\n"
+                # the complete message lets the client reconcile its appended text
+                m = ModelResponse(
+                    parts=[TextPart("".join(parts))], timestamp=result.timestamp()
+                )
                 yield json.dumps(to_chat_message(m)).encode("utf-8") + b"\n"
+            else:
+                async for text in result.stream(debounce_by=0.01):
+                    # text here is a `str` and the frontend wants
+                    # JSON encoded ModelResponse, so we create one
+                    m = ModelResponse(
+                        parts=[TextPart(text)], timestamp=result.timestamp()
+                    )
+                    yield json.dumps(to_chat_message(m)).encode("utf-8") + b"\n"
 
         # add new messages (e.g. the user prompt and the agent response in this case) to the database
         await database.add_messages(result.new_messages_json())
@@ -154,6 +235,33 @@ async def post_chat(
     return StreamingResponse(stream_messages(), media_type="text/plain")
 
 
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def get_profile(
+    seconds: Annotated[float, fastapi.Query(gt=0, le=MAX_SECONDS)] = 10.0,
+    interval_ms: Annotated[float, fastapi.Query(ge=1, le=1000)] = 10.0,
+    include_idle: bool = False,
+    x_admin_token: Annotated[str | None, Header()] = None,
+) -> PlainTextResponse:
+    """Samples the event loop and executor threads (including the SQLite one).
+
+    Returns collapsed stacks for flamegraph.pl or speedscope. Disabled
+    unless the ADMIN_TOKEN environment variable is set.
+    """
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Admin API is disabled.")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+    try:
+        body = await profile_collapsed(seconds, interval_ms / 1000, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        body,
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
@@ -177,7 +285,8 @@ class Database:
     ) -> AsyncIterator[Database]:
         with logfire.span("connect to DB"):
             loop = asyncio.get_event_loop()
-            executor = ThreadPoolExecutor(max_workers=1)
+            # named so its stacks are recognisable in /admin/profile output
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-db")
             con = await loop.run_in_executor(executor, cls._connect, file)
             slf = cls(con, loop, executor)
         try:
@@ -206,6 +315,8 @@ class Database:
         await self._asyncify(self.con.commit)
 
     async def get_messages(self) -> list[ModelMessage]:
+        from pydantic_ai.messages import ModelMessagesTypeAdapter
+
         c = await self._asyncify(
             self._execute, "SELECT message_list FROM messages order by id"
         )
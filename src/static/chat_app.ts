@@ -8,9 +8,10 @@ const promptInput = document.getElementById('prompt-input') as HTMLInputElement
 const spinner = document.getElementById('spinner')
 
 // stream the response and render messages as each chunk is received
-// data is sent as newline-delimited JSON
+// data is sent as newline-delimited JSON, only complete lines are parsed
+// and each line is handled once, so long responses stay cheap to render
 async function onFetchResponse(response: Response): Promise<void> {
-  let text = ''
+  let pending = ''
   let decoder = new TextDecoder()
   if (response.ok) {
     const reader = response.body.getReader()
@@ -19,11 +20,15 @@ async function onFetchResponse(response: Response): Promise<void> {
       if (done) {
         break
       }
-      text += decoder.decode(value)
-      addMessages(text)
+      pending += decoder.decode(value, {stream: true})
+      const end = pending.lastIndexOf('\n')
+      if (end >= 0) {
+        addMessages(pending.slice(0, end))
+        pending = pending.slice(end + 1)
+      }
       spinner.classList.remove('active')
     }
-    addMessages(text)
+    addMessages(pending)
     promptInput.disabled = false
     promptInput.focus()
   } else {
@@ -39,8 +44,13 @@ interface Message {
   role: string
   content: string
   timestamp: string
+  // set when `content` should be appended to the message rather than replace it
+  delta?: boolean
 }
 
+// raw markdown of each message rendered so far, keyed by element id
+const messageContent = new Map<string, string>()
+
 // take raw response text and render messages into the `#conversation` element
 // Message timestamp is assumed to be a unique identifier of a message, and is used to deduplicate
 // hence you can send data about the same message multiple times, and it will be updated
@@ -50,7 +60,7 @@ function addMessages(responseText: string) {
   const messages: Message[] = lines.filter(line => line.length > 1).map(j => JSON.parse(j))
   for (const message of messages) {
     // we use the timestamp as a crude element id
-    const {timestamp, role, content} = message
+    const {timestamp, role, delta} = message
     const id = `msg-${timestamp}`
     let msgDiv = document.getElementById(id)
     if (!msgDiv) {
@@ -60,6 +70,8 @@ function addMessages(responseText: string) {
       msgDiv.classList.add('border-top', 'pt-2', role)
       convElement.appendChild(msgDiv)
     }
+    const content = delta ? (messageContent.get(id) ?? '') + message.content : message.content
+    messageContent.set(id, content)
     msgDiv.innerHTML = marked.parse(content)
   }
   window.scrollTo({ top: document.body.scrollHeight, behavior: 'smooth' })
@@ -75,6 +87,8 @@ async function onSubmit(e: SubmitEvent): Promise<void> {
   e.preventDefault()
   spinner.classList.add('active')
   const body = new FormData(e.target as HTMLFormElement)
+  // ask for append-only model lines instead of the cumulative text
+  body.set('delta', 'true')
 
   promptInput.value = ''
   promptInput.disabled = true
@@ -0,0 +1,94 @@
+"""
+Heartbeats must not reap a client whose reply is still streaming.
+
+Runs the app on a local port with a short heartbeat and a synthetic agent
+whose reply takes several heartbeat periods. Run from the repository root:
+
+    python -m unittest tests.test_heartbeat
+"""
+
+import asyncio
+import json
+import unittest
+
+import uvicorn
+from websockets.asyncio.client import connect
+
+from backend.config import settings
+
+settings.agents_config_path = None
+settings.snapshot_path = None
+settings.ws_heartbeat_interval_seconds = 0.5
+settings.ws_heartbeat_timeout_seconds = 0.5
+
+from backend.main import app  # noqa: E402
+from backend.models.llm_agent import Constant, LLMAgent, SyntheticProfile  # noqa: E402
+from backend.services.agent_manager import agent_manager  # noqa: E402
+from backend.services.chat_manager import chat_manager  # noqa: E402
+from backend.services.metrics import ws_connections_reaped_total  # noqa: E402
+
+# Streams for about 3s: six times interval + timeout
+SLOW_AGENT = LLMAgent(
+    id="slow",
+    name="Slow",
+    model="synthetic",
+    synthetic=SyntheticProfile(
+        time_to_first_token_seconds=Constant(value=0.2),
+        tokens_per_second=Constant(value=20),
+        response_tokens=Constant(value=56),
+    ),
+)
+
+
+class HeartbeatDuringStreamTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=0, log_level="error")
+        )
+        self.serving = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.05)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}/ws/heartbeat_client"
+        agent_manager.replace_agents([SLOW_AGENT])
+
+    async def asyncTearDown(self):
+        self.server.should_exit = True
+        await self.serving
+
+    async def test_long_stream_survives_heartbeats(self):
+        reaped_before = ws_connections_reaped_total.labels().value
+        pings = 0
+        chunks: list[str] = []
+        async with connect(self.url) as ws:
+            await ws.recv()  # initial_state
+            await ws.send(
+                json.dumps(
+                    {
+                        "type": "send_message",
+                        "payload": {"content": "hi", "current_agent_id": "slow"},
+                    }
+                )
+            )
+            async with asyncio.timeout(15):
+                while True:
+                    frame = json.loads(await ws.recv())
+                    if frame["type"] == "ping":
+                        pings += 1
+                        await ws.send(json.dumps({"type": "pong"}))
+                    elif frame["type"] == "agent_message_chunk":
+                        chunks.append(frame["payload"]["content_chunk"])
+                    elif frame["type"] == "agent_stream_end":
+                        self.assertNotIn("error", frame["payload"])
+                        break
+
+        self.assertGreater(pings, 0, "the stream should outlast a heartbeat")
+        self.assertEqual(ws_connections_reaped_total.labels().value, reaped_before)
+        topic_id = chat_manager.sessions["heartbeat_client"].active_topic_id
+        stored = chat_manager.get_topic(topic_id).messages[-1]
+        self.assertEqual("".join(chunks).rstrip(), stored.content)
+        self.assertEqual(len(stored.content.split()), 56)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+Agent tool execution (services/tools.py) with local fake tools.
+
+Each test registers its tools on a private ToolExecutor. Run from the
+repository root:
+
+    python -m unittest tests.test_tools
+"""
+
+import asyncio
+import time
+import unittest
+
+from backend.services.tools import (
+    REASON_ERROR,
+    REASON_TIMEOUT,
+    REASON_UNKNOWN,
+    ToolError,
+    ToolExecutor,
+    tool_calls_total,
+)
+
+
+def blocking_sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+class ToolExecutorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.executor = ToolExecutor()
+        self.runs: list[dict] = []  # Arguments of each run of the fake tools
+
+    async def asyncTearDown(self):
+        self.executor.shutdown()
+
+    def register_counted(self, name: str, delay: float = 0.0, **options):
+        """Registers an inline tool that records its runs and returns `value * 2`."""
+
+        async def double(value: int) -> int:
+            self.runs.append({"value": value})
+            await asyncio.sleep(delay)
+            return value * 2
+
+        self.executor.register(double, name=name, **options)
+
+    async def test_inline_timeout(self):
+        self.register_counted("slow", delay=1.0, timeout_seconds=0.05)
+        started = time.perf_counter()
+        with self.assertRaises(ToolError) as raised:
+            await self.executor.call("slow", value=1)
+        self.assertEqual(raised.exception.reason, REASON_TIMEOUT)
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    async def test_thread_timeout_keeps_the_slot_until_the_run_ends(self):
+        tool = self.executor.register(
+            blocking_sleep, mode="thread", timeout_seconds=0.05, max_concurrency=1
+        )
+        started = time.perf_counter()
+        with self.assertRaises(ToolError) as raised:
+            await self.executor.call("blocking_sleep", seconds=0.3)
+        self.assertEqual(raised.exception.reason, REASON_TIMEOUT)
+        self.assertLess(time.perf_counter() - started, 0.25)
+        # The abandoned thread still runs, so the only slot is taken
+        self.assertTrue(tool._slots.locked())
+        self.assertEqual(await self.executor.call("blocking_sleep", seconds=0.01), 0.01)
+        self.assertGreaterEqual(time.perf_counter() - started, 0.3)
+
+    async def test_concurrency_cap(self):
+        running = peak = 0
+
+        async def tracked(value: int) -> int:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            return value
+
+        self.executor.register(tracked, max_concurrency=2)
+        results = await asyncio.gather(
+            *(self.executor.call("tracked", value=i) for i in range(6))
+        )
+        self.assertEqual(results, list(range(6)))
+        self.assertEqual(peak, 2)
+
+    async def test_cache_hits_and_eviction(self):
+        self.register_counted("cached", deterministic=True, cache_size=2)
+        hits = tool_calls_total.labels("cached", "cached")
+        hits_before = hits.value
+
+        self.assertEqual(await self.executor.call("cached", value=1), 2)
+        self.assertEqual(await self.executor.call("cached", value=1), 2)
+        self.assertEqual(len(self.runs), 1)
+        self.assertEqual(hits.value, hits_before + 1)
+
+        # Adding 2 and 3 evicts 1, the least recently used
+        await self.executor.call("cached", value=2)
+        await self.executor.call("cached", value=3)
+        await self.executor.call("cached", value=1)
+        self.assertEqual([run["value"] for run in self.runs], [1, 2, 3, 1])
+
+    async def test_non_deterministic_results_are_not_cached(self):
+        self.register_counted("fresh")
+        await self.executor.call("fresh", value=1)
+        await self.executor.call("fresh", value=1)
+        self.assertEqual(len(self.runs), 2)
+
+    async def test_identical_in_flight_calls_are_coalesced(self):
+        self.register_counted("shared", delay=0.05, deterministic=True)
+        coalesced = tool_calls_total.labels("shared", "coalesced")
+        coalesced_before = coalesced.value
+
+        results = await asyncio.gather(
+            *(self.executor.call("shared", value=4) for _ in range(3)),
+            self.executor.call("shared", value=5),
+        )
+        self.assertEqual(results, [8, 8, 8, 10])
+        self.assertEqual(len(self.runs), 2)
+        self.assertEqual(coalesced.value, coalesced_before + 2)
+
+    async def test_cancelled_caller_does_not_cancel_a_coalesced_run(self):
+        self.register_counted("shared", delay=0.05, deterministic=True)
+        first = asyncio.create_task(self.executor.call("shared", value=4))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(self.executor.call("shared", value=4))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        self.assertEqual(await second, 8)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(len(self.runs), 1)
+
+    async def test_failures_reach_every_caller_and_are_not_cached(self):
+        async def failing(value: int) -> int:
+            self.runs.append({"value": value})
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        self.executor.register(failing, deterministic=True)
+        results = await asyncio.gather(
+            self.executor.call("failing", value=1),
+            self.executor.call("failing", value=1),
+            return_exceptions=True,
+        )
+        self.assertTrue(
+            all(isinstance(r, ToolError) and r.reason == REASON_ERROR for r in results)
+        )
+        with self.assertRaises(ToolError):
+            await self.executor.call("failing", value=1)
+        self.assertEqual(len(self.runs), 2)
+
+    async def test_unknown_tool(self):
+        with self.assertRaises(ToolError) as raised:
+            await self.executor.call("missing")
+        self.assertEqual(raised.exception.reason, REASON_UNKNOWN)
+
+    async def test_rejects_invalid_mode(self):
+        async def async_tool():
+            pass
+
+        def nested_tool():
+            pass
+
+        with self.assertRaises(ValueError):
+            self.executor.register(blocking_sleep)  # Blocking function inline
+        with self.assertRaises(ValueError):
+            self.executor.register(async_tool, mode="thread")
+        with self.assertRaises(ValueError):
+            self.executor.register(nested_tool, mode="process")  # Not importable
+        self.executor.register(blocking_sleep, mode="thread")
+        with self.assertRaises(ValueError):
+            self.executor.register(blocking_sleep, mode="thread")  # Same name
+
+    async def test_agent_function_calls_through_the_executor(self):
+        self.register_counted("double", deterministic=True)
+        function = self.executor.agent_function("double")
+        self.assertEqual(function.__name__, "double")
+        self.assertEqual(await function(value=3), 6)
+        self.assertEqual(await function(value=3), 6)
+        self.assertEqual(len(self.runs), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()